@@ -6,6 +6,8 @@ import time
 import datetime
 from dotenv import load_dotenv
 
+from utils.admission import PRIORITY_INTERACTIVE, PRIORITY_PREFETCH
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -497,12 +499,43 @@ def load_bot():
     from utils.ai_powered_qa_engine import create_ai_powered_bot
     
     # Use 100% AI approach for better accuracy and maintainability
-    ai_bot = create_ai_powered_bot(
-        data_files=["data/axis-atlas.json", "data/icici-epm.json"]
-    )
+    # Every card file under data/ is indexed; card bodies load on demand
+    ai_bot = create_ai_powered_bot()
+    
+    # Edits to data/*.json are picked up without a restart (the cached bot's data is swapped in place)
+    ai_bot.registry.start_watching(float(os.getenv("CARD_RELOAD_INTERVAL_SECONDS", "2")))
     
     return ai_bot
 
+def stream_bot_response(bot, query: str, priority: int = PRIORITY_INTERACTIVE):
+    """Render the bot's answer as it streams in. Returns (response, ttft_ms, total_ms)."""
+    start_time = time.time()
+    timings = {}
+    
+    # Fold finished turns into the session's memory; the question being asked stays out of it
+    memory = st.session_state.conversation_memory
+    memory.sync(st.session_state.messages)
+    
+    # Quick questions are self-contained; without history they share one cache entry across turns
+    history = None if priority == PRIORITY_PREFETCH else memory
+    
+    def timed_chunks():
+        for chunk in bot.process_query_stream(query, conversation_history=history, priority=priority):
+            if "ttft_ms" not in timings:
+                timings["ttft_ms"] = (time.time() - start_time) * 1000
+            yield chunk
+    
+    response = st.write_stream(timed_chunks())
+    if not isinstance(response, str):
+        response = "".join(str(part) for part in response)
+    
+    total_ms = (time.time() - start_time) * 1000
+    return response, timings.get("ttft_ms", total_ms), total_ms
+
+def format_timing_caption(ttft_ms: float, total_ms: float) -> str:
+    """Timing caption shown under streamed answers."""
+    return f"🤖 Processed by: AI Engine (first token {ttft_ms:.0f}ms, total {total_ms:.0f}ms)"
+
 class QueryEnhancer:
     """Enhances user queries using lessons learned from wizard fixes."""
     
@@ -619,10 +652,7 @@ def log_feedback(query: str, response: str, feedback_type: str, improvement_sugg
         # Initialize a temporary AI bot instance for analytics (reuse session bot if available)
         if not hasattr(st.session_state, 'analytics_bot'):
             from utils.ai_powered_qa_engine import create_ai_powered_bot
-            st.session_state.analytics_bot = create_ai_powered_bot([
-                "data/axis-atlas.json", 
-                "data/icici-epm.json"
-            ])
+            st.session_state.analytics_bot = create_ai_powered_bot()
         
         ai_bot = st.session_state.analytics_bot
         
@@ -631,11 +661,7 @@ def log_feedback(query: str, response: str, feedback_type: str, improvement_sugg
         
         # Extract basic analytics from the query
         intent_detected = 'ai_powered'  # Since we're using AI for everything now
-        cards_mentioned = []
-        if 'axis' in query.lower() or 'atlas' in query.lower():
-            cards_mentioned.append('Axis Bank Atlas Credit Card')
-        if 'icici' in query.lower() or 'emeralde' in query.lower() or 'epm' in query.lower():
-            cards_mentioned.append('ICICI Bank Emeralde Private Metal Credit Card')
+        cards_mentioned = ai_bot.registry.resolve(query)
         
         # Extract spending amount if present
         spend_amount = None
@@ -939,6 +965,10 @@ def main():
         welcome_msg = "Hi! I'm your credit card expert. Ask me anything about Axis Atlas or ICICI Emeralde Private Metal cards. I can help with fees, rewards, benefits, eligibility, and more!"
         st.session_state.messages.append({"role": "assistant", "content": welcome_msg})
     
+    # Compact summary of earlier turns, updated after each answer and sent with follow-ups
+    if "conversation_memory" not in st.session_state:
+        st.session_state.conversation_memory = bot.create_conversation_memory()
+    
     if "quick_questions_expanded" not in st.session_state:
         st.session_state.quick_questions_expanded = True
     
@@ -986,24 +1016,9 @@ def main():
             col = col1 if i % 2 == 0 else col2
             with col:
                 if st.button(button_text, key=f"quick_{i}", use_container_width=True):
-                    # Add user message
+                    # Add user message; the answer streams in below the chat history
                     st.session_state.messages.append({"role": "user", "content": query})
-                    
-                    # Get immediate response
-                    enhanced_query = enhancer.enhance_query(query)
-                    with st.spinner("Getting answer..."):
-                        import time
-                        start_time = time.time()
-                        response = bot.process_query(enhanced_query)
-                        processing_time = (time.time() - start_time) * 1000
-                        
-                        # Show AI engine info
-                        st.caption(f"🤖 Processed by: AI Engine ({processing_time:.0f}ms)")
-                    
-                    # Add assistant response with engine info
-                    response_with_info = f"{response}\n\n*🤖 Processed by: AI Engine ({processing_time:.0f}ms)*"
-                    st.session_state.messages.append({"role": "assistant", "content": response_with_info})
-                    st.rerun()
+                    st.session_state.pending_quick_query = query
     else:
         # Show compact collapsible version after first interaction
         header_col, toggle_col = st.columns([4, 1])
@@ -1035,21 +1050,9 @@ def main():
             for i, (button_text, query) in enumerate(compact_questions):
                 with cols[i]:
                     if st.button(button_text, key=f"compact_{i}", use_container_width=True):
-                        # Add user message
+                        # Add user message; the answer streams in below the chat history
                         st.session_state.messages.append({"role": "user", "content": query})
-                        
-                        # Get immediate response
-                        enhanced_query = enhancer.enhance_query(query)
-                        with st.spinner("Getting answer..."):
-                            import time
-                            start_time = time.time()
-                            response = bot.process_query(enhanced_query)
-                            processing_time = (time.time() - start_time) * 1000
-                        
-                        # Add assistant response with engine info
-                        response_with_info = f"{response}\n\n*🤖 Processed by: AI Engine ({processing_time:.0f}ms)*"
-                        st.session_state.messages.append({"role": "assistant", "content": response_with_info})
-                        st.rerun()
+                        st.session_state.pending_quick_query = query
 
     # Display chat history with feedback buttons
     for i, message in enumerate(st.session_state.messages):
@@ -1135,6 +1138,21 @@ def main():
                                     del st.session_state[f"feedback_radio_{i}"]
                                 st.rerun()
 
+    # Stream the answer for a quick question clicked above
+    pending_query = st.session_state.pop("pending_quick_query", None)
+    if pending_query:
+        enhanced_query = enhancer.enhance_query(pending_query)
+        with st.chat_message("assistant"):
+            # Quick questions queue behind typed chat queries when the provider is rate limited
+            response, ttft_ms, total_ms = stream_bot_response(bot, enhanced_query, PRIORITY_PREFETCH)
+            timing_caption = format_timing_caption(ttft_ms, total_ms)
+            st.caption(timing_caption)
+        
+        # Add assistant response with engine info
+        response_with_info = f"{response}\n\n*{timing_caption}*"
+        st.session_state.messages.append({"role": "assistant", "content": response_with_info})
+        st.rerun()
+
     # Chat input
     if prompt := st.chat_input("Ask me anything about these credit cards..."):
         # Add user message
@@ -1149,19 +1167,12 @@ def main():
             with st.chat_message("assistant"):
                 st.markdown(f"*Understanding your question as: \"{enhanced_query}\"*")
 
-        # Get response using AI engine
-        with st.spinner("Thinking..."):
-            import time
-            start_time = time.time()
-            response = bot.process_query(enhanced_query)
-            processing_time = (time.time() - start_time) * 1000
+        # Stream response from AI engine so the first tokens show up immediately
+        with st.chat_message("assistant"):
+            response, ttft_ms, total_ms = stream_bot_response(bot, enhanced_query)
             
             # Show AI engine info for transparency
-            st.caption(f"🤖 Processed by: AI Engine ({processing_time:.0f}ms)")
-        
-        # Display response
-        with st.chat_message("assistant"):
-            st.markdown(response)
+            st.caption(format_timing_caption(ttft_ms, total_ms))
         
         st.session_state.messages.append({"role": "assistant", "content": response})
         
@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Performance Benchmarks for Credit Card Chatbot
+Micro-benchmarks for the engine's local (non-LLM) hot paths. No API calls are made.
+"""
+
+import os
+import json
+import time
+import asyncio
+import tempfile
+from typing import Callable, Dict, List
+
+from utils.card_registry import discover_data_files
+
+DATA_FILES = discover_data_files()
+QUERY_LOG_FILES = ['query_analytics.json', 'feedback_log.json']
+
+# Routing checks: (query, True if the fast path should answer locally)
+ROUTING_CASES = [
+    ("If I spend ₹100,000 on hotel bookings which card gives more rewards?", True),
+    ("If I spend 50000 on dining with atlas how many miles do I get?", True),
+    ("I have 10000 EDGE miles on Atlas, what can I do with them for travel?", False),
+    ("What are 5000 ICICI reward points worth on hotel bookings?", False),
+    ("Which card is better for 3L annual travel spend with milestones?", False),
+    ("I will spend ₹3L on flights over 3 months with Atlas", False),
+]
+
+
+def _time_call(func: Callable, iterations: int) -> Dict[str, float]:
+    """Run func repeatedly and return wall-clock and CPU microseconds per call."""
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for _ in range(iterations):
+        func()
+    wall_us = (time.perf_counter() - wall_start) / iterations * 1e6
+    cpu_us = (time.process_time() - cpu_start) / iterations * 1e6
+    return {"wall_us": round(wall_us, 2), "cpu_us": round(cpu_us, 2)}
+
+
+def _load_logged_queries() -> List[str]:
+    """User queries from the local analytics and feedback logs (if present)."""
+    queries = []
+    for path in QUERY_LOG_FILES:
+        try:
+            with open(path, 'r') as f:
+                entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        queries.extend(entry["query"] for entry in entries if isinstance(entry, dict) and entry.get("query"))
+    return queries
+
+
+def _write_synthetic_catalogue(directory: str, count: int) -> List[str]:
+    """Write count copies of the data files (cards renamed, e.g. 'atlas17') into directory."""
+    sources = []
+    for path in DATA_FILES:
+        with open(path, 'r') as f:
+            sources.append((os.path.basename(path).split('-')[0], json.load(f)))
+    files = []
+    for index in range(count):
+        bank, data = sources[index % len(sources)]
+        data = json.loads(json.dumps(data))
+        for card in data.get("cards", []):
+            card["name"] = f"{card['name']} {index}"
+            card["id"] = f"{card.get('id', bank)}{index}"
+        path = os.path.join(directory, f"{bank}-synthetic-{index}.json")
+        with open(path, 'w') as f:
+            json.dump(data, f)
+        files.append(path)
+    return files
+
+
+class PerformanceBenchmark:
+    def __init__(self):
+        # Benchmarks run offline: providers replay cassettes (placeholder answers on a miss)
+        os.environ.setdefault("LLM_PROVIDER_MODE", "replay")
+        os.environ.setdefault("LLM_REPLAY_ON_MISS", "placeholder")
+
+        from utils.ai_powered_qa_engine import create_ai_powered_bot
+        self.ai_bot = create_ai_powered_bot(DATA_FILES)
+        self.results = {}
+
+    def benchmark_system_prompt(self, iterations: int = 2000) -> Dict:
+        """Compare rebuilding the system prompt per request with the memoized version."""
+        rebuild = _time_call(self.ai_bot._create_comprehensive_system_prompt, iterations)
+        memoized = _time_call(self.ai_bot._get_system_prompt, iterations)
+
+        result = {
+            "iterations": iterations,
+            "rebuild_per_request": rebuild,
+            "memoized": memoized,
+            "cpu_saved_per_request_us": round(rebuild["cpu_us"] - memoized["cpu_us"], 2),
+            "prompt_version": self.ai_bot.system_prompt_version,
+            "prompt_chars": len(self.ai_bot._get_system_prompt())
+        }
+        self.results["system_prompt"] = result
+        return result
+
+    def benchmark_fast_path(self, iterations: int = 2000) -> Dict:
+        """Time answering a fully-specified comparison locally (routing plan + rendered template)."""
+        router = self.ai_bot.fast_path
+        if router is None:
+            return {}
+        query = self.ai_bot._preprocess_currency("If I spend ₹100,000 on hotel bookings which card gives more rewards?")
+        local = _time_call(lambda: router.render(*router.plan(query)[0]), iterations)
+        misroutes = [case for case, expected in ROUTING_CASES
+                     if (router.plan(self.ai_bot._preprocess_currency(case))[0] is not None) != expected]
+
+        result = {
+            "iterations": iterations,
+            "local_answer": local,
+            "query": query,
+            "routing_cases": len(ROUTING_CASES),
+            "misroutes": misroutes
+        }
+        self.results["fast_path"] = result
+        return result
+
+    def benchmark_intent_detection(self, rounds: int = 50) -> Dict:
+        """
+        Time RichDataCreditCardBot.detect_intent (precompiled matcher) against searching every
+        pattern in order, over the logged queries plus the example queries, and check they agree.
+        """
+        from utils.qa_engine import RichDataCreditCardBot
+
+        bot = RichDataCreditCardBot(DATA_FILES)
+        logged = _load_logged_queries()
+        corpus = [query.lower() for query in logged + [q for qs in self.ai_bot.example_queries.values() for q in qs]]
+        matcher = bot.intent_matcher
+
+        sequential = _time_call(lambda: [matcher.match_sequential(query) for query in corpus], rounds)
+        combined = _time_call(lambda: [matcher.match(query) for query in corpus], rounds)
+        mismatches = sum(matcher.match(query) != matcher.match_sequential(query) for query in corpus)
+
+        result = {
+            "queries": len(corpus),
+            "logged_queries": len(logged),
+            "rules": len(matcher.rules),
+            "patterns": sum(len(patterns) for _, patterns in matcher.rules),
+            "sequential_per_query_us": round(sequential["cpu_us"] / len(corpus), 2),
+            "matcher_per_query_us": round(combined["cpu_us"] / len(corpus), 2),
+            "speedup": round(sequential["cpu_us"] / combined["cpu_us"], 2) if combined["cpu_us"] else None,
+            "mismatches": mismatches
+        }
+        self.results["intent_detection"] = result
+        return result
+
+    def benchmark_reward_batch(self, profiles: int = 2000) -> Dict:
+        """
+        Rewards for random monthly spend profiles over every card and category: one
+        calculate_rewards_batch call against calculate_rewards per cell, checking they agree.
+        """
+        import numpy as np
+        from utils.fast_path import CATEGORY_KEYWORDS
+        from utils.reward_calculator import calculate_rewards, calculate_rewards_batch
+
+        cards_data = self.ai_bot.cards_data
+        cards = list(cards_data)
+        categories = [None] + list(CATEGORY_KEYWORDS)
+        spend = np.random.default_rng(0).integers(0, 300000, size=(profiles, len(categories)))
+
+        batch_timing = _time_call(lambda: calculate_rewards_batch(cards_data, spend, cards, categories), 5)
+        batch = calculate_rewards_batch(cards_data, spend, cards, categories)
+
+        start = time.process_time()
+        mismatches = 0
+        for p in range(profiles):
+            for i, card in enumerate(cards):
+                for j, category in enumerate(categories):
+                    result = calculate_rewards(cards_data, card, int(spend[p, j]), category)
+                    earned = result.get('points_earned', result.get('miles_earned'))
+                    mismatches += earned != batch["earned"][p, i, j]
+        loop_us = (time.process_time() - start) * 1e6
+
+        result = {
+            "profiles": profiles,
+            "cells": batch["earned"].size,
+            "batch_ms": round(batch_timing["cpu_us"] / 1000, 2),
+            "per_call_ms": round(loop_us / 1000, 2),
+            "speedup": round(loop_us / batch_timing["cpu_us"], 1) if batch_timing["cpu_us"] else None,
+            "mismatches": int(mismatches)
+        }
+        self.results["reward_batch"] = result
+        return result
+
+    def benchmark_spend_optimizer(self, rounds: int = 20, synthetic_cards: int = 36) -> Dict:
+        """
+        SpendOptimizer latency for a mixed monthly profile on the current portfolio, and on a
+        synthetic portfolio of copies of the cards with varied earning rates.
+        """
+        import copy
+        from utils.spend_optimizer import SpendOptimizer
+
+        profile = {None: 40000, 'travel': 250000, 'dining': 15000, 'grocery': 40000, 'utility': 10000,
+                   'rent': 20000, 'insurance': 10000, 'education': 20000, 'fuel': 5000}
+        cards_data = self.ai_bot.cards_data
+        synthetic = {}
+        for index in range(synthetic_cards):
+            card = copy.deepcopy(list(cards_data.values())[index % len(cards_data)])
+            base = card['rewards'].get('earning_rate', '')
+            card['rewards']['earning_rate'] = base.replace(base.split()[0], str(1 + index % 6), 1)
+            synthetic[f"Synthetic Card {index}"] = card
+
+        portfolio = SpendOptimizer(cards_data)
+        large = SpendOptimizer(synthetic)
+        result = {
+            "cards": len(portfolio.cards),
+            "portfolio_ms": round(_time_call(lambda: portfolio.optimize(profile), rounds)["cpu_us"] / 1000, 2),
+            "annual_value": portfolio.optimize(profile)["annual_value"],
+            "synthetic_cards": len(large.cards),
+            "synthetic_ms": round(_time_call(lambda: large.optimize(profile), max(1, rounds // 4))["cpu_us"] / 1000, 2)
+        }
+        self.results["spend_optimizer"] = result
+        return result
+
+    def benchmark_year_simulation(self, levels: int = 500, rounds: int = 10) -> Dict:
+        """Month-by-month year simulation of a grid of annual spend levels on every card in one pass."""
+        import numpy as np
+        from utils.milestone_simulator import simulate_spend_levels
+
+        cards_data = self.ai_bot.cards_data
+        annual_spends = np.linspace(100000, 3000000, levels)
+        mix = {None: 0.6, 'travel': 0.25, 'dining': 0.1, 'rent': 0.05}
+        timing = _time_call(lambda: simulate_spend_levels(cards_data, list(cards_data), annual_spends, mix), rounds)
+        result = {
+            "cards": len(cards_data),
+            "spend_levels": levels,
+            "grid_ms": round(timing["cpu_us"] / 1000, 2),
+            "per_card_year_us": round(timing["cpu_us"] / (levels * len(cards_data)), 2)
+        }
+        self.results["year_simulation"] = result
+        return result
+
+    def benchmark_cold_start(self, synthetic_files: int = 150, rounds: int = 5) -> Dict:
+        """
+        Card catalogue load time: parsing the JSON files vs reading the compiled snapshot's header
+        from disk, for the real data files and a synthetic catalogue of copies.
+        """
+        from utils import catalogue_snapshot
+
+        def timings(files: List[str]) -> Dict[str, float]:
+            catalogue_snapshot.load_catalogue(files)  # make sure the snapshot exists
+            return {
+                "json_ms": round(_time_call(lambda: catalogue_snapshot.build_catalogue(files), rounds)["wall_us"] / 1000, 2),
+                "snapshot_ms": round(_time_call(lambda: catalogue_snapshot.load_catalogue(files), rounds)["wall_us"] / 1000, 2)
+            }
+
+        previous_dir = os.environ.get("CARD_SNAPSHOT_DIR")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.environ["CARD_SNAPSHOT_DIR"] = os.path.join(tmp_dir, "snapshot")
+            try:
+                result = {"cards": len(self.ai_bot.cards_data), **timings(DATA_FILES)}
+
+                files = _write_synthetic_catalogue(tmp_dir, synthetic_files)
+                synthetic = timings(files)
+                result["synthetic_cards"] = len(catalogue_snapshot.load_catalogue(files)["card_parts"])
+                result.update({f"synthetic_{key}": value for key, value in synthetic.items()})
+            finally:
+                if previous_dir is None:
+                    os.environ.pop("CARD_SNAPSHOT_DIR", None)
+                else:
+                    os.environ["CARD_SNAPSHOT_DIR"] = previous_dir
+        self.results["cold_start"] = result
+        return result
+
+    def benchmark_card_registry(self, synthetic_files: int = 600, max_loaded_cards: int = 64) -> Dict:
+        """
+        CardRegistry on a synthetic catalogue: index build, alias resolution, how many card bodies
+        stay in memory after every card has been read once, and the registry's memory against the
+        snapshot file size (bodies are read from the file, not held).
+        """
+        import tracemalloc
+        from utils.card_registry import CardRegistry
+
+        previous_dir = os.environ.get("CARD_SNAPSHOT_DIR")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.environ["CARD_SNAPSHOT_DIR"] = os.path.join(tmp_dir, "snapshot")
+            try:
+                files = _write_synthetic_catalogue(tmp_dir, synthetic_files)
+                CardRegistry(files)  # build the snapshot
+                tracemalloc.start()
+                CardRegistry(files, max_loaded_cards=max_loaded_cards)
+                index_bytes = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+                start = time.perf_counter()
+                registry = CardRegistry(files, max_loaded_cards=max_loaded_cards)
+                index_ms = (time.perf_counter() - start) * 1000
+                snapshot_dir = os.environ["CARD_SNAPSHOT_DIR"]
+                snapshot_bytes = sum(os.path.getsize(os.path.join(snapshot_dir, name)) for name in os.listdir(snapshot_dir))
+
+                query = f"compare atlas{synthetic_files - 2} and epm{synthetic_files - 1} for hotel spends"
+                resolve = _time_call(lambda: registry.resolve(query), 2000)
+                load = _time_call(lambda: [registry.cards[name] for name in registry.cards], 1)
+                result = {
+                    "cards": len(registry.cards),
+                    "index_from_snapshot_ms": round(index_ms, 2),
+                    "registry_mb": round(index_bytes / 1e6, 2),
+                    "snapshot_file_mb": round(snapshot_bytes / 1e6, 2),
+                    "resolve_us": resolve["cpu_us"],
+                    "resolved": len(registry.resolve(query)),
+                    "travel_cards": len(registry.cards_for_category("travel")),
+                    "read_all_cards_ms": round(load["wall_us"] / 1000, 2),
+                    "loaded_cards_after_read_all": registry.get_stats()["loaded_cards"]
+                }
+            finally:
+                if previous_dir is None:
+                    os.environ.pop("CARD_SNAPSHOT_DIR", None)
+                else:
+                    os.environ["CARD_SNAPSHOT_DIR"] = previous_dir
+        self.results["card_registry"] = result
+        return result
+
+    def benchmark_hot_reload(self, synthetic_files: int = 300, rounds: int = 5) -> Dict:
+        """
+        Hot reload on a synthetic catalogue after editing one file (only that file is re-parsed)
+        vs rebuilding the whole catalogue, and resolve() latency while reloads run.
+        """
+        from utils import catalogue_snapshot
+        from utils.card_registry import CardRegistry
+
+        previous_dir = os.environ.get("CARD_SNAPSHOT_DIR")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.environ["CARD_SNAPSHOT_DIR"] = os.path.join(tmp_dir, "snapshot")
+            try:
+                files = _write_synthetic_catalogue(tmp_dir, synthetic_files)
+                registry = CardRegistry(files)
+                with open(files[0], 'r') as f:
+                    data = json.load(f)
+
+                def edit_and_reload():
+                    data["cards"][0]["last_updated"] = f"edit {registry.version}"
+                    with open(files[0], 'w') as f:
+                        json.dump(data, f)
+                    registry.reload()
+
+                reload_timing = _time_call(edit_and_reload, rounds)
+                full_timing = _time_call(lambda: catalogue_snapshot.build_catalogue(files), rounds)
+                result = {
+                    "cards": len(registry.cards),
+                    "reload_one_file_ms": round(reload_timing["wall_us"] / 1000, 2),
+                    "full_rebuild_ms": round(full_timing["wall_us"] / 1000, 2),
+                    "resolve_us": _time_call(lambda: registry.resolve("atlas7 vs epm8"), 2000)["cpu_us"],
+                    "version": registry.version
+                }
+            finally:
+                if previous_dir is None:
+                    os.environ.pop("CARD_SNAPSHOT_DIR", None)
+                else:
+                    os.environ["CARD_SNAPSHOT_DIR"] = previous_dir
+        self.results["hot_reload"] = result
+        return result
+
+    def benchmark_section_retrieval(self, rounds: int = 200) -> Dict:
+        """
+        BM25 section retrieval: per-card search latency over the example and logged queries, and
+        the card data tokens of the retrieved excerpts vs whole cards.
+        """
+        from utils.prompt_serializer import compact_json, estimate_tokens
+
+        bot = self.ai_bot
+        queries = [query for group in bot.example_queries.values() for query in group] + _load_logged_queries()[:100]
+        queries = [bot._preprocess_currency(query) for query in queries]
+        name_terms = bot.registry.name_terms()
+        indexes = [bot.registry.section_index(card) for card in bot.cards_data]
+
+        def search_all():
+            for query in queries:
+                for index in indexes:
+                    index.search(query, bot.section_top_k, name_terms)
+
+        search = _time_call(search_all, max(1, rounds // 20))
+        extract = _time_call(lambda: [bot._extract_relevant_data(query) for query in queries], max(1, rounds // 20))
+        excerpt_tokens = [estimate_tokens(compact_json(card)) for query in queries
+                          for card in bot._extract_relevant_data(query).values()]
+        card_tokens = {name: estimate_tokens(compact_json(bot.cards_data[name])) for name in bot.cards_data}
+        result = {
+            "queries": len(queries),
+            "indexed_paths": sum(len(index.paths) for index in indexes),
+            "search_us_per_card": round(search["cpu_us"] / (len(queries) * len(indexes)), 2),
+            "extract_us_per_query": round(extract["cpu_us"] / len(queries), 2),
+            "avg_excerpt_tokens": round(sum(excerpt_tokens) / len(excerpt_tokens)),
+            "avg_card_tokens": round(sum(card_tokens.values()) / len(card_tokens))
+        }
+        self.results["section_retrieval"] = result
+        return result
+
+    def benchmark_field_lookup(self, rounds: int = 2000) -> Dict:
+        """
+        Dotted-path field lookups: chained .get() traversal against one probe of the card's path
+        index, and exclusion matching by scanning each entry against the compiled word prefixes.
+        """
+        import re
+        from utils.reward_rules import EXCLUSION_KEYWORDS, _find_exclusion, canonical_category, get_reward_table
+        from utils.fast_path import CATEGORY_KEYWORDS
+
+        registry = self.ai_bot.registry
+        paths = ["rewards.rate_general", "rewards.spend_exclusion_policy.categories",
+                 "rewards.capping_per_statement_cycle", "tier_structure.spend_exclusion_policy",
+                 "milestone_eligibility.spend_exclusion_policies", "fees.annual_fee"]
+        keys = [tuple(path.split('.')) for path in paths]
+        cards = [(registry.get(name), registry.path_index(name)) for name in registry.index]
+
+        def traverse(card, path_keys):
+            value = card
+            for key in path_keys:
+                value = value.get(key, {}) if isinstance(value, dict) else {}
+            return value
+
+        chained = _time_call(lambda: [traverse(card, path_keys) for card, _ in cards for path_keys in keys], rounds)
+        probed = _time_call(lambda: [index.get(path, {}) for _, index in cards for path in paths], rounds)
+        mismatches = sum(traverse(card, path_keys) != index.get(path, {})
+                         for card, index in cards for path, path_keys in zip(paths, keys))
+
+        tables = [table for table in (get_reward_table(card) for card, _ in cards) if table]
+        categories = [canonical_category(category) for category in CATEGORY_KEYWORDS]
+
+        def scan(table, canonical):
+            keywords = EXCLUSION_KEYWORDS.get(canonical, [canonical])
+            return next((exclusion for exclusion in table["exclusions"]
+                         if any(re.search(r'\b' + re.escape(keyword), exclusion.lower()) for keyword in keywords)), None)
+
+        scanned = _time_call(lambda: [scan(table, category) for table in tables for category in categories], rounds // 10)
+        indexed = _time_call(lambda: [_find_exclusion(table, category) for table in tables for category in categories], rounds // 10)
+        mismatches += sum(scan(table, category) != _find_exclusion(table, category) for table in tables for category in categories)
+
+        lookups = len(cards) * len(paths)
+        checks = len(tables) * len(categories)
+        result = {
+            "cards": len(cards),
+            "indexed_paths": sum(len(index) for _, index in cards),
+            "chained_get_us_per_lookup": round(chained["cpu_us"] / lookups, 3),
+            "path_index_us_per_lookup": round(probed["cpu_us"] / lookups, 3),
+            "exclusion_scan_us_per_check": round(scanned["cpu_us"] / checks, 3),
+            "exclusion_index_us_per_check": round(indexed["cpu_us"] / checks, 3),
+            "mismatches": mismatches
+        }
+        self.results["field_lookup"] = result
+        return result
+
+    def benchmark_pipeline_throughput(self, num_queries: int = 40, concurrency: int = 8,
+                                      latency_spec: str = "lognormal:-0.7,0.4") -> Dict:
+        """
+        End-to-end async pipeline throughput against a replay provider with synthetic latency
+        (default median ~0.5s). Cache and fast path are off so every query reaches the provider.
+        """
+        from utils.admission import PRIORITY_BATCH
+        from utils.ai_powered_qa_engine import AIPoweredCreditCardBot
+        from utils.provider_cassettes import LatencyModel, ReplayProvider
+
+        provider = ReplayProvider("gemini", tempfile.mkdtemp(prefix="cassettes-"),
+                                  LatencyModel(latency_spec, seed=0), on_miss="placeholder")
+        bot = AIPoweredCreditCardBot(DATA_FILES, providers=[provider])
+        bot.response_cache = None
+        bot.fast_path = None
+
+        base_queries = [query for queries in bot.example_queries.values() for query in queries]
+        queries = [f"{base_queries[i % len(base_queries)]} (variant {i})" for i in range(num_queries)]
+
+        async def run_batch() -> List[float]:
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def timed(query: str) -> float:
+                async with semaphore:
+                    started = time.perf_counter()
+                    await bot.aprocess_query(query, priority=PRIORITY_BATCH)
+                    return time.perf_counter() - started
+
+            return await asyncio.gather(*(timed(query) for query in queries))
+
+        wall_start = time.perf_counter()
+        latencies = sorted(asyncio.run(run_batch()))
+        wall_seconds = time.perf_counter() - wall_start
+
+        result = {
+            "queries": num_queries,
+            "concurrency": concurrency,
+            "synthetic_latency": latency_spec,
+            "wall_seconds": round(wall_seconds, 3),
+            "throughput_qps": round(num_queries / wall_seconds, 2),
+            "p50_latency_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+            "p95_latency_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+            "replay": provider.get_stats(),
+            "admission": bot.get_admission_stats()
+        }
+        self.results["pipeline_throughput"] = result
+        return result
+
+    def run_all(self) -> Dict:
+        """Run every benchmark and return the collected results."""
+        self.benchmark_system_prompt()
+        self.benchmark_fast_path()
+        self.benchmark_intent_detection()
+        self.benchmark_reward_batch()
+        self.benchmark_spend_optimizer()
+        self.benchmark_year_simulation()
+        self.benchmark_cold_start()
+        self.benchmark_card_registry()
+        self.benchmark_hot_reload()
+        self.benchmark_section_retrieval()
+        self.benchmark_field_lookup()
+        self.benchmark_pipeline_throughput()
+        return self.results
+
+    def generate_report(self) -> str:
+        """Format results as a plain-text report."""
+        report = ["=" * 60, "⏱️  PERFORMANCE BENCHMARK REPORT", "=" * 60]
+        for name, result in self.results.items():
+            report.append(f"\n📁 {name}")
+            report.append("-" * 60)
+            for key, value in result.items():
+                report.append(f"{key}: {value}")
+        return "\n".join(report)
+
+
+def main():
+    """Main function to run benchmarks"""
+    benchmark = PerformanceBenchmark()
+    benchmark.run_all()
+    print(benchmark.generate_report())
+
+
+if __name__ == "__main__":
+    main()
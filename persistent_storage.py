@@ -8,6 +8,8 @@ import os
 import tempfile
 from typing import Dict, List, Optional
 
+from utils.client_registry import HTTP_TIMEOUT_SECONDS, get_client_stats, get_http_session
+
 # Optional Streamlit import
 try:
     import streamlit as st
@@ -192,11 +194,13 @@ class PersistentStorageManager:
             pass
         return []
     
+    def get_connection_stats(self) -> Dict:
+        """Connection reuse of the shared HTTP session (requests vs. new connections per host)."""
+        return get_client_stats()
+    
     # GitHub Gist operations
     def _save_to_github_gist(self, filename: str, data: List[Dict]) -> bool:
         """Save data to GitHub Gist."""
-        import requests
-        
         try:
             gist_id = st.secrets['GIST_ID']
             github_token = st.secrets['GITHUB_TOKEN']
@@ -214,10 +218,11 @@ class PersistentStorageManager:
                 }
             }
             
-            response = requests.patch(
+            response = get_http_session().patch(
                 f'https://api.github.com/gists/{gist_id}',
                 headers=headers,
-                json=payload
+                json=payload,
+                timeout=HTTP_TIMEOUT_SECONDS
             )
             
             return response.status_code == 200
@@ -227,8 +232,6 @@ class PersistentStorageManager:
     
     def _load_from_github_gist(self, filename: str) -> List[Dict]:
         """Load data from GitHub Gist."""
-        import requests
-        
         try:
             gist_id = st.secrets['GIST_ID']
             github_token = st.secrets['GITHUB_TOKEN']
@@ -238,9 +241,10 @@ class PersistentStorageManager:
                 'Accept': 'application/vnd.github.v3+json'
             }
             
-            response = requests.get(
+            response = get_http_session().get(
                 f'https://api.github.com/gists/{gist_id}',
-                headers=headers
+                headers=headers,
+                timeout=HTTP_TIMEOUT_SECONDS
             )
             
             if response.status_code == 200:
@@ -257,8 +261,6 @@ class PersistentStorageManager:
     # HTTP storage operations (for custom endpoints)
     def _save_to_http_storage(self, filename: str, data: List[Dict]) -> bool:
         """Save data to HTTP storage endpoint."""
-        import requests
-        
         try:
             endpoint = st.secrets['STORAGE_ENDPOINT']
             api_key = st.secrets.get('STORAGE_API_KEY', '')
@@ -269,7 +271,7 @@ class PersistentStorageManager:
                 'api_key': api_key
             }
             
-            response = requests.post(f'{endpoint}/save', json=payload)
+            response = get_http_session().post(f'{endpoint}/save', json=payload, timeout=HTTP_TIMEOUT_SECONDS)
             return response.status_code == 200
             
         except Exception:
@@ -277,8 +279,6 @@ class PersistentStorageManager:
     
     def _load_from_http_storage(self, filename: str) -> List[Dict]:
         """Load data from HTTP storage endpoint."""
-        import requests
-        
         try:
             endpoint = st.secrets['STORAGE_ENDPOINT']
             api_key = st.secrets.get('STORAGE_API_KEY', '')
@@ -288,7 +288,7 @@ class PersistentStorageManager:
                 'api_key': api_key
             }
             
-            response = requests.get(f'{endpoint}/load', params=params)
+            response = get_http_session().get(f'{endpoint}/load', params=params, timeout=HTTP_TIMEOUT_SECONDS)
             
             if response.status_code == 200:
                 return response.json().get('data', [])
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Card Registry Tests
+Checks card aliases and indexes built from data/*.json and hot reloads that swap in a new
+catalogue state (changed, broken and removed data files).
+Run with: python -m pytest -q test_card_registry.py
+"""
+
+import json
+import os
+import shutil
+
+import pytest
+
+from utils.card_registry import CardRegistry, discover_data_files
+from utils.reward_rules import _table_cache, get_reward_table
+
+ATLAS = "Axis Bank Atlas Credit Card"
+EPM = "ICICI Bank Emeralde Private Metal Credit Card"
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """A private copy of data/ with its own snapshot directory."""
+    monkeypatch.setenv("CARD_SNAPSHOT_DIR", str(tmp_path / "snapshot"))
+    directory = tmp_path / "data"
+    directory.mkdir()
+    for path in discover_data_files():
+        shutil.copy(path, directory)
+    return directory
+
+
+def _edit_card(path, edit):
+    with open(path) as f:
+        data = json.load(f)
+    edit(data["cards"][0])
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+def test_aliases_name_single_cards():
+    registry = CardRegistry()
+    assert registry.resolve("atlas vs epm for hotels") == [ATLAS, EPM]
+    assert registry.resolve("emeralde lounge access") == [EPM]
+    assert registry.resolve("axis card fees") == [ATLAS]
+
+
+def test_generic_name_words_are_not_aliases():
+    registry = CardRegistry()
+    for word in ["metal", "private", "credit", "bank", "card"]:
+        assert word not in registry.by_alias
+    assert registry.resolve("Which metal card is better for travel?") == []
+    assert registry.resolve("Which card gives private lounge access?") == []
+
+
+def test_unstated_network_is_unknown():
+    registry = CardRegistry()
+    assert registry.cards_for_network("visa") == [ATLAS]
+    assert all(EPM not in cards for cards in registry.by_network.values())
+
+
+def test_reload_swaps_in_changed_card(data_dir):
+    registry = CardRegistry(discover_data_files(str(data_dir)))
+    swaps = []
+    registry.add_listener(lambda reg: swaps.append(reg.version))
+    assert registry.field(ATLAS, "fees.annual_fee") == "₹5,000 + GST"
+    assert registry.reload() is False  # nothing changed
+
+    _edit_card(data_dir / "axis-atlas.json", lambda card: card["fees"].update(annual_fee="₹10,000 + GST"))
+    assert registry.reload() is True
+    assert registry.version == 2
+    assert swaps == [2]
+    assert registry.field(ATLAS, "fees.annual_fee") == "₹10,000 + GST"
+    assert registry.stats["reloads"] == 1
+
+
+def test_reload_keeps_tables_of_unchanged_cards(data_dir):
+    registry = CardRegistry(discover_data_files(str(data_dir)))
+    atlas, epm = registry.get(ATLAS), registry.get(EPM)
+    get_reward_table(atlas), get_reward_table(epm)
+
+    _edit_card(data_dir / "axis-atlas.json", lambda card: card["fees"].update(annual_fee="₹10,000 + GST"))
+    assert registry.reload() is True
+    # Requests still holding the old EPM dict keep its compiled table; the changed card's is dropped
+    assert id(epm) in _table_cache
+    assert id(atlas) not in _table_cache
+
+
+def test_broken_file_keeps_current_state(data_dir):
+    registry = CardRegistry(discover_data_files(str(data_dir)))
+    with open(data_dir / "axis-atlas.json", "w") as f:
+        f.write("{ not json")
+    assert registry.reload() is False
+    assert registry.version == 1
+    assert registry.stats["rejected_reloads"] == 1
+    assert registry.get(ATLAS) is not None
+
+
+def test_new_and_removed_files_are_picked_up(tmp_path, monkeypatch):
+    monkeypatch.setenv("CARD_SNAPSHOT_DIR", str(tmp_path / "snapshot"))
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("data")
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "axis-atlas.json"), "data")
+    registry = CardRegistry()  # rescans data/ on every reload
+    assert list(registry.index) == [ATLAS]
+
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "icici-epm.json"), "data")
+    assert registry.reload() is True
+    assert list(registry.index) == [ATLAS, EPM]
+
+    os.remove(os.path.join("data", "axis-atlas.json"))
+    assert registry.reload() is True
+    assert list(registry.index) == [EPM]
+    assert registry.get(ATLAS) is None
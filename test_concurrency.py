@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Concurrency Tests
+Checks request coalescing, hedged calls, admission control and streamed failover with
+concurrent callers and injected slow or failing providers (no network access needed).
+Run with: python -m pytest -q test_concurrency.py
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.admission import (PRIORITY_BATCH, PRIORITY_INTERACTIVE, PRIORITY_PREFETCH, AdmissionController,
+                             AdmissionTimeoutError, QueueFullError)
+from utils.circuit_breaker import OPEN, AllProvidersFailedError, CircuitBreaker, ProviderCircuitRouter
+from utils.hedging import HedgedCaller
+from utils.llm_providers import FakeProvider
+from utils.request_coalescer import CoalescedCallError, SingleFlight
+
+
+def _run_threads(targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+
+# Request coalescing
+
+def test_concurrent_streams_share_one_call():
+    flight = SingleFlight(timeout_seconds=2)
+    calls = []
+
+    def stream_func():
+        calls.append(1)
+        for chunk in ["a", "b", "c"]:
+            time.sleep(0.05)
+            yield chunk
+
+    answers = []
+    _run_threads([lambda: answers.append("".join(flight.stream("key", stream_func))) for _ in range(4)])
+    assert answers == ["abc"] * 4
+    assert len(calls) == 1
+    stats = flight.get_stats()
+    assert (stats["leaders"], stats["coalesced"], stats["in_flight"]) == (1, 3, 0)
+
+
+def test_stream_error_reaches_followers():
+    flight = SingleFlight(timeout_seconds=2)
+
+    def stream_func():
+        time.sleep(0.1)
+        yield "a"
+        raise ConnectionError("provider dropped")
+
+    errors = []
+
+    def consume():
+        try:
+            list(flight.stream("key", stream_func))
+        except ConnectionError as e:
+            errors.append(e)
+
+    _run_threads([consume for _ in range(3)])
+    assert len(errors) == 3
+
+
+def test_abandoned_leader_releases_followers():
+    flight = SingleFlight(timeout_seconds=2)
+    started = threading.Event()
+
+    def stream_func():
+        yield "a"
+        started.set()
+        time.sleep(0.2)
+        yield "b"
+
+    leader = flight.stream("key", stream_func)
+    assert next(leader) == "a"
+    results = []
+
+    def follow():
+        try:
+            results.append("".join(flight.stream("key", stream_func)))
+        except CoalescedCallError as e:
+            results.append(e)
+
+    follower = threading.Thread(target=follow)
+    follower.start()
+    started.wait(1)
+    leader.close()
+    follower.join(timeout=5)
+    assert len(results) == 1 and isinstance(results[0], CoalescedCallError)
+
+
+def test_async_callers_share_one_result():
+    flight = SingleFlight(timeout_seconds=2)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def main():
+        return await asyncio.gather(*[flight.ado("key", call) for _ in range(5)])
+
+    assert asyncio.run(main()) == [42] * 5
+    assert len(calls) == 1
+
+
+def test_async_follower_times_out_without_cancelling_leader():
+    flight = SingleFlight(timeout_seconds=0.05)
+
+    async def call():
+        await asyncio.sleep(0.2)
+        return "done"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.ado("key", call))
+        await asyncio.sleep(0)
+        with pytest.raises(TimeoutError):
+            await flight.ado("key", call)
+        return await leader
+
+    assert asyncio.run(main()) == "done"
+    assert flight.get_stats()["timeouts"] == 1
+
+
+# Hedged calls
+
+def _hedged(primary_delay, primary_error=None, secondary_delay=0.01):
+    hedger = HedgedCaller(default_deadline_seconds=0.05)
+
+    async def primary():
+        await asyncio.sleep(primary_delay)
+        if primary_error:
+            raise primary_error
+        return "primary"
+
+    async def secondary():
+        await asyncio.sleep(secondary_delay)
+        return "secondary"
+
+    return asyncio.run(hedger.call("gemini", primary, "openai", secondary)), hedger.get_stats()
+
+
+def test_fast_primary_is_not_hedged():
+    result, stats = _hedged(0.01)
+    assert result == "primary"
+    assert stats["hedged"] == 0 and stats["wins"] == {"gemini": 1}
+
+
+def test_slow_primary_is_hedged_and_loses():
+    result, stats = _hedged(0.5)
+    assert result == "secondary"
+    assert stats["hedged"] == 1 and stats["wins"] == {"openai": 1}
+
+
+def test_failed_primary_is_hedged_after_error():
+    result, stats = _hedged(0.01, ConnectionError("down"))
+    assert result == "secondary"
+    assert stats["hedged_after_error"] == 1
+
+
+# Admission control
+
+def _drained(requests_per_minute=600, tokens_per_minute=600000, **options):
+    """A controller whose request bucket is empty (refills 10 requests/s at the defaults)."""
+    controller = AdmissionController(requests_per_minute, tokens_per_minute, **options)
+    controller.request_bucket.consume(controller.request_bucket.level)
+    return controller
+
+
+def test_higher_priority_is_admitted_first():
+    controller = _drained()
+    order = []
+
+    def acquire(priority):
+        controller.acquire(priority)
+        order.append(priority)
+
+    threads = []
+    for priority in [PRIORITY_BATCH, PRIORITY_PREFETCH, PRIORITY_INTERACTIVE]:
+        thread = threading.Thread(target=acquire, args=(priority,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.01)  # queue them in this order
+    for thread in threads:
+        thread.join(timeout=5)
+    assert order == [PRIORITY_INTERACTIVE, PRIORITY_PREFETCH, PRIORITY_BATCH]
+
+
+def test_queue_depth_and_timeout_are_enforced():
+    controller = _drained(requests_per_minute=6, max_queue_depth=1, queue_timeout_seconds=0.2)
+    errors = []
+
+    def acquire():
+        try:
+            controller.acquire(PRIORITY_BATCH)
+        except (QueueFullError, AdmissionTimeoutError) as e:
+            errors.append(type(e))
+
+    _run_threads([acquire, acquire])
+    assert sorted(error.__name__ for error in errors) == ["AdmissionTimeoutError", "QueueFullError"]
+    assert controller.get_stats()["queue_depth"] == 0
+
+
+def test_unused_tokens_are_credited_back():
+    controller = AdmissionController(600, 10000)
+    controller.acquire(PRIORITY_INTERACTIVE, tokens=4000)
+    level = controller.token_bucket.level
+    controller.release_unused(3000)
+    assert controller.token_bucket.level == pytest.approx(min(10000, level + 3000), abs=50)
+
+
+def test_cancelled_async_waiter_leaves_the_queue():
+    controller = _drained(requests_per_minute=6)
+
+    async def main():
+        task = asyncio.ensure_future(controller.aacquire(PRIORITY_BATCH))
+        await asyncio.sleep(0.05)
+        assert controller.get_stats()["queue_depth"] == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert controller.get_stats()["queue_depth"] == 0
+
+
+# Circuit breakers and streamed failover
+
+def test_stream_fails_over_when_first_chunk_is_late():
+    slow = FakeProvider("slow", response="slow answer", latency_seconds=2)
+    fast = FakeProvider("fast", response="fast answer")
+    router = ProviderCircuitRouter([slow, fast], min_timeout_seconds=0.1, max_timeout_seconds=0.2)
+    assert "".join(router.stream(lambda provider: provider.stream("system", "question"))) == "fast answer"
+    assert router.get_stats()["slow"]["failures"] == 1
+
+
+def test_stream_stalling_after_first_chunk_is_a_failure():
+    class Stalled:
+        name = "stalled"
+
+    def stall(provider):
+        yield "partial"
+        time.sleep(2)
+        yield "never"
+
+    router = ProviderCircuitRouter([Stalled()], min_timeout_seconds=0.1, max_timeout_seconds=0.2)
+    received = []
+    with pytest.raises(TimeoutError):
+        for chunk in router.stream(stall):
+            received.append(chunk)
+    assert received == ["partial"]
+    assert router.get_stats()["stalled"]["failures"] == 1
+
+
+def test_all_providers_failing_raises():
+    bad = FakeProvider("bad", error_rate=1.0)
+    router = ProviderCircuitRouter([bad])
+    with pytest.raises(AllProvidersFailedError):
+        list(router.stream(lambda provider: provider.stream("system", "question")))
+
+
+def test_error_rate_window_trips_breaker():
+    breaker = CircuitBreaker("flaky", failure_threshold=3, error_rate_threshold=0.5, min_samples=10)
+    for call in range(11):
+        if call % 2:
+            breaker.record_success(0.1)
+        else:
+            breaker.record_failure()
+    # Never 3 failures in a row, but 6 of the last 11 calls failed
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
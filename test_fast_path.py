@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Fast Path Routing Tests
+Checks which queries FastPathRouter answers locally and which it leaves to the LLM.
+Run with: python -m pytest -q test_fast_path.py
+"""
+
+from utils.card_registry import CardRegistry
+from utils.fast_path import FastPathRouter
+
+ATLAS = "Axis Bank Atlas Credit Card"
+
+registry = CardRegistry()
+router = FastPathRouter(registry.cards, registry.resolve)
+
+
+def test_single_month_spend_is_answered_locally():
+    plan, reason = router.plan("If I spend ₹100000 on flights with atlas how many miles do I get?")
+    assert reason == ""
+    assert plan == ([ATLAS], 100000, "travel")
+    answer = router.route("If I spend ₹100000 on flights with atlas how many miles do I get?")
+    assert "5,000 EDGE Miles" in answer
+
+
+def test_monthly_spend_is_answered_locally():
+    plan, _ = router.plan("I spend ₹100000 per month on flights with atlas, how many miles?")
+    assert plan == ([ATLAS], 100000, "travel")
+
+
+def test_spend_over_several_months_goes_to_llm():
+    # ₹1L a month never reaches the ₹2L monthly cap, so one capped calculation of ₹3L would be wrong
+    for query in ["I will spend ₹300000 on flights over 3 months with Atlas",
+                  "I will spend ₹300000 on flights in 3-month period with Atlas, how many miles?",
+                  "How many miles for ₹300000 travel spend per quarter on atlas?",
+                  "How many miles for ₹300000 travel spend this year on atlas?",
+                  "Miles on atlas for ₹50000 of flights every week?"]:
+        plan, reason = router.plan(query)
+        assert plan is None, query
+        assert reason == "spend spans several months", query
+
+
+def test_point_and_mile_counts_are_not_spend():
+    for query in ["I have 10000 EDGE miles on Atlas, what can I do with them for travel?",
+                  "What are 5000 ICICI reward points worth on hotel bookings?",
+                  "₹5000 points on epm dining rewards"]:
+        assert router.plan(query)[0] is None, query
+
+
+def test_bare_number_is_not_spend():
+    plan, reason = router.plan("How many miles on atlas for 50000 travel?")
+    assert plan is None
+    assert reason == "no single spend amount"
+
+
+def test_reasoning_questions_go_to_llm():
+    plan, reason = router.plan("Which card is better for ₹300000 annual travel spend with milestones?")
+    assert plan is None
+    assert reason.startswith("needs reasoning")
+
+
+def test_comparison_without_card_uses_every_card():
+    plan, _ = router.plan("If I spend ₹100000 on hotel bookings which card gives more rewards?")
+    assert plan == (list(registry.index), 100000, "hotel")
+
+
+def test_decisions_are_counted():
+    local_router = FastPathRouter(registry.cards, registry.resolve)
+    local_router.route("If I spend ₹100000 on flights with atlas how many miles do I get?")
+    local_router.route("I will spend ₹300000 on flights over 3 months with Atlas")
+    stats = local_router.get_stats()
+    assert stats["local"] == 1 and stats["llm"] == 1
+    assert stats["local_categories"] == {"travel": 1}
+    assert stats["fallthrough_reasons"] == {"spend spans several months": 1}
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Reward Rules Tests
+Checks the declarative reward tables against figures from the original per-card calculator,
+batch vs single calculations, and the shared compiled-table cache under concurrent use.
+Run with: python -m pytest -q test_reward_rules.py
+"""
+
+import copy
+import threading
+
+import numpy as np
+
+from utils.card_registry import CardRegistry
+from utils.reward_calculator import calculate_rewards, calculate_rewards_batch
+from utils.reward_rules import forget_reward_table, get_reward_table
+
+ATLAS = "Axis Bank Atlas Credit Card"
+EPM = "ICICI Bank Emeralde Private Metal Credit Card"
+
+registry = CardRegistry()
+cards = registry.cards
+
+# (card, category, spend, units earned, flags) as returned by the original hand-written calculator
+BASELINE = [
+    (ATLAS, None, 100000, 2000, {}),
+    (ATLAS, "travel", 100000, 5000, {"monthly_cap_applied": False}),
+    (ATLAS, "travel", 250000, 11000, {"monthly_cap_applied": True}),
+    (ATLAS, "hotel", 200050, 10000, {"monthly_cap_applied": True}),
+    (ATLAS, "airline", 199, 5, {"monthly_cap_applied": False}),
+    (ATLAS, "dining", 50000, 1000, {}),
+    (ATLAS, "education", 50000, 1000, {}),
+    (ATLAS, "fuel", 50000, 0, {"excluded": True}),
+    (ATLAS, "utility", 33400, 0, {"excluded": True}),
+    (ATLAS, "rent", 50000, 0, {"excluded": True}),
+    (ATLAS, "government", 50000, 0, {"excluded": True}),
+    (ATLAS, "insurance", 50000, 0, {"excluded": True}),
+    (ATLAS, "gold", 50000, 0, {"excluded": True}),
+    (ATLAS, "wallet", 50000, 0, {"excluded": True}),
+    (EPM, None, 100000, 3000, {}),
+    (EPM, None, 199, 0, {}),
+    (EPM, "travel", 100000, 3000, {}),
+    (EPM, "gold", 200000, 6000, {}),
+    (EPM, "utility", 50000, 1000, {"cap_applied": True, "cap_amount": 1000}),
+    (EPM, "utility", 1000000, 1000, {"cap_applied": True, "cap_amount": 1000}),
+    (EPM, "insurance", 250000, 5000, {"cap_applied": True, "cap_amount": 5000}),
+    (EPM, "grocery", 1000000, 1000, {"cap_applied": True, "cap_amount": 1000}),
+    (EPM, "education", 1000000, 1000, {"cap_applied": True, "cap_amount": 1000}),
+    (EPM, "rent", 50000, 0, {"excluded": True}),
+    (EPM, "government", 50000, 0, {"excluded": True}),
+    (EPM, "tax", 50000, 0, {"excluded": True}),
+    (EPM, "fuel", 50000, 0, {"excluded": True}),
+    (EPM, "emi", 50000, 0, {"excluded": True}),
+]
+
+
+def _units(result):
+    return result["miles_earned"] if "miles_earned" in result else result["points_earned"]
+
+
+def test_matches_baseline_calculator():
+    for card, category, spend, units, flags in BASELINE:
+        result = calculate_rewards(cards, card, spend, category)
+        assert _units(result) == units, (card, category, spend)
+        for key, value in flags.items():
+            assert result.get(key) == value, (card, category, spend, key)
+
+
+def test_unknown_card_is_an_error():
+    assert "error" in calculate_rewards(cards, "No Such Card", 1000, "travel")
+
+
+def test_batch_matches_single_calculations():
+    categories = sorted({category for _, category, _, _, _ in BASELINE if category}) + [None]
+    spends = [[5000 * (j + 1) for j in range(len(categories))], [250000] * len(categories)]
+    batch = calculate_rewards_batch(cards, spends, [ATLAS, EPM], categories)
+    for profile, row in enumerate(spends):
+        for i, card in enumerate([ATLAS, EPM]):
+            expected = [_units(calculate_rewards(cards, card, spend, category)) for spend, category in zip(row, categories)]
+            assert np.allclose(batch["earned"][profile, i], expected), (card, profile)
+
+
+def test_table_is_compiled_once_per_card_dict():
+    card = copy.deepcopy(cards[ATLAS])
+    table = get_reward_table(card)
+    assert get_reward_table(card) is table
+    # An equal but distinct dict (e.g. reloaded data) gets its own table
+    assert get_reward_table(copy.deepcopy(card)) is not table
+    forget_reward_table(card)
+    assert get_reward_table(card) is not table
+
+
+def test_table_cache_is_thread_safe():
+    copies = [copy.deepcopy(cards[ATLAS]) for _ in range(32)]
+    errors = []
+
+    def worker():
+        try:
+            for i in range(2000):
+                card = copies[i % len(copies)]
+                assert get_reward_table(card)["base"] is not None
+                if i % 5 == 0:
+                    forget_reward_table(card)
+        except Exception as e:  # collected; asserting in a thread would be lost
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
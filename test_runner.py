@@ -12,7 +12,7 @@ from utils.qa_engine import RichDataCreditCardBot
 
 class TestRunner:
     def __init__(self):
-        self.bot = RichDataCreditCardBot(data_files=['data/axis-atlas.json', 'data/icici-epm.json'])
+        self.bot = RichDataCreditCardBot()  # every card file under data/
         self.test_cases = self._load_test_cases()
         self.results = []
         
@@ -0,0 +1,252 @@
+"""
+Admission Control for LLM Calls
+Token buckets for requests-per-minute and tokens-per-minute, sized from the provider's quota,
+with a priority queue in front of them: interactive chat queries are admitted before
+quick-question prefetches, which are admitted before batch/test traffic.
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_PREFETCH = 1
+PRIORITY_BATCH = 2
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_PREFETCH: "prefetch",
+    PRIORITY_BATCH: "batch"
+}
+
+# Published per-minute quotas of the default models (paid tier 1); override with LLM_RATE_LIMIT_*
+PROVIDER_QUOTAS = {
+    "gemini": {"requests_per_minute": 2000, "tokens_per_minute": 4_000_000},
+    "openai": {"requests_per_minute": 3500, "tokens_per_minute": 200_000}
+}
+
+
+class AdmissionError(RuntimeError):
+    """Raised when an LLM call is not admitted (queue full or waited too long)."""
+
+
+class QueueFullError(AdmissionError):
+    """Raised immediately when the admission queue is at its maximum depth."""
+
+
+class AdmissionTimeoutError(AdmissionError):
+    """Raised when a queued call is not admitted within the queue timeout."""
+
+
+class TokenBucket:
+    """Classic token bucket. Not thread-safe on its own; AdmissionController holds the lock."""
+
+    def __init__(self, capacity: float, refill_per_second: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.clock = clock
+        self.level = capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until amount can be taken (0 if it can be taken now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.refill_per_second
+
+    def consume(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def credit(self, amount: float):
+        """Return unused tokens (e.g. when a call produced fewer tokens than reserved)."""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class _Waiter:
+    """A queued call; woken through a threading.Event (sync) or an asyncio.Event on its loop."""
+
+    def __init__(self, priority: int, seq: int, tokens: int, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.loop = loop
+        self.event = asyncio.Event() if loop else threading.Event()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wake(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.event.set)
+        else:
+            self.event.set()
+
+
+class AdmissionController:
+    """
+    Admits calls in priority order (FIFO within a priority) once both buckets can cover them.
+    Only the head of the queue takes tokens, so a large batch call cannot be overtaken forever
+    by later batch calls, and an interactive call arriving later still goes first.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float,
+                 max_queue_depth: int = 200, queue_timeout_seconds: float = 30.0, window_size: int = 500):
+        self.request_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.max_queue_depth = max_queue_depth
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.window_size = window_size
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._waits = {priority: deque(maxlen=window_size) for priority in PRIORITY_NAMES}
+        self.stats = {
+            "admitted": {name: 0 for name in PRIORITY_NAMES.values()},
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "timed_out": 0,
+            "max_queue_depth_seen": 0
+        }
+
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE, tokens: int = 0,
+                timeout_seconds: Optional[float] = None) -> float:
+        """Block until admitted; returns the seconds spent waiting."""
+        waiter = self._enqueue(priority, tokens, None)
+        deadline = waiter.enqueued + (timeout_seconds or self.queue_timeout_seconds)
+        try:
+            while True:
+                waiter.event.clear()
+                wait = self._try_admit(waiter)
+                if wait == 0:
+                    return time.monotonic() - waiter.enqueued
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timed_out(waiter)
+                waiter.event.wait(min(wait, remaining))
+        finally:
+            self._leave(waiter)
+
+    async def aacquire(self, priority: int = PRIORITY_INTERACTIVE, tokens: int = 0,
+                       timeout_seconds: Optional[float] = None) -> float:
+        """Async acquire(); cancelling the awaiting task removes it from the queue."""
+        waiter = self._enqueue(priority, tokens, asyncio.get_running_loop())
+        deadline = waiter.enqueued + (timeout_seconds or self.queue_timeout_seconds)
+        try:
+            while True:
+                waiter.event.clear()
+                wait = self._try_admit(waiter)
+                if wait == 0:
+                    return time.monotonic() - waiter.enqueued
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timed_out(waiter)
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), timeout=min(wait, remaining))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._leave(waiter)
+
+    def release_unused(self, tokens: int):
+        """Credit back reserved tokens a call did not use."""
+        if tokens > 0:
+            with self._lock:
+                self.token_bucket.credit(tokens)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, admissions, rejections and wait-time percentiles per priority."""
+        with self._lock:
+            stats = {key: (dict(value) if isinstance(value, dict) else value) for key, value in self.stats.items()}
+            stats["queue_depth"] = len(self._queue)
+            stats["requests_available"] = round(self.request_bucket.level, 1)
+            stats["tokens_available"] = round(self.token_bucket.level)
+            waits = {priority: sorted(samples) for priority, samples in self._waits.items()}
+        stats["wait_ms"] = {
+            PRIORITY_NAMES.get(priority, str(priority)): {
+                "p50": round(samples[len(samples) // 2] * 1000, 1),
+                "p95": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 1)
+            }
+            for priority, samples in waits.items() if samples
+        }
+        return stats
+
+    def _enqueue(self, priority: int, tokens: int, loop: Optional[asyncio.AbstractEventLoop]) -> _Waiter:
+        with self._lock:
+            if len(self._queue) >= self.max_queue_depth:
+                self.stats["rejected_queue_full"] += 1
+                raise QueueFullError(f"Admission queue is full ({self.max_queue_depth} calls waiting)")
+            waiter = _Waiter(priority, next(self._seq), tokens, loop)
+            heapq.heappush(self._queue, waiter)
+            self.stats["queued"] += 1
+            self.stats["max_queue_depth_seen"] = max(self.stats["max_queue_depth_seen"], len(self._queue))
+            return waiter
+
+    def _try_admit(self, waiter: _Waiter) -> float:
+        """Admit waiter if it heads the queue and the buckets allow; else seconds to wait (inf = until woken)."""
+        with self._lock:
+            if not self._queue or self._queue[0] is not waiter:
+                return float("inf")
+            wait = max(self.request_bucket.time_until(1), self.token_bucket.time_until(waiter.tokens))
+            if wait > 0:
+                return wait
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(waiter.tokens)
+            heapq.heappop(self._queue)
+            name = PRIORITY_NAMES.get(waiter.priority, str(waiter.priority))
+            self.stats["admitted"][name] = self.stats["admitted"].get(name, 0) + 1
+            self._waits.setdefault(waiter.priority, deque(maxlen=self.window_size)).append(time.monotonic() - waiter.enqueued)
+            if self._queue:
+                self._queue[0].wake()
+            return 0.0
+
+    def _timed_out(self, waiter: _Waiter):
+        with self._lock:
+            self.stats["timed_out"] += 1
+        raise AdmissionTimeoutError(
+            f"Not admitted within {time.monotonic() - waiter.enqueued:.1f}s (provider rate limit)"
+        )
+
+    def _leave(self, waiter: _Waiter):
+        """Drop a waiter that gave up (timeout, cancellation) and wake whoever heads the queue now."""
+        with self._lock:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+                if self._queue:
+                    self._queue[0].wake()
+
+
+def create_admission_controller(provider_name: str) -> Optional[AdmissionController]:
+    """
+    Controller sized from the provider's quota times LLM_RATE_LIMIT_HEADROOM, or from
+    LLM_RATE_LIMIT_RPM / LLM_RATE_LIMIT_TPM. Returns None when no quota is known for the
+    provider or LLM_ADMISSION is off.
+    """
+    if os.getenv("LLM_ADMISSION", "1").lower() in ("0", "false", "no"):
+        return None
+    quota = PROVIDER_QUOTAS.get(provider_name, {})
+    headroom = float(os.getenv("LLM_RATE_LIMIT_HEADROOM", "0.9"))
+    requests_per_minute = float(os.getenv("LLM_RATE_LIMIT_RPM", "0")) or quota.get("requests_per_minute", 0) * headroom
+    tokens_per_minute = float(os.getenv("LLM_RATE_LIMIT_TPM", "0")) or quota.get("tokens_per_minute", 0) * headroom
+    if not requests_per_minute or not tokens_per_minute:
+        return None
+    return AdmissionController(
+        requests_per_minute,
+        tokens_per_minute,
+        max_queue_depth=int(os.getenv("ADMISSION_MAX_QUEUE_DEPTH", "200")),
+        queue_timeout_seconds=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "30"))
+    )
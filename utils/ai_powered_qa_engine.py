@@ -6,16 +6,27 @@ Replaces regex-based intent detection with intelligent AI processing.
 import os
 import re
 import json
-import openai
+import asyncio
+import hashlib
+from collections import deque
 from dotenv import load_dotenv
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, Iterator
 
-# Try to import Google's Gemini
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+from utils.admission import PRIORITY_BATCH, PRIORITY_INTERACTIVE, AdmissionError, create_admission_controller
+from utils.card_registry import CardRegistry
+from utils.circuit_breaker import AllProvidersFailedError, create_circuit_router
+from utils.conversation_memory import ConversationMemory
+from utils.engine_loop import BackgroundEventLoop
+from utils.fast_path import FastPathRouter
+from utils.hedging import HedgedCaller
+from utils.llm_providers import LLMProvider, create_providers_from_env
+from utils.milestone_simulator import year_simulation_text
+from utils.prompt_serializer import create_prompt_serializer, estimate_tokens, prune_empty
+from utils.query_classifier import create_query_classifier
+from utils.response_cache import ResponseCache, create_response_cache, hash_payload
+from utils.reward_calculator import spend_breakdown_text
+from utils.section_index import relevant_sections
+from utils.request_coalescer import SingleFlight
 
 
 class AIPoweredCreditCardBot:
@@ -24,56 +35,141 @@ class AIPoweredCreditCardBot:
     Eliminates the need for complex regex patterns and manual intent mapping.
     """
     
-    def __init__(self, data_files: list[str]):
+    def __init__(self, data_files: Optional[list[str]] = None, response_cache: Optional[ResponseCache] = None,
+                 providers: Optional[List[LLMProvider]] = None):
         load_dotenv()
         
+        # "cache_prefix" puts all static content (incl. every card's data) in a byte-identical
+        # system prompt so provider-side prompt/context caching can reuse it across queries
+        self.prompt_layout = os.getenv("PROMPT_LAYOUT", "standard").lower()
+        self.prefix_reports = deque(maxlen=100)
+        
         # Initialize AI client (prefer Gemini for cost and speed)
-        self._setup_ai_client()
+        self._setup_ai_client(providers)
         
         # Load card data
         self.cards_data = self._load_credit_card_data(data_files)
         
+        # Leaf paths retrieved per card for a query (utils/section_index.py)
+        self.section_top_k = int(os.getenv("SECTION_TOP_K", "12"))
+        
         # Load example queries for context
         self.example_queries = self._load_example_queries()
         
-    def _setup_ai_client(self):
-        """Setup AI client with preference for Gemini."""
-        gemini_key = os.getenv("GOOGLE_API_KEY")
-        openai_key = os.getenv("OPENAI_API_KEY")
+        # Fully-specified reward calculations are answered locally without an LLM call
+        self.fast_path = None
+        if os.getenv("LOCAL_FAST_PATH", "1").lower() not in ("0", "false", "no"):
+            self.fast_path = FastPathRouter(self.cards_data, self.registry.resolve)
+        
+        # Output budget and model tier are chosen per query class before the LLM call
+        self.query_classifier = None
+        if os.getenv("QUERY_ROUTING", "1").lower() not in ("0", "false", "no"):
+            self.query_classifier = create_query_classifier()
+        
+        # Card data goes into prompts as compact JSON, pruned to PROMPT_DATA_TOKEN_BUDGET
+        self.prompt_serializer = create_prompt_serializer()
+        
+        # Cache final answers so repeated questions skip the LLM round trip
+        self.response_cache = response_cache if response_cache is not None else create_response_cache(self.registry.data_files)
+        
+        # Hot-reloaded card data (CardRegistry.start_watching) invalidates prompts and cached answers
+        self.registry.add_listener(self._on_card_data_reload)
+        
+        # Identical concurrent queries (shared bot via st.cache_resource) wait on one provider call
+        self.coalescer = SingleFlight(timeout_seconds=float(os.getenv("COALESCE_TIMEOUT_SECONDS", "30")))
+        
+        # All provider I/O runs on one background loop; sync callers block on it
+        self.engine_loop = BackgroundEventLoop()
+        self.max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.llm_timeout_seconds = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+        self._provider_semaphore: Optional[asyncio.Semaphore] = None
         
-        if gemini_key and GEMINI_AVAILABLE:
+        # Token buckets sized from the primary provider's quota; interactive queries are admitted first
+        self.admission = create_admission_controller(self.provider.name)
+        
+        # Per-provider circuit breakers: a failing provider is skipped until a probe succeeds
+        self.circuit_router = create_circuit_router(self.providers)
+        
+        # Optional hedging: race the secondary provider when the primary is slower than its rolling p90
+        self.hedger = None
+        if os.getenv("LLM_HEDGING", "0").lower() in ("1", "true", "yes") and self.secondary_provider:
+            self.hedger = HedgedCaller(
+                percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "90")),
+                default_deadline_seconds=float(os.getenv("LLM_HEDGE_DEFAULT_DEADLINE_SECONDS", "4"))
+            )
+            print(f"🏁 Hedging enabled: {self.provider.name} → {self.secondary_provider.name}")
+        
+    @property
+    def cards_data(self) -> Dict[str, Any]:
+        return self._cards_data
+    
+    @cards_data.setter
+    def cards_data(self, value: Dict[str, Any]):
+        self._cards_data = value
+        self.invalidate_system_prompt()
+        if getattr(self, 'fast_path', None):
+            self.fast_path.cards_data = value
+    
+    @property
+    def example_queries(self) -> Dict[str, List[str]]:
+        return self._example_queries
+    
+    @example_queries.setter
+    def example_queries(self, value: Dict[str, List[str]]):
+        self._example_queries = value
+        self.invalidate_system_prompt()
+    
+    def _on_card_data_reload(self, registry: CardRegistry):
+        """Card data changed under the bot: recompile the system prompt and drop cached answers."""
+        self.invalidate_system_prompt()
+        if self.response_cache:
+            self.response_cache.clear()
+    
+    def invalidate_system_prompt(self):
+        """Force the system prompt to be recompiled on next use (call after mutating cards_data in place)."""
+        self._system_prompt = None
+        self._system_prompt_version = None
+    
+    @property
+    def system_prompt_version(self) -> str:
+        """Short hash identifying the currently compiled system prompt."""
+        self._get_system_prompt()
+        return self._system_prompt_version
+    
+    def _get_system_prompt(self) -> str:
+        """Return the system prompt, compiling it only once per data version."""
+        if getattr(self, '_system_prompt', None) is None:
+            self._system_prompt = self._create_comprehensive_system_prompt()
+            if self.prompt_layout == "cache_prefix":
+                self._system_prompt += self._create_static_data_section()
+            self._system_prompt_version = hashlib.sha256(self._system_prompt.encode('utf-8')).hexdigest()[:12]
+        return self._system_prompt
+        
+    def _setup_ai_client(self, providers: Optional[List[LLMProvider]] = None):
+        """Setup AI clients with preference for Gemini (or use the given providers, e.g. fakes in tests)."""
+        self.providers = providers or create_providers_from_env()
+        self.provider = self.providers[0]
+        
+        if self.provider.name == "gemini":
             print("✨ Using Google Gemini API for AI-powered intent detection")
-            genai.configure(api_key=gemini_key)
-            self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-            self.api_type = "gemini"
-            self.model = "gemini-1.5-flash"
-        elif openai_key:
+        elif self.provider.name == "openai":
             print("🤖 Using OpenAI API for AI-powered intent detection")
-            self.client = openai.OpenAI(api_key=openai_key)
-            self.api_type = "openai"
-            self.model = "gpt-3.5-turbo"
-        else:
-            raise ValueError("No API key found! Please set GOOGLE_API_KEY or OPENAI_API_KEY in .env file")
-    
-    def _load_credit_card_data(self, data_files: list[str]) -> Dict[str, Any]:
-        """Load all credit card data from JSON files."""
-        cards_data = {}
-        
-        for filepath in data_files:
-            try:
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-                    
-                if "cards" in data and isinstance(data["cards"], list):
-                    for card in data["cards"]:
-                        card_name = card.get("name")
-                        if card_name:
-                            cards_data[card_name] = card
-                            
-            except (FileNotFoundError, json.JSONDecodeError) as e:
-                print(f"Warning: Could not load {filepath}: {e}")
-                
-        return cards_data
+        
+        self.api_type = self.provider.name
+        self.model = self.provider.model
+        
+        # The other vendor, when its key is also configured, backs up the primary
+        self.secondary_provider = self.providers[1] if len(self.providers) > 1 else None
+        
+        if self.prompt_layout == "cache_prefix":
+            ttl_seconds = int(os.getenv("PROMPT_CACHE_TTL_SECONDS", "3600"))
+            for provider in self.providers:
+                provider.enable_prefix_cache(ttl_seconds)
+    
+    def _load_credit_card_data(self, data_files: Optional[list[str]]) -> Dict[str, Any]:
+        """Index the credit card data files (all of data/*.json by default); card bodies load on demand."""
+        self.registry = CardRegistry(data_files)
+        return self.registry.cards
     
     def _load_example_queries(self) -> Dict[str, List[str]]:
         """Load example queries for different intent types to provide context to AI."""
@@ -251,52 +347,327 @@ FOR MULTI-CATEGORY SPENDING QUERIES:
 """
         return system_prompt
     
+    def _create_static_data_section(self) -> str:
+        """Every card's data in canonical form (sorted cards and keys, compact) for the cached prefix."""
+        # peek: one pass over every card must not flush the registry's LRU of recently used cards
+        canonical = {name: prune_empty(self.registry.peek(name)) for name in sorted(self.registry.index)}
+        return f"""
+COMPLETE CREDIT CARD DATA:
+{json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)}
+"""
+    
     def _get_data_structure_summary(self) -> Dict[str, List[str]]:
         """Get a summary of available data structure for the AI prompt."""
-        structure = {}
-        for card_name, card_data in self.cards_data.items():
-            # Get top-level keys (exclude internal metadata)
-            keys = [key for key in card_data.keys() if not key.startswith('_')]
-            structure[card_name] = keys
-        return structure
-    
-    def process_query(self, user_query: str, conversation_history: List[Dict] = None) -> str:
+        # Top-level keys (internal metadata excluded) come from the registry index; no card body is loaded
+        return {card_name: list(entry["sections"]) for card_name, entry in sorted(self.registry.index.items())}
+    
+    def process_query(self, user_query: str, conversation_history: List[Dict] = None,
+                      priority: int = PRIORITY_INTERACTIVE) -> str:
         """
         Process user query using AI for both intent detection and response generation.
         Single API call replaces entire regex-based pipeline.
+        Thin synchronous wrapper around aprocess_query.
+        """
+        return self.engine_loop.run(self._aprocess_query(user_query, conversation_history, priority=priority))
+    
+    async def aprocess_query(self, user_query: str, conversation_history: List[Dict] = None,
+                             timeout_seconds: Optional[float] = None, priority: int = PRIORITY_INTERACTIVE) -> str:
         """
+        Async version of process_query. Provider calls are bounded by LLM_MAX_CONCURRENCY and a
+        per-call timeout; cancelling the awaiting task cancels the provider call.
+        """
+        return await self.engine_loop.run_async(
+            self._aprocess_query(user_query, conversation_history, timeout_seconds, priority)
+        )
+    
+    async def aprocess_many(self, queries: List[str], concurrency: int = 4,
+                            timeout_seconds: Optional[float] = None, priority: int = PRIORITY_BATCH) -> List[str]:
+        """Answer a batch of queries with at most `concurrency` of them in flight at once, preserving order."""
+        batch_semaphore = asyncio.Semaphore(concurrency)
         
-        # Preprocess currency abbreviations (keep this useful preprocessing)
-        processed_query = self._preprocess_currency(user_query)
+        async def answer(query: str) -> str:
+            async with batch_semaphore:
+                return await self.aprocess_query(query, timeout_seconds=timeout_seconds, priority=priority)
         
-        # Create comprehensive prompt with full context
-        prompt = self._create_query_prompt(processed_query, conversation_history)
+        return await asyncio.gather(*(answer(query) for query in queries))
+    
+    async def _aprocess_query(self, user_query: str, conversation_history: List[Dict] = None,
+                              timeout_seconds: Optional[float] = None, priority: int = PRIORITY_INTERACTIVE) -> str:
+        """Pipeline shared by the sync and async entry points (runs on the engine loop)."""
+        local_answer = self._route_locally(user_query)
+        if local_answer is not None:
+            return local_answer
+        
+        prompt, cache_key, cached_response = self._prepare_request(user_query, conversation_history)
+        if cached_response is not None:
+            return cached_response
         
-        # Get AI response
+        route = self._classify_query(user_query)
+        
+        # Get AI response, sharing one provider call between identical concurrent queries
         try:
-            if self.api_type == "gemini":
-                response = self._get_gemini_response(prompt)
-            else:
-                response = self._get_openai_response(prompt)
-                
-            return response
+            flight_key = "query:" + (cache_key or hash_payload(prompt))
+            return await self.coalescer.ado(
+                flight_key,
+                lambda: self._aget_ai_response(prompt, cache_key, timeout_seconds, route, priority)
+            )
             
+        except AdmissionError:
+            return "I'm getting a lot of questions right now. Please try again in a moment."
+        except (asyncio.TimeoutError, TimeoutError):
+            return "I apologize, but the AI service took too long to respond. Please try again."
+        except AllProvidersFailedError as e:
+            if e.timed_out:
+                return "I apologize, but the AI service took too long to respond. Please try again."
+            return f"I apologize, but I'm having trouble processing your request right now. Please try again. Error: {str(e)}"
         except Exception as e:
             return f"I apologize, but I'm having trouble processing your request right now. Please try again. Error: {str(e)}"
     
-    def _create_query_prompt(self, user_query: str, conversation_history: List[Dict] = None) -> str:
+    def process_query_stream(self, user_query: str, conversation_history: List[Dict] = None,
+                             priority: int = PRIORITY_INTERACTIVE) -> Iterator[str]:
+        """
+        Streaming variant of process_query: yields text chunks as the provider produces them.
+        Cached and locally computed answers are yielded as a single chunk; completed streams
+        are added to the cache.
+        """
+        local_answer = self._route_locally(user_query)
+        if local_answer is not None:
+            yield local_answer
+            return
+        
+        prompt, cache_key, cached_response = self._prepare_request(user_query, conversation_history)
+        if cached_response is not None:
+            yield cached_response
+            return
+        
+        route = self._classify_query(user_query)
+        max_tokens = route["max_output_tokens"] if route else 2000
+        
+        chunks = []
+        try:
+            flight_key = "stream:" + (cache_key or hash_payload(prompt))
+            self._record_prefix(self._get_system_prompt(), prompt)
+            reserved_tokens = estimate_tokens(self._get_system_prompt()) + estimate_tokens(prompt) + max_tokens
+            
+            def stream_func():
+                # Only the leading stream is admitted; coalesced followers make no provider call
+                if self.admission:
+                    self.admission.acquire(priority, reserved_tokens)
+                produced = []
+                completed = False
+                try:
+                    for chunk in self.circuit_router.stream(
+                        lambda provider: self._routed_provider(provider, route).stream(self._get_system_prompt(), prompt, max_tokens)
+                    ):
+                        produced.append(chunk)
+                        yield chunk
+                    completed = True
+                finally:
+                    # A failed or abandoned stream keeps only the output it produced
+                    if self.admission:
+                        unused = (max_tokens if completed else reserved_tokens) - estimate_tokens("".join(produced))
+                        self.admission.release_unused(unused)
+            
+            for chunk in self.coalescer.stream(flight_key, stream_func):
+                chunks.append(chunk)
+                yield chunk
+                
+        except AdmissionError:
+            yield "I'm getting a lot of questions right now. Please try again in a moment."
+            return
+        except Exception as e:
+            separator = "\n\n" if chunks else ""
+            yield f"{separator}I apologize, but I'm having trouble processing your request right now. Please try again. Error: {str(e)}"
+            return
+        
+        if route and chunks:
+            self.query_classifier.record_output(route["query_class"], "".join(chunks))
+        if cache_key and chunks:
+            self.response_cache.set(cache_key, "".join(chunks))
+    
+    async def _aget_ai_response(self, prompt: str, cache_key: Optional[str] = None,
+                                timeout_seconds: Optional[float] = None,
+                                route: Optional[Dict[str, Any]] = None,
+                                priority: int = PRIORITY_INTERACTIVE) -> str:
+        """
+        Call a provider under the concurrency limit and timeout; cache the answer on success.
+        Calls go through the circuit breakers, so an open circuit fails over to the next provider
+        (or, when hedging, fires the hedge immediately) instead of waiting for a timeout.
+        The query class route, if any, sets the output budget and model tier. Calls wait in the
+        admission queue (by priority) until the rate limits allow them.
+        """
+        if self._provider_semaphore is None:
+            self._provider_semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        system_prompt = self._get_system_prompt()
+        self._record_prefix(system_prompt, prompt)
+        timeout = timeout_seconds or self.llm_timeout_seconds
+        max_tokens = route["max_output_tokens"] if route else 2000
+        complete = lambda provider, provider_timeout: self._routed_provider(provider, route).acomplete(
+            system_prompt, prompt, max_tokens
+        )
+        
+        def provider_call(provider):
+            return lambda: self.circuit_router.acall_provider(provider, complete, timeout)
+        
+        # The admission buckets model the primary provider's quota. A hedge call goes to the
+        # secondary provider, whose quota they do not track, so only one slot is reserved.
+        reserved_tokens = estimate_tokens(system_prompt) + estimate_tokens(prompt) + max_tokens
+        if self.admission:
+            await self.admission.aacquire(priority, reserved_tokens)
+        
+        response = None
+        try:
+            async with self._provider_semaphore:
+                if self.hedger:
+                    response = await self.hedger.call(
+                        self.provider.name, provider_call(self.provider),
+                        self.secondary_provider.name, provider_call(self.secondary_provider)
+                    )
+                else:
+                    response = await self.circuit_router.acall(complete, timeout)
+        finally:
+            # Failed and cancelled calls give back their whole reservation
+            if self.admission:
+                unused = reserved_tokens if response is None else max_tokens - estimate_tokens(response)
+                self.admission.release_unused(unused)
+        
+        if route:
+            self.query_classifier.record_output(route["query_class"], response)
+        
+        # Only successful answers are cached; errors should be retried
+        if cache_key:
+            self.response_cache.set(cache_key, response)
+        return response
+    
+    def _classify_query(self, user_query: str) -> Optional[Dict[str, Any]]:
+        """Query class with its output budget and model tier (None if query routing is off)."""
+        if not self.query_classifier:
+            return None
+        return self.query_classifier.classify(self._preprocess_currency(user_query))
+    
+    def _routed_provider(self, provider: LLMProvider, route: Optional[Dict[str, Any]]) -> LLMProvider:
+        """The provider bound to the model of the route's tier."""
+        if not route:
+            return provider
+        return provider.with_model(self.query_classifier.model_for(provider.name, route["model_tier"]))
+    
+    def get_output_budget_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return output budget, tier and realized output tokens per query class (empty if routing is off)."""
+        return self.query_classifier.get_stats() if self.query_classifier else {}
+    
+    def get_admission_stats(self) -> Dict[str, Any]:
+        """Return queue depth, admissions per priority and queue wait times (empty if admission is off)."""
+        return self.admission.get_stats() if self.admission else {}
+    
+    def get_coalescing_stats(self) -> Dict[str, Any]:
+        """Return how many provider calls were led vs. coalesced onto an in-flight call."""
+        return self.coalescer.get_stats()
+    
+    def get_prompt_stats(self) -> Dict[str, Any]:
+        """Return estimated prompt-data tokens before/after compaction and pruning."""
+        return self.prompt_serializer.get_stats()
+    
+    def _record_prefix(self, system_prompt: str, prompt: str):
+        """Note how much of this call's input is a cache-eligible static prefix."""
+        prefix_tokens = estimate_tokens(system_prompt)
+        self.prefix_reports.append({
+            "layout": self.prompt_layout,
+            "prefix_version": self.system_prompt_version,
+            "prefix_tokens": prefix_tokens,
+            "suffix_tokens": estimate_tokens(prompt),
+            "prefix_share": round(prefix_tokens / (prefix_tokens + estimate_tokens(prompt)), 3)
+        })
+    
+    def get_prefix_cache_stats(self) -> Dict[str, Any]:
+        """Return the cache-eligible prefix size of recent calls (estimated tokens)."""
+        reports = list(self.prefix_reports)
+        if not reports:
+            return {"layout": self.prompt_layout, "calls": 0}
+        return {
+            "layout": self.prompt_layout,
+            "calls": len(reports),
+            "prefix_version": reports[-1]["prefix_version"],
+            "last_call": reports[-1],
+            "avg_prefix_share": round(sum(report["prefix_share"] for report in reports) / len(reports), 3)
+        }
+    
+    def get_circuit_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return circuit state, error rate and adaptive timeout per provider."""
+        return self.circuit_router.get_stats()
+    
+    def get_hedging_stats(self) -> Dict[str, Any]:
+        """Return hedge rate and per-provider win counts (empty if hedging is disabled)."""
+        return self.hedger.get_stats() if self.hedger else {}
+    
+    def _route_locally(self, user_query: str) -> Optional[str]:
+        """Answer from the local fast path when the query is a fully-specified calculation."""
+        if not self.fast_path:
+            return None
+        return self.fast_path.route(self._preprocess_currency(user_query))
+    
+    def get_routing_stats(self) -> Dict[str, Any]:
+        """Return local vs LLM routing counts and the local hit rate (empty if the fast path is off)."""
+        return self.fast_path.get_stats() if self.fast_path else {}
+    
+    def _prepare_request(self, user_query: str, conversation_history: List[Dict] = None) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """Build the prompt and cache key for a query. Returns (prompt, cache_key, cached_response)."""
+        # Preprocess currency abbreviations (keep this useful preprocessing)
+        processed_query = self._preprocess_currency(user_query)
+        
+        # Select card data once; it feeds both the cache key and the prompt
+        relevant_data = self._extract_relevant_data(processed_query)
+        
+        cache_key = None
+        if self.response_cache:
+            # Earlier turns only key the answer when the question leans on them; a standalone
+            # question gets the same entry whatever was asked before it
+            memory = self._session_memory(conversation_history)
+            context = memory.render() if memory and memory.refers_back(processed_query) else ""
+            cache_key = self.response_cache.make_key(processed_query, relevant_data, self.model, context)
+            cached_response = self.response_cache.get(cache_key)
+            if cached_response is not None:
+                return None, cache_key, cached_response
+        
+        # Create comprehensive prompt with full context
+        prompt = self._create_query_prompt(processed_query, conversation_history, relevant_data)
+        return prompt, cache_key, None
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Return response cache hit/miss counters (empty if caching is disabled)."""
+        return self.response_cache.get_stats() if self.response_cache else {}
+    
+    def _create_query_prompt(self, user_query: str, conversation_history: List[Dict] = None,
+                             relevant_data: Optional[Dict] = None) -> str:
         """Create the complete prompt with user query and relevant card data."""
         
-        # Include conversation context if available
-        context_text = ""
-        if conversation_history:
-            context_text = "\nCONVERSATION CONTEXT:\n"
-            for exchange in conversation_history[-3:]:  # Last 3 exchanges
-                context_text += f"User: {exchange.get('query', '')}\n"
-                context_text += f"Assistant: {exchange.get('response', '')}\n"
+        # Include a compact summary of earlier turns if available
+        context_text = self._conversation_context(conversation_history)
         
         # Extract only relevant card data for better AI processing
-        relevant_data = self._extract_relevant_data(user_query)
+        if relevant_data is None:
+            relevant_data = self._extract_relevant_data(user_query)
+        
+        # Multi-category spends are computed exactly here rather than by the model
+        breakdown_text = self._spend_breakdown(user_query, relevant_data)
+        
+        if self.prompt_layout == "cache_prefix":
+            # Card data is already in the cached prefix; only name the sections to focus on,
+            # and keep the question last
+            focus = "\n".join(
+                f"- {card_name}: {', '.join(key for key in sections if key != 'name')}"
+                for card_name, sections in relevant_data.items()
+            )
+            return f"""{context_text}
+FOCUS ON THESE SECTIONS OF THE CARD DATA ABOVE:
+{focus}
+{breakdown_text}
+USER QUESTION: {user_query}
+
+Please provide a comprehensive answer based on the credit card data above.
+"""
+        
+        data_text, _ = self.prompt_serializer.serialize(relevant_data, user_query)
         
         prompt = f"""
 USER QUESTION: {user_query}
@@ -304,92 +675,71 @@ USER QUESTION: {user_query}
 {context_text}
 
 RELEVANT CREDIT CARD DATA:
-{json.dumps(relevant_data, indent=2)}
-
+{data_text}
+{breakdown_text}
 Please provide a comprehensive answer based on the credit card data above.
 """
         return prompt
     
+    def _spend_breakdown(self, user_query: str, relevant_data: Dict) -> str:
+        """Exact per-category reward table (or year simulation) for a spend question, or ""."""
+        cards = [name for name in relevant_data if name in self.cards_data] or list(self.cards_data)
+        return (spend_breakdown_text(self.cards_data, user_query, cards)
+                or year_simulation_text(self.cards_data, user_query, cards))
+    
+    def create_conversation_memory(self) -> ConversationMemory:
+        """A per-session conversation memory using this bot's currency normalisation."""
+        return ConversationMemory(
+            token_budget=int(os.getenv("CONVERSATION_MEMORY_TOKEN_BUDGET", "250")),
+            normalize_query=self._preprocess_currency,
+            resolve_cards=self.registry.resolve
+        )
+    
+    def _session_memory(self, conversation_history) -> Optional[ConversationMemory]:
+        """
+        conversation_history as a ConversationMemory: one kept per session is used as is, a list
+        of {"query", "response"} exchanges is summarized on the fly. None without history.
+        """
+        if not conversation_history:
+            return None
+        if isinstance(conversation_history, ConversationMemory):
+            return conversation_history
+        memory = self.create_conversation_memory()
+        for exchange in conversation_history:
+            memory.update(exchange.get('query', ''), exchange.get('response', ''))
+        return memory
+    
+    def _conversation_context(self, conversation_history) -> str:
+        """Summary of earlier turns for the prompt, or "" without history."""
+        memory = self._session_memory(conversation_history)
+        return memory.render() if memory else ""
+    
     def _extract_relevant_data(self, user_query: str) -> Dict:
-        """Extract only relevant data sections based on the query to improve AI accuracy."""
-        query_lower = user_query.lower()
+        """
+        Extract only relevant data sections based on the query to improve AI accuracy: the card
+        leaves retrieved for the query from each card's section index (BM25 over keys and values).
+        """
         relevant_data = {}
         
         # Determine which cards to include
-        cards_to_include = []
-        if 'axis' in query_lower or 'atlas' in query_lower:
-            cards_to_include.append('Axis Bank Atlas Credit Card')
-        if 'icici' in query_lower or 'emeralde' in query_lower or 'epm' in query_lower:
-            cards_to_include.append('ICICI Bank Emeralde Private Metal Credit Card')
+        cards_to_include = self.registry.resolve(user_query)
         
-        # If no specific card mentioned, include both
+        # If no specific card mentioned, include all of them
         if not cards_to_include:
             cards_to_include = list(self.cards_data.keys())
         
-        # Extract relevant sections based on query type
+        # Card and bank names select cards, not sections
+        name_terms = self.registry.name_terms()
         for card_name in cards_to_include:
             if card_name not in self.cards_data:
                 continue
-                
-            card_data = self.cards_data[card_name]
-            relevant_card_data = {
-                'name': card_name,
-                'rewards': card_data.get('rewards', {}),
-            }
             
-            # Add specific sections based on query content
-            if any(word in query_lower for word in ['fee', 'cost', 'charge', 'annual', 'joining']):
-                relevant_card_data['fees'] = card_data.get('fees', {})
-            
-            if any(word in query_lower for word in ['welcome', 'joining', 'benefit', 'bonus']):
-                relevant_card_data['welcome_benefits'] = card_data.get('welcome_benefits', {})
-            
-            if any(word in query_lower for word in ['milestone', 'tier', 'spend', 'yearly', 'annual']):
-                relevant_card_data['milestones'] = card_data.get('milestones', [])
-                relevant_card_data['tier_structure'] = card_data.get('tier_structure', {})
-            
-            if any(word in query_lower for word in ['lounge', 'airport']):
-                relevant_card_data['lounge_access'] = card_data.get('lounge_access', {})
-            
-            if any(word in query_lower for word in ['transfer', 'partner', 'airline', 'redeem']):
-                relevant_card_data['miles_transfer'] = card_data.get('miles_transfer', {})
-                relevant_card_data['redemption'] = card_data.get('redemption', {})
-            
-            relevant_data[card_name] = relevant_card_data
+            sections = relevant_sections(self.cards_data[card_name], self.registry.section_index(card_name),
+                                         user_query, k=self.section_top_k, ignore=name_terms)
+            relevant_data[card_name] = {'name': card_name, **sections}
         
         return relevant_data
     
-    def _get_gemini_response(self, prompt: str) -> str:
-        """Get response from Gemini API."""
-        system_prompt = self._create_comprehensive_system_prompt()
-        full_prompt = system_prompt + "\n\n" + prompt
-        
-        response = self.gemini_model.generate_content(
-            full_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.1,
-                max_output_tokens=2000,
-            )
-        )
-        
-        return response.text
-    
-    def _get_openai_response(self, prompt: str) -> str:
-        """Get response from OpenAI API."""
-        system_prompt = self._create_comprehensive_system_prompt()
-        
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1,
-            max_tokens=2000
-        )
-        
-        return response.choices[0].message.content
-    
     def _preprocess_currency(self, query: str) -> str:
         """Preprocess Indian currency abbreviations (keep this useful feature)."""
         # Convert Indian currency notation
@@ -406,6 +756,9 @@ Please provide a comprehensive answer based on the credit card data above.
     
     def get_analytics_data(self, user_query: str, response: str, processing_time: float) -> Dict:
         """Generate analytics data for the query (for compatibility with existing analytics)."""
+        # Token estimates of the most recently built prompt
+        prompt_report = self.prompt_serializer.recent_reports[-1] if self.prompt_serializer.recent_reports else {}
+        route = self._classify_query(user_query) or {}
         return {
             "query": user_query,
             "response_preview": response[:100] + "..." if len(response) > 100 else response,
@@ -413,6 +766,12 @@ Please provide a comprehensive answer based on the credit card data above.
             "total_processing_time": processing_time,
             "api_used": self.api_type,
             "model_used": self.model,
+            "query_class": route.get("query_class"),
+            "model_tier": route.get("model_tier"),
+            "output_tokens": estimate_tokens(response),
+            "prompt_tokens_before": prompt_report.get("tokens_before"),
+            "prompt_tokens_after": prompt_report.get("tokens_after"),
+            "cache_eligible_prefix_tokens": self.prefix_reports[-1]["prefix_tokens"] if self.prefix_reports else None,
             "query_complexity": {
                 "word_count": len(user_query.split()),
                 "has_currency": bool(re.search(r'₹|\d+[Ll]|\d+[Kk]|\d+\s*crore', user_query)),
@@ -422,7 +781,7 @@ Please provide a comprehensive answer based on the credit card data above.
         }
 
 
-def create_ai_powered_bot(data_files: list[str]) -> AIPoweredCreditCardBot:
+def create_ai_powered_bot(data_files: Optional[list[str]] = None) -> AIPoweredCreditCardBot:
     """Factory function to create AI-powered bot instance."""
     return AIPoweredCreditCardBot(data_files)
 
@@ -430,10 +789,7 @@ def create_ai_powered_bot(data_files: list[str]) -> AIPoweredCreditCardBot:
 # Example usage and testing
 if __name__ == "__main__":
     # Test the AI-powered approach
-    bot = create_ai_powered_bot([
-        "data/axis-atlas.json",
-        "data/icici-epm.json"
-    ])
+    bot = create_ai_powered_bot()
     
     # Test problematic queries from user feedback
     test_queries = [
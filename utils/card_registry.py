@@ -0,0 +1,328 @@
+"""
+Card Registry
+Discovers every card data file, keeps a small per-card index (bank, network, categories,
+aliases, sections) with secondary indexes for lookups, and reads card bodies (with their
+dotted-path field index) from the catalogue snapshot on demand into a bounded LRU. Only the
+index grows with the catalogue; at most max_loaded_cards bodies are in memory. Edits to the
+data files are hot-reloaded by swapping in a new immutable catalogue state.
+"""
+
+import os
+import re
+import glob
+import time
+import pickle
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils.catalogue_snapshot import card_blob, load_catalogue
+from utils.reward_rules import forget_reward_table, prime_reward_table
+from utils.prompt_serializer import tokenize
+from utils.section_index import SectionIndex
+
+DEFAULT_DATA_DIR = "data"
+
+
+def discover_data_files(data_dir: str = DEFAULT_DATA_DIR) -> List[str]:
+    """Every card data file (data/*.json), in a stable order."""
+    return sorted(glob.glob(os.path.join(data_dir, "*.json")))
+
+
+def _query_words(text: str) -> set:
+    """Words of a query, with a trailing plural 's' also stripped (so 'atlas' and 'cards' both match)."""
+    words = set(re.findall(r'[a-z0-9]+', text.lower()))
+    return words | {word[:-1] for word in words if len(word) > 3 and word.endswith('s')}
+
+
+class CardMapping(Mapping):
+    """Read-only {card name: card data} view of a registry; bodies are loaded on access."""
+
+    def __init__(self, registry: "CardRegistry"):
+        self._registry = registry
+
+    def __getitem__(self, card_name: str) -> Dict[str, Any]:
+        card = self._registry.get(card_name)
+        if card is None:
+            raise KeyError(card_name)
+        return card
+
+    def __contains__(self, card_name: object) -> bool:
+        return card_name in self._registry.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._registry.index)
+
+    def __len__(self) -> int:
+        return len(self._registry.index)
+
+
+class CatalogueState:
+    """
+    One immutable version of the catalogue: the card index, secondary indexes and where each
+    card's body is stored (its part), plus its own LRU of unpickled bodies. A reload builds a new
+    state and swaps it in.
+    """
+
+    def __init__(self, catalogue: Dict[str, Any], max_loaded_cards: int, version: int = 1):
+        self.version = version
+        self.parts: Dict[str, Dict[str, Any]] = catalogue["parts"]
+        self.index: Dict[str, Dict[str, Any]] = catalogue["card_index"]
+        self.bank_common_terms: Dict[str, Dict[str, Any]] = catalogue["bank_common_terms"]
+        self.intent_keys: List[str] = catalogue["intent_keys"]
+        self.card_parts: Dict[str, Dict[str, Any]] = catalogue["card_parts"]
+        self.max_loaded_cards = max_loaded_cards
+        self.loaded: "OrderedDict[str, Tuple[Dict[str, Any], SectionIndex, Dict[str, Any]]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Secondary indexes
+        self.by_bank: Dict[str, List[str]] = {}
+        self.by_network: Dict[str, List[str]] = {}
+        self.by_category: Dict[str, List[str]] = {}
+        self.by_alias: Dict[str, List[str]] = {}
+        for card_name, entry in self.index.items():
+            self.by_bank.setdefault(entry["bank"], []).append(card_name)
+            for network in entry["networks"]:
+                self.by_network.setdefault(network, []).append(card_name)
+            for category in entry["categories"]:
+                self.by_category.setdefault(category, []).append(card_name)
+            for alias in entry["aliases"]:
+                self.by_alias.setdefault(alias, []).append(card_name)
+        self.name_terms = set(tokenize(" ".join(list(self.by_alias) + list(self.by_bank))))
+
+    def get(self, card_name: str) -> Optional[Tuple[Dict[str, Any], SectionIndex, Dict[str, Any]]]:
+        """(card, section index, path index) for a card name, or None if unknown."""
+        entry = self.loaded.get(card_name)
+        if entry is not None:
+            # Recency is best effort: a hit never waits for the lock
+            if self.lock.acquire(blocking=False):
+                try:
+                    if card_name in self.loaded:
+                        self.loaded.move_to_end(card_name)
+                finally:
+                    self.lock.release()
+            return entry
+        part = self.card_parts.get(card_name)
+        if part is None:
+            return None
+        with self.lock:
+            entry = self.loaded.get(card_name)
+            if entry is not None:
+                return entry
+            card, table, sections, paths = pickle.loads(card_blob(part, card_name))
+            prime_reward_table(card, table)
+            entry = self.loaded[card_name] = (card, sections, paths)
+            if len(self.loaded) > self.max_loaded_cards:
+                _, (evicted, _, _) = self.loaded.popitem(last=False)
+                forget_reward_table(evicted)
+            return entry
+
+    def peek(self, card_name: str) -> Optional[Dict[str, Any]]:
+        """A card's data without adding it to the LRU (for one-off passes over every card)."""
+        entry = self.loaded.get(card_name)
+        if entry is not None:
+            return entry[0]
+        part = self.card_parts.get(card_name)
+        return pickle.loads(card_blob(part, card_name))[0] if part is not None else None
+
+    def release(self, successor: "CatalogueState"):
+        """
+        Drop the compiled reward tables of loaded bodies whose card was changed or removed in
+        successor (after this state was swapped out). Tables of unchanged cards stay for requests
+        still reading this state and age out of the reward table cache on their own.
+        """
+        with self.lock:
+            for card_name, (card, _, _) in self.loaded.items():
+                part = successor.card_parts.get(card_name)
+                if part is None or part["sha256"] != self.card_parts[card_name]["sha256"]:
+                    forget_reward_table(card)
+
+
+class CardRegistry:
+    """
+    Card index and lazily loaded card bodies. `index` maps each card name to its bank, network,
+    categories, aliases and top-level sections; by_bank / by_network / by_category / by_alias map those back to card
+    names. At most max_loaded_cards bodies are kept unpickled (CARD_REGISTRY_MAX_LOADED).
+
+    reload() (or the background watcher from start_watching()) re-parses only changed data files,
+    validates them and swaps in a new CatalogueState with a single assignment; requests read
+    whichever state is current and never wait on a reload. Listeners are called after each swap.
+    """
+
+    def __init__(self, data_files: Optional[List[str]] = None, max_loaded_cards: Optional[int] = None):
+        # Without an explicit file list the data directory is rescanned, so new card files are picked up
+        self.data_dir = None if data_files is not None else DEFAULT_DATA_DIR
+        self.data_files = list(data_files) if data_files is not None else discover_data_files(self.data_dir)
+        self.max_loaded_cards = max_loaded_cards or int(os.getenv("CARD_REGISTRY_MAX_LOADED", "64"))
+        self._state = CatalogueState(load_catalogue(self.data_files), self.max_loaded_cards)
+        self.cards = CardMapping(self)
+        self._listeners: List[Callable[["CardRegistry"], None]] = []
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        self._rejected_signature = None
+        self.stats = {"reloads": 0, "rejected_reloads": 0, "last_reload": None, "last_error": None}
+
+    # Current state (read once per call; a concurrent swap never mixes two versions)
+    @property
+    def version(self) -> int:
+        return self._state.version
+
+    @property
+    def index(self) -> Dict[str, Dict[str, Any]]:
+        return self._state.index
+
+    @property
+    def bank_common_terms(self) -> Dict[str, Dict[str, Any]]:
+        return self._state.bank_common_terms
+
+    @property
+    def intent_keys(self) -> List[str]:
+        return self._state.intent_keys
+
+    @property
+    def by_bank(self) -> Dict[str, List[str]]:
+        return self._state.by_bank
+
+    @property
+    def by_network(self) -> Dict[str, List[str]]:
+        return self._state.by_network
+
+    @property
+    def by_category(self) -> Dict[str, List[str]]:
+        return self._state.by_category
+
+    @property
+    def by_alias(self) -> Dict[str, List[str]]:
+        return self._state.by_alias
+
+    def get(self, card_name: str) -> Optional[Dict[str, Any]]:
+        """A card's data (None if unknown), unpickled on first use and kept while recently used."""
+        entry = self._state.get(card_name)
+        return entry[0] if entry else None
+
+    def peek(self, card_name: str) -> Optional[Dict[str, Any]]:
+        """A card's data (None if unknown) read without displacing recently used cards from the LRU."""
+        return self._state.peek(card_name)
+
+    def section_index(self, card_name: str) -> Optional[SectionIndex]:
+        """The card's leaf-path retrieval index (see utils.section_index), loaded with its body."""
+        entry = self._state.get(card_name)
+        return entry[1] if entry else None
+
+    def path_index(self, card_name: str) -> Optional[Dict[str, Any]]:
+        """The card's {dotted path: value} index (see utils.section_index.path_index), loaded with its body."""
+        entry = self._state.get(card_name)
+        return entry[2] if entry else None
+
+    def field(self, card_name: str, path: str, default: Any = None) -> Any:
+        """
+        One field of a card by dotted path ("rewards.capping_per_statement_cycle",
+        "milestones[0].spend"): a single dict probe. default if the card or the path is unknown.
+        """
+        entry = self._state.get(card_name)
+        return entry[2].get(path, default) if entry else default
+
+    def name_terms(self) -> set:
+        """Every alias and bank name as section-index terms (query words that pick cards, not sections)."""
+        return self._state.name_terms
+
+    def bank_of(self, card_name: str) -> Optional[str]:
+        entry = self._state.index.get(card_name)
+        return entry["bank"] if entry else None
+
+    def resolve(self, query: str) -> List[str]:
+        """
+        Cards a query refers to, in catalogue order. Card aliases ('atlas', 'epm') pick single
+        cards; a bank name ('axis') picks all of that bank's cards unless one of them was named.
+        """
+        state = self._state
+        words = _query_words(query)
+        found = {card_name for word in words for card_name in state.by_alias.get(word, [])}
+        named_banks = {state.index[card_name]["bank"] for card_name in found}
+        for bank in words & set(state.by_bank):
+            if bank not in named_banks:
+                found.update(state.by_bank[bank])
+        return [card_name for card_name in state.index if card_name in found]
+
+    def cards_for_bank(self, bank: str) -> List[str]:
+        return list(self._state.by_bank.get(bank.lower(), []))
+
+    def cards_for_network(self, network: str) -> List[str]:
+        return list(self._state.by_network.get(network.lower(), []))
+
+    def cards_for_category(self, category: str) -> List[str]:
+        return list(self._state.by_category.get(category.lower(), []))
+
+    def add_listener(self, callback: Callable[["CardRegistry"], None]):
+        """Call callback(registry) after every swap, e.g. to invalidate caches built from card data."""
+        self._listeners.append(callback)
+
+    def reload(self) -> bool:
+        """
+        Pick up changed, added or removed data files. Only changed files are re-parsed; a file
+        that no longer parses (or whose rules no longer compile) keeps the current state. Returns
+        True if a new state was swapped in.
+        """
+        with self._reload_lock:
+            data_files = discover_data_files(self.data_dir) if self.data_dir else self.data_files
+            state = self._state
+            try:
+                catalogue = load_catalogue(data_files, reuse=state.parts)
+            except (OSError, pickle.PickleError, ValueError) as e:
+                self.stats["last_error"] = str(e)
+                print(f"⚠️ Card data reload failed: {e}")
+                return False
+            signature = [(path, part["sha256"]) for path, part in catalogue["parts"].items()]
+            if signature == [(path, part["sha256"]) for path, part in state.parts.items()]:
+                return False
+
+            # Validate: new warnings (unparseable file, uncompilable rules) reject the whole reload
+            problems = [warning for path, part in catalogue["parts"].items() for warning in part["warnings"]
+                        if path not in state.parts or part["warnings"] != state.parts[path]["warnings"]]
+            if problems:
+                if signature != self._rejected_signature:
+                    self._rejected_signature = signature
+                    self.stats["rejected_reloads"] += 1
+                    self.stats["last_error"] = problems[0]
+                    print(f"⚠️ Card data reload rejected, still serving version {state.version}: {problems[0]}")
+                return False
+
+            self.data_files = data_files
+            self._state = CatalogueState(catalogue, self.max_loaded_cards, state.version + 1)
+            state.release(self._state)
+            self.stats["reloads"] += 1
+            self.stats["last_reload"] = time.time()
+            self.stats["last_error"] = None
+            print(f"♻️ Card data reloaded: version {self._state.version}, {len(self._state.index)} cards")
+
+        for callback in list(self._listeners):
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"⚠️ Card data reload listener failed: {e}")
+        return True
+
+    def start_watching(self, interval_seconds: float = 2.0):
+        """Poll the data files in a daemon thread and reload on change (no-op if interval <= 0 or already watching)."""
+        if interval_seconds <= 0 or (self._watcher and self._watcher.is_alive()):
+            return
+        self._stop_watching.clear()
+
+        def watch():
+            while not self._stop_watching.wait(interval_seconds):
+                self.reload()
+
+        self._watcher = threading.Thread(target=watch, name="card-data-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        state = self._state
+        return {"version": state.version, "cards": len(state.index), "loaded_cards": len(state.loaded),
+                "max_loaded_cards": self.max_loaded_cards, "banks": len(state.by_bank),
+                "aliases": len(state.by_alias), "watching": bool(self._watcher and self._watcher.is_alive()),
+                **self.stats}
@@ -0,0 +1,337 @@
+"""
+Card Catalogue Snapshot
+Compiles every card data file into one binary (pickled) snapshot holding the normalized card
+structures and everything derived from them (bank common terms, per-card index, intent keys,
+reward rule tables, dotted-path field indexes), with an mtime/hash manifest. The card registry
+loads the snapshot instead of re-parsing every JSON file; a stale manifest triggers a rebuild
+of only the changed files. The file starts with a header holding the index; each card body is
+pickled separately after it and read by byte range on demand, so bodies are not kept in memory.
+"""
+
+import os
+import json
+import time
+import pickle
+import hashlib
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.reward_rules import CATEGORY_ALIASES, canonical_category, compile_reward_table
+from utils.section_index import SectionIndex, path_index
+
+SNAPSHOT_VERSION = 8
+
+# Bytes of the big-endian header length at the start of a snapshot file
+HEADER_PREFIX = 8
+
+# Card networks recognised in a card's "network" field
+NETWORKS = {'visa': ['visa'], 'mastercard': ['mastercard'], 'amex': ['amex', 'american express'],
+            'rupay': ['rupay'], 'diners': ['diners']}
+
+# A "network" field hedged like this names networks of other cards, not the card's own
+NETWORK_UNKNOWN_MARKERS = ['not stated', 'not explicitly', 'not specified', 'not mentioned', 'unknown', 'n/a']
+
+# Words shared by many card names ("ICICI Bank Emeralde Private Metal Credit Card"); never aliases,
+# so "which metal card" does not pick one card
+GENERIC_NAME_WORDS = {'bank', 'card', 'credit', 'private', 'metal', 'platinum', 'gold', 'silver', 'signature',
+                      'infinite', 'world', 'select', 'premium', 'prime', 'plus', 'elite', 'reserve', 'black',
+                      'titanium', 'classic', 'rewards', 'reward', 'travel', 'cashback', 'edition', 'preferred'}
+
+_lock = threading.Lock()
+_stats = {"loads": 0, "memory_hits": 0, "snapshot_loads": 0, "rebuilds": 0, "last_load_ms": None, "last_source": None}
+
+
+def card_name_keywords(name: str) -> List[str]:
+    """Distinctive keywords from a card name (words longer than 3 letters, minus GENERIC_NAME_WORDS)."""
+    return [word.lower() for word in name.split() if len(word) > 3 and word.lower() not in GENERIC_NAME_WORDS]
+
+
+def card_index_entry(card: Dict[str, Any], bank_name: str, filepath: str,
+                     table: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Registry index entry for a card: its bank, networks, categories, aliases and top-level sections."""
+    network = str(card.get("network", "")).lower()
+    if any(marker in network for marker in NETWORK_UNKNOWN_MARKERS):
+        network = ""
+    categories = {canonical_category(tag) for tag in str(card.get("category", "")).split('/') if tag.strip()}
+    for section in (table or {}).get("sections", {}):
+        categories.add(section)
+        categories.update(CATEGORY_ALIASES.get(section, []))
+    # An explicit "aliases" list in the card data, else its distinctive name keywords plus its own id
+    # ('icici_epm' -> 'epm'); the bank name is matched separately
+    if card.get("aliases"):
+        aliases = {str(alias).lower() for alias in card["aliases"]}
+    else:
+        aliases = set(card_name_keywords(card["name"]))
+        aliases.update(part for part in str(card.get("id", "")).lower().split('_') if len(part) >= 3)
+    aliases.discard(bank_name)
+    return {
+        "file": filepath,
+        "bank": bank_name,
+        "networks": sorted(name for name, words in NETWORKS.items() if any(word in network for word in words)),
+        "categories": sorted(categories),
+        "aliases": sorted(aliases),
+        "sections": [key for key in card if not str(key).startswith('_')]
+    }
+
+
+def build_file_part(filepath: str, sha256: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Everything one data file contributes to the catalogue: its bank's common terms, each card
+    pickled with its compiled reward table, section index and path index ("cards"), index entries,
+    intent keys and warnings.
+    """
+    # Bank name from the file name, e.g. 'axis' from 'axis-atlas.json'
+    bank_name = os.path.basename(filepath).split('-')[0].lower()
+    part = {"sha256": sha256, "bank": bank_name, "common_terms": None, "cards": {}, "card_index": {},
+            "intent_keys": [], "warnings": [], "snapshot": None}
+    try:
+        with open(filepath, 'r') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        part["warnings"].append(f"Warning: Data file not found at {filepath}")
+        return part
+    except json.JSONDecodeError:
+        part["warnings"].append(f"Warning: Could not decode JSON from {filepath}")
+        return part
+
+    intent_keys = set()
+    if "common_terms" in data:
+        part["common_terms"] = data["common_terms"]
+        intent_keys.update(data["common_terms"].keys())
+
+    if "cards" in data and isinstance(data["cards"], list):
+        for card in data["cards"]:
+            card_name = card.get("name")
+            if not card_name:
+                part["warnings"].append(f"Warning: Card without a name in {filepath}")
+                continue
+            try:
+                table = compile_reward_table(card)
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                part["warnings"].append(f"Warning: Could not compile reward rules for {card_name} in {filepath}: {e}")
+                table = None
+            blob = (card, table, SectionIndex(card), path_index(card))
+            part["cards"][card_name] = pickle.dumps(blob, protocol=pickle.HIGHEST_PROTOCOL)
+            part["card_index"][card_name] = card_index_entry(card, bank_name, filepath, table)
+            intent_keys.update(key for key in card.keys() if not key.startswith('_'))
+    part["intent_keys"] = sorted(intent_keys)
+    return part
+
+
+def merge_parts(data_files: List[str], parts: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    The catalogue for data_files from their per-file parts: "card_parts" maps each card name to
+    the part holding its body (read with card_blob); later files win on duplicate card names.
+    """
+    catalogue = {
+        "version": SNAPSHOT_VERSION,
+        "card_parts": {},
+        "card_index": {},
+        "bank_common_terms": {},
+        "intent_keys": [],
+        "warnings": [],
+        "parts": parts
+    }
+    intent_keys = set()
+    for filepath in data_files:
+        part = parts[filepath]
+        if part["common_terms"] is not None:
+            catalogue["bank_common_terms"][part["bank"]] = part["common_terms"]
+        catalogue["card_parts"].update((card_name, part) for card_name in part["cards"])
+        catalogue["card_index"].update(part["card_index"])
+        intent_keys.update(part["intent_keys"])
+        catalogue["warnings"].extend(part["warnings"])
+    catalogue["intent_keys"] = sorted(intent_keys)
+    return catalogue
+
+
+def build_catalogue(data_files: List[str]) -> Dict[str, Any]:
+    """Parse every card file and derive the lookup structures the engines need."""
+    return merge_parts(data_files, {filepath: build_file_part(filepath) for filepath in data_files})
+
+
+def _snapshot_paths(data_files: List[str]) -> Tuple[str, str]:
+    """Snapshot and manifest paths for an (ordered) list of data files."""
+    directory = os.getenv("CARD_SNAPSHOT_DIR", ".card_snapshot")
+    key = hashlib.sha256("\n".join(os.path.abspath(path) for path in data_files).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(directory, f"catalogue-{key}.pickle"), os.path.join(directory, f"catalogue-{key}.manifest.json")
+
+
+def _file_entry(path: str, previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Manifest entry for a data file; the content hash is only recomputed when size or mtime changed."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return {"path": path, "missing": True}
+    if previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+        return previous
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return {"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+
+
+def _read_manifest(manifest_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _write_atomic(path: str, chunks: Iterable[bytes]):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(temp_path, path)
+
+
+def _signature(files: List[Dict[str, Any]]) -> Tuple:
+    return tuple((entry["path"], entry.get("sha256")) for entry in files)
+
+
+class SnapshotFile:
+    """
+    An open snapshot file: card bodies are read from it by byte range. The handle keeps the file
+    it was opened on readable after a newer snapshot replaces it, so parts never mix versions.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        self._lock = threading.Lock()
+        self.header_size = HEADER_PREFIX + int.from_bytes(self._file.read(HEADER_PREFIX), 'big')
+        if self.header_size > os.fstat(self._file.fileno()).st_size:
+            self._file.close()
+            raise EOFError(f"card catalogue snapshot {path} is truncated")
+
+    def read_parts(self) -> Dict[str, Dict[str, Any]]:
+        """The per-file parts stored in the header, with card bodies as (offset, length) in this file."""
+        with self._lock:
+            self._file.seek(HEADER_PREFIX)
+            parts = pickle.loads(self._file.read(self.header_size - HEADER_PREFIX))
+        for part in parts.values():
+            part["snapshot"] = self
+        return parts
+
+    def read(self, offset: int, length: int) -> bytes:
+        with self._lock:
+            self._file.seek(self.header_size + offset)
+            blob = self._file.read(length)
+        if len(blob) != length:
+            raise EOFError(f"card catalogue snapshot {self._file.name} is truncated")
+        return blob
+
+    def close(self):
+        self._file.close()
+
+    def __del__(self):
+        if hasattr(self, "_file"):
+            self._file.close()
+
+
+def card_blob(part: Dict[str, Any], card_name: str) -> bytes:
+    """A card's pickled (card, reward table, section index, path index) from its part."""
+    ref = part["cards"][card_name]
+    return ref if isinstance(ref, bytes) else part["snapshot"].read(*ref)
+
+
+def _snapshot_chunks(parts: Dict[str, Dict[str, Any]]) -> Iterator[bytes]:
+    """
+    Snapshot file content: a length-prefixed pickled header (the parts, with each card body
+    replaced by its (offset, length) in the body region) followed by the bodies, one at a time.
+    """
+    header, offset = {}, 0
+    for path, part in parts.items():
+        cards = {}
+        for card_name, ref in part["cards"].items():
+            length = len(ref) if isinstance(ref, bytes) else ref[1]
+            cards[card_name] = (offset, length)
+            offset += length
+        header[path] = dict(part, cards=cards, snapshot=None)
+    header_bytes = pickle.dumps(header, protocol=pickle.HIGHEST_PROTOCOL)
+    yield len(header_bytes).to_bytes(HEADER_PREFIX, 'big')
+    yield header_bytes
+    for part in parts.values():
+        for card_name in part["cards"]:
+            yield card_blob(part, card_name)
+
+
+def _current_snapshot(data_files: List[str],
+                      reuse: Optional[Dict[str, Dict[str, Any]]] = None) -> Tuple[Dict[str, Dict[str, Any]], str]:
+    """
+    Parts and source for data_files. Parts passed in reuse are returned as they are while every
+    file hash matches; otherwise a fresh snapshot's header is read. A stale snapshot is rebuilt
+    re-parsing only files whose hash changed; unchanged parts come from reuse or else the old
+    snapshot. Card bodies stay in the snapshot file (in memory only if it cannot be written).
+    """
+    snapshot_path, manifest_path = _snapshot_paths(data_files)
+    manifest = _read_manifest(manifest_path) or {}
+    previous = {entry["path"]: entry for entry in manifest.get("files", [])}
+    files = [_file_entry(path, previous.get(path)) for path in data_files]
+    if reuse and _signature(files) == tuple((path, part["sha256"]) for path, part in reuse.items()):
+        return reuse, "memory"
+
+    fresh = manifest.get("version") == SNAPSHOT_VERSION and _signature(manifest.get("files", [])) == _signature(files)
+    old_parts = reuse or {}
+    try:
+        snapshot = SnapshotFile(snapshot_path)
+        if fresh:
+            parts = snapshot.read_parts()
+            if files != manifest["files"]:
+                # Files were touched without changing content: keep the snapshot, refresh the mtimes
+                _write_atomic(manifest_path, [json.dumps({"version": SNAPSHOT_VERSION, "files": files}).encode('utf-8')])
+            return parts, "snapshot"
+        if manifest.get("version") == SNAPSHOT_VERSION and not reuse:
+            old_parts = snapshot.read_parts()
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        pass
+
+    parts = {}
+    for entry in files:
+        part = old_parts.get(entry["path"])
+        if part is None or entry.get("sha256") is None or part["sha256"] != entry["sha256"]:
+            part = build_file_part(entry["path"], entry.get("sha256"))
+        parts[entry["path"]] = part
+    try:
+        _write_atomic(snapshot_path, _snapshot_chunks(parts))
+        _write_atomic(manifest_path, [json.dumps({"version": SNAPSHOT_VERSION, "files": files}).encode('utf-8')])
+        parts = SnapshotFile(snapshot_path).read_parts()
+    except (OSError, pickle.UnpicklingError, EOFError) as e:
+        print(f"⚠️ Could not write card catalogue snapshot, keeping card data in memory: {e}")
+    return parts, "rebuild"
+
+
+def load_catalogue(data_files: List[str], reuse: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    The catalogue for data_files, with "source" set to memory, snapshot, rebuild or json. Only
+    the snapshot header is read; card bodies are read from the file on demand (card_blob).
+    reuse passes the "parts" of a catalogue already in memory: they are returned unchanged
+    while the files are (memory), and otherwise only changed files are re-parsed. Set
+    CARD_SNAPSHOT=0 to always parse the JSON files instead (bodies are then kept in memory).
+    """
+    start = time.perf_counter()
+    if os.getenv("CARD_SNAPSHOT", "1").lower() in ("0", "false", "no"):
+        catalogue, source = build_catalogue(data_files), "json"
+    else:
+        parts, source = _current_snapshot(data_files, reuse)
+        catalogue = merge_parts(data_files, parts)
+    catalogue["source"] = source
+
+    if source != "memory":
+        for warning in catalogue["warnings"]:
+            print(warning)
+
+    with _lock:
+        _stats["loads"] += 1
+        if source != "json":
+            _stats[{"memory": "memory_hits", "snapshot": "snapshot_loads", "rebuild": "rebuilds"}[source]] += 1
+        _stats["last_load_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        _stats["last_source"] = source
+    return catalogue
+
+
+def get_snapshot_stats() -> Dict[str, Any]:
+    """Catalogue loads by source (reused parts, snapshot file, rebuild) and the last load time."""
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,309 @@
+"""
+Per-Provider Circuit Breakers
+Tracks rolling error rate and latency per LLM provider, trips open after consecutive
+failures or when the rolling error rate crosses a threshold, probes again after a cool-down (half-open), derives adaptive timeouts from
+observed latency, and routes calls to a healthy provider while a circuit is open.
+"""
+
+import os
+import math
+import time
+import queue
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_END = object()
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a provider's circuit is open and the call is rejected without being attempted."""
+
+
+class AllProvidersFailedError(RuntimeError):
+    """Raised when every provider failed or was rejected; `errors` holds (provider, exception) pairs."""
+
+    def __init__(self, errors: List[Tuple[str, BaseException]]):
+        self.errors = errors
+        super().__init__(" | ".join(f"{name}: {error}" for name, error in errors))
+
+    @property
+    def timed_out(self) -> bool:
+        """True when every attempted provider timed out (open circuits are not counted)."""
+        attempted = [error for _, error in self.errors if not isinstance(error, CircuitOpenError)]
+        return bool(attempted) and all(isinstance(error, (asyncio.TimeoutError, TimeoutError)) for error in attempted)
+
+
+class _ThreadedStream:
+    """
+    Drives a blocking chunk iterator in a daemon thread, so the caller can wait for a chunk with
+    a deadline. An abandoned stream stops (and closes its iterator) at the next chunk it receives.
+    """
+
+    def __init__(self, open_stream: Callable[[], Iterator[str]]):
+        self._chunks = queue.Queue()
+        self._abandoned = threading.Event()
+        threading.Thread(target=self._run, args=(open_stream,), name="llm-stream", daemon=True).start()
+
+    def _run(self, open_stream: Callable[[], Iterator[str]]):
+        try:
+            iterator = open_stream()
+            for chunk in iterator:
+                if self._abandoned.is_set():
+                    if hasattr(iterator, "close"):
+                        iterator.close()
+                    return
+                self._chunks.put((chunk, None))
+            self._chunks.put((_END, None))
+        except Exception as e:
+            self._chunks.put((_END, e))
+
+    def next_chunk(self, timeout_seconds: Optional[float] = None) -> Any:
+        """The next chunk, or _END when the stream finished; raises the stream's error or TimeoutError."""
+        try:
+            chunk, error = self._chunks.get(timeout=timeout_seconds)
+        except queue.Empty:
+            raise TimeoutError(f"no chunk within {timeout_seconds:.1f}s") from None
+        if error is not None:
+            raise error
+        return chunk
+
+    def abandon(self):
+        self._abandoned.set()
+
+
+class CircuitBreaker:
+    """Circuit breaker with rolling outcome/latency windows and an adaptive timeout for one provider."""
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout_seconds: float = 30.0,
+                 error_rate_threshold: float = 0.5, window_size: int = 50, timeout_percentile: float = 95, timeout_multiplier: float = 2.0,
+                 min_timeout_seconds: float = 5.0, max_timeout_seconds: float = 60.0, min_samples: int = 10,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.error_rate_threshold = error_rate_threshold  # over at least min_samples outcomes
+        self.timeout_percentile = timeout_percentile
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout_seconds = min_timeout_seconds
+        self.max_timeout_seconds = max_timeout_seconds
+        self.min_samples = min_samples
+        self._clock = clock
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._outcomes = deque(maxlen=window_size)  # True = success
+        self._latencies = deque(maxlen=window_size)  # successful calls only
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0, "probes": 0}
+
+    def allow_request(self) -> bool:
+        """Whether a call may be attempted now. In half-open state only one probe is let through."""
+        with self._lock:
+            if self.state == OPEN and self._clock() - self._opened_at >= self.reset_timeout_seconds:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self.stats["probes"] += 1
+                return True
+
+            self.stats["rejected"] += 1
+            return False
+
+    def record_success(self, latency_seconds: float):
+        with self._lock:
+            self.stats["calls"] += 1
+            self._outcomes.append(True)
+            self._latencies.append(latency_seconds)
+            self.consecutive_failures = 0
+            if self.state == HALF_OPEN:
+                # A recovered provider starts a fresh error-rate window
+                self._outcomes.clear()
+                self._outcomes.append(True)
+            self.state = CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["failures"] += 1
+            self._outcomes.append(False)
+            self.consecutive_failures += 1
+            error_rate = 1 - sum(self._outcomes) / len(self._outcomes)
+            high_error_rate = len(self._outcomes) >= self.min_samples and error_rate >= self.error_rate_threshold
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold or high_error_rate:
+                if self.state != OPEN:
+                    self.stats["opened"] += 1
+                    reason = (f"{self.consecutive_failures} consecutive failures"
+                              if self.consecutive_failures >= self.failure_threshold or self.state == HALF_OPEN
+                              else f"a {error_rate:.0%} error rate over {len(self._outcomes)} calls")
+                    print(f"⚡ Circuit for {self.name} opened after {reason}")
+                self.state = OPEN
+                self._opened_at = self._clock()
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Give back a half-open probe slot without recording an outcome (the call was cancelled)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def adaptive_timeout(self) -> float:
+        """Timeout derived from the rolling latency percentile, clamped to [min, max]."""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.min_samples:
+            return self.max_timeout_seconds
+        index = min(len(samples) - 1, max(0, math.ceil(self.timeout_percentile / 100 * len(samples)) - 1))
+        timeout = samples[index] * self.timeout_multiplier
+        return min(self.max_timeout_seconds, max(self.min_timeout_seconds, timeout))
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return round(1 - sum(self._outcomes) / len(self._outcomes), 3)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["state"] = self.state
+            stats["consecutive_failures"] = self.consecutive_failures
+            latencies = sorted(self._latencies)
+        stats["error_rate"] = self.error_rate()
+        stats["adaptive_timeout_seconds"] = round(self.adaptive_timeout(), 3)
+        stats["p50_latency_seconds"] = round(latencies[len(latencies) // 2], 3) if latencies else None
+        return stats
+
+
+class ProviderCircuitRouter:
+    """
+    Sends each call to the first provider (in preference order) whose circuit allows it,
+    failing over to the next provider on error or while a circuit is open.
+    """
+
+    def __init__(self, providers: List[Any], **breaker_options):
+        self.providers = providers
+        self.breakers = {provider.name: CircuitBreaker(provider.name, **breaker_options) for provider in providers}
+
+    def call(self, func: Callable[[Any, float], Any]) -> Any:
+        """Blocking call: func(provider, timeout_seconds) is tried provider by provider."""
+        errors = []
+        for provider in self.providers:
+            breaker = self.breakers[provider.name]
+            if not breaker.allow_request():
+                errors.append((provider.name, CircuitOpenError(f"{provider.name} circuit is open")))
+                continue
+            started = time.monotonic()
+            try:
+                result = func(provider, breaker.adaptive_timeout())
+            except Exception as e:
+                breaker.record_failure()
+                errors.append((provider.name, e))
+                print(f"⚠️ {provider.name} failed ({e})")
+                continue
+            breaker.record_success(time.monotonic() - started)
+            return result
+        raise AllProvidersFailedError(errors)
+
+    async def acall_provider(self, provider: Any, func: Callable[[Any, float], Awaitable[Any]],
+                             timeout_seconds: Optional[float] = None) -> Any:
+        """Single async attempt on one provider through its breaker (raises CircuitOpenError if open)."""
+        breaker = self.breakers[provider.name]
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"{provider.name} circuit is open")
+
+        timeout = breaker.adaptive_timeout()
+        if timeout_seconds:
+            timeout = min(timeout, timeout_seconds)
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(func(provider, timeout), timeout=timeout)
+        except asyncio.CancelledError:
+            # Cancelled by the caller (e.g. lost a hedge race): not the provider's fault
+            breaker.release_probe()
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success(time.monotonic() - started)
+        return result
+
+    async def acall(self, func: Callable[[Any, float], Awaitable[Any]], timeout_seconds: Optional[float] = None) -> Any:
+        """Async call with failover across providers."""
+        errors = []
+        for provider in self.providers:
+            try:
+                return await self.acall_provider(provider, func, timeout_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                errors.append((provider.name, e))
+        raise AllProvidersFailedError(errors)
+
+    def stream(self, func: Callable[[Any], Iterator[str]]) -> Iterator[str]:
+        """
+        Streaming call. A provider must send its first chunk, and each chunk after it, within its
+        adaptive timeout; it fails over on that deadline or on an error before the first chunk. A
+        stall or error after the first chunk counts as a failure and is raised (the answer is
+        already partly sent). Time to first chunk (not the whole stream) is the latency sample, so
+        long answers do not inflate the timeout.
+        """
+        errors = []
+        for provider in self.providers:
+            breaker = self.breakers[provider.name]
+            if not breaker.allow_request():
+                errors.append((provider.name, CircuitOpenError(f"{provider.name} circuit is open")))
+                continue
+            timeout = breaker.adaptive_timeout()
+            started = time.monotonic()
+            first_chunk_seconds = None
+            source = _ThreadedStream(lambda: func(provider))
+            try:
+                while True:
+                    chunk = source.next_chunk(timeout)
+                    if chunk is _END:
+                        break
+                    if first_chunk_seconds is None:
+                        first_chunk_seconds = time.monotonic() - started
+                    yield chunk
+            except GeneratorExit:
+                source.abandon()
+                breaker.release_probe()
+                raise
+            except Exception as e:
+                source.abandon()
+                breaker.record_failure()
+                if first_chunk_seconds is not None:
+                    raise
+                errors.append((provider.name, e))
+                print(f"⚠️ {provider.name} stream failed before its first chunk ({e})")
+                continue
+            breaker.record_success(first_chunk_seconds if first_chunk_seconds is not None else time.monotonic() - started)
+            return
+        raise AllProvidersFailedError(errors)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.get_stats() for name, breaker in self.breakers.items()}
+
+
+def create_circuit_router(providers: List[Any]) -> ProviderCircuitRouter:
+    """Build a router over providers (in preference order) configured from environment variables."""
+    return ProviderCircuitRouter(
+        providers,
+        failure_threshold=int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "3")),
+        reset_timeout_seconds=float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30")),
+        error_rate_threshold=float(os.getenv("LLM_CIRCUIT_ERROR_RATE", "0.5")),
+        min_timeout_seconds=float(os.getenv("LLM_CIRCUIT_MIN_TIMEOUT_SECONDS", "5")),
+        max_timeout_seconds=float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+    )
@@ -0,0 +1,127 @@
+"""
+Process-Wide Client Registry
+One pooled keep-alive requests.Session for storage backends and one SDK client per API key
+for the LLM providers, shared across calls, bots and Streamlit sessions.
+"""
+
+import os
+import asyncio
+import hashlib
+import threading
+from typing import Any, Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "15"))
+
+_lock = threading.Lock()
+_http_session = None
+_openai_clients: Dict[str, Any] = {}
+_async_openai_clients: Dict[Tuple[str, int], Any] = {}
+_gemini_configured_key = None
+_stats = {
+    "openai_clients_created": 0,
+    "openai_client_reuses": 0,
+    "gemini_configures": 0
+}
+
+
+def _key_id(api_key: str) -> str:
+    """Registry key for an API key (the key itself is never stored as a dict key or logged)."""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]
+
+
+def get_http_session() -> requests.Session:
+    """
+    The shared requests.Session: keep-alive connections pooled per host (HTTP_POOL_MAXSIZE)
+    and idempotent GETs retried on transient 5xx errors.
+    """
+    global _http_session
+    with _lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=int(os.getenv("HTTP_POOL_CONNECTIONS", "4")),
+                pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "16")),
+                max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504),
+                                  allowed_methods=frozenset({"GET"}))
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_session = session
+        return _http_session
+
+
+def get_openai_client(api_key: str):
+    """Singleton blocking OpenAI client per API key (its httpx pool keeps connections alive)."""
+    import openai
+
+    key_id = _key_id(api_key)
+    with _lock:
+        client = _openai_clients.get(key_id)
+        if client is None:
+            client = openai.OpenAI(api_key=api_key)
+            _openai_clients[key_id] = client
+            _stats["openai_clients_created"] += 1
+        else:
+            _stats["openai_client_reuses"] += 1
+        return client
+
+
+def get_async_openai_client(api_key: str):
+    """
+    Singleton async OpenAI client per API key and event loop. Async connections are bound to
+    the loop that opened them, so each engine loop gets its own client.
+    """
+    import openai
+
+    key = (_key_id(api_key), id(asyncio.get_running_loop()))
+    with _lock:
+        client = _async_openai_clients.get(key)
+        if client is None:
+            client = openai.AsyncOpenAI(api_key=api_key)
+            _async_openai_clients[key] = client
+            _stats["openai_clients_created"] += 1
+        else:
+            _stats["openai_client_reuses"] += 1
+        return client
+
+
+def configure_gemini(api_key: str):
+    """Configure the Gemini SDK's global client once per API key instead of once per bot."""
+    global _gemini_configured_key
+    import google.generativeai as genai
+
+    key_id = _key_id(api_key)
+    with _lock:
+        if _gemini_configured_key != key_id:
+            genai.configure(api_key=api_key)
+            _gemini_configured_key = key_id
+            _stats["gemini_configures"] += 1
+
+
+def get_client_stats() -> Dict[str, Any]:
+    """SDK client reuse counters and, per storage host, HTTP requests vs. new connections opened."""
+    with _lock:
+        stats = dict(_stats)
+        session = _http_session
+
+    hosts = {}
+    if session is not None:
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for pool_key in list(pools.keys()):
+                pool = pools.get(pool_key)
+                if pool is None:
+                    continue
+                host = f"{pool.scheme}://{pool.host}"
+                requests_sent = pool.num_requests
+                hosts[host] = {
+                    "requests": requests_sent,
+                    "connections_opened": pool.num_connections,
+                    "connection_reuse_rate": round(1 - pool.num_connections / requests_sent, 3) if requests_sent else 0.0
+                }
+    stats["http_hosts"] = hosts
+    return stats
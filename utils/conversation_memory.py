@@ -0,0 +1,170 @@
+"""
+Conversation Memory for Multi-Turn Prompts
+Keeps a rolling, compact summary of a chat session (cards, amounts, categories, earlier
+conclusions) that is updated locally after every turn and injected into prompts within a
+fixed token budget, instead of replaying full prior answers.
+"""
+
+import re
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from utils.fast_path import CATEGORY_KEYWORDS, contains_word
+from utils.prompt_serializer import estimate_tokens
+
+# Sentences in an answer that state a result or recommendation
+CONCLUSION_MARKERS = ['recommend', 'better', 'best', 'wins', 'total', 'you will earn', "you'll earn",
+                      'you get', 'you would get', 'more rewards', 'not eligible', 'excluded', 'capped']
+
+# Words and phrases that make a question lean on earlier turns ("what about dining?", "is it worth it?")
+FOLLOW_UP_MARKERS = ['it', 'that', 'this', 'these', 'those', 'them', 'they', 'same', 'previous', 'above',
+                     'earlier', 'instead', 'also', 'both', 'former', 'latter', 'what about', 'how about',
+                     'what if', 'and for']
+
+# Caption app.py appends to quick-question answers; not part of the answer itself
+TIMING_CAPTION = re.compile(r'\n*\*🤖 Processed by:.*?\*\s*$', re.DOTALL)
+
+
+class ConversationMemory:
+    """
+    Rolling summary of one chat session. update() folds in a finished turn using local
+    extraction only (no LLM call); render() returns the summary trimmed to token_budget.
+    """
+
+    def __init__(self, token_budget: int = 250, max_items: int = 6,
+                 normalize_query: Optional[Callable[[str], str]] = None,
+                 resolve_cards: Optional[Callable[[str], List[str]]] = None):
+        self.token_budget = token_budget
+        self.max_items = max_items
+        self.normalize_query = normalize_query or (lambda query: query)
+        self.resolve_cards = resolve_cards or (lambda query: [])  # e.g. CardRegistry.resolve
+        self.clear()
+
+    def clear(self):
+        """Forget the session (e.g. when the chat is reset)."""
+        self.cards = deque(maxlen=self.max_items)
+        self.amounts = deque(maxlen=self.max_items)
+        self.categories = deque(maxlen=self.max_items)
+        self.conclusions = deque(maxlen=self.max_items)
+        self.last_question: Optional[str] = None
+        self.turns = 0
+        self._synced = 0
+
+    def update(self, user_query: str, response: str):
+        """Fold one finished turn (question + answer) into the summary."""
+        query = self.normalize_query(user_query)
+        text = query.lower()
+
+        for name in self.resolve_cards(text):
+            self._remember(self.cards, name)
+        for category, keywords in CATEGORY_KEYWORDS.items():
+            if any(contains_word(text, keyword) for keyword in keywords):
+                self._remember(self.categories, category)
+        for amount in re.findall(r'₹\s*([\d,]+)', query):
+            self._remember(self.amounts, f"₹{int(amount.replace(',', '')):,}")
+
+        conclusion = self._conclusion(response)
+        if conclusion:
+            self.conclusions.append(conclusion)
+        self.last_question = user_query.strip()
+        self.turns += 1
+
+    def sync(self, messages: List[Dict[str, str]]):
+        """
+        Fold in turns from a chat transcript ([{"role", "content"}], e.g. st.session_state.messages)
+        that have not been seen yet. A trailing unanswered user message (the question being asked
+        now) is left for the next sync. A shorter transcript than before means the chat was reset.
+        """
+        if len(messages) < self._synced:
+            self.clear()
+
+        pending_query = None
+        consumed = self._synced
+        for index in range(self._synced, len(messages)):
+            message = messages[index]
+            if message.get("role") == "user":
+                pending_query = message.get("content", "")
+            elif message.get("role") == "assistant":
+                if pending_query is not None:
+                    self.update(pending_query, message.get("content", ""))
+                    pending_query = None
+                consumed = index + 1
+            if pending_query is None:
+                consumed = index + 1
+        self._synced = consumed
+
+    def render(self) -> str:
+        """
+        The summary as prompt text within token_budget, or "". Details are dropped oldest first,
+        section by section: conclusions, amounts, categories, the previous question, then cards.
+        """
+        if not self.turns:
+            return ""
+        sections = {
+            "conclusions": list(self.conclusions),
+            "amounts": list(self.amounts),
+            "categories": list(self.categories),
+            "last_question": [self.last_question[:200]] if self.last_question else [],
+            "cards": list(self.cards)
+        }
+        while True:
+            text = self._format(sections)
+            if estimate_tokens(text) <= self.token_budget:
+                return text
+            items = next((items for items in sections.values() if items), None)
+            if items is None:
+                return ""
+            items.pop(0)
+
+    def refers_back(self, user_query: str) -> bool:
+        """
+        Whether a question depends on earlier turns: it uses a FOLLOW_UP_MARKERS word or names no
+        card (so the cards discussed so far decide the answer). Standalone questions do not.
+        """
+        if not self.turns:
+            return False
+        text = self.normalize_query(user_query).lower()
+        if any(contains_word(text, marker) for marker in FOLLOW_UP_MARKERS):
+            return True
+        return not self.resolve_cards(text)
+
+    def to_dict(self) -> Dict:
+        """JSON-serialisable summary (used in cache keys)."""
+        return {
+            "cards": list(self.cards),
+            "amounts": list(self.amounts),
+            "categories": list(self.categories),
+            "conclusions": list(self.conclusions),
+            "last_question": self.last_question
+        }
+
+    def _format(self, sections: Dict[str, List[str]]) -> str:
+        lines = [f"\nCONVERSATION CONTEXT (summary of {self.turns} earlier turn(s)):"]
+        if sections["cards"]:
+            lines.append(f"- Cards discussed: {', '.join(sections['cards'])}")
+        if sections["amounts"]:
+            lines.append(f"- Spend amounts mentioned: {', '.join(sections['amounts'])}")
+        if sections["categories"]:
+            lines.append(f"- Spend categories: {', '.join(sections['categories'])}")
+        if sections["last_question"]:
+            lines.append(f"- Previous question: {sections['last_question'][0]}")
+        if sections["conclusions"]:
+            lines.append("- Earlier conclusions:")
+            lines.extend(f"  - {conclusion}" for conclusion in sections["conclusions"])
+        return "\n".join(lines) + "\n"
+
+    def _remember(self, items: deque, value: str):
+        """Move value to the most-recent end without duplicating it."""
+        if value in items:
+            items.remove(value)
+        items.append(value)
+
+    def _conclusion(self, response: str) -> Optional[str]:
+        """First sentence of an answer that states a result or recommendation, without markdown."""
+        text = TIMING_CAPTION.sub('', response)
+        text = re.sub(r'[*_#`>|]', '', text)
+        for sentence in re.split(r'(?<=[.!?])\s+|\n+', text):
+            sentence = sentence.strip(" -•\t")
+            if len(sentence) > 15 and any(marker in sentence.lower() for marker in CONCLUSION_MARKERS):
+                return sentence if len(sentence) <= 160 else sentence[:157].rstrip() + "..."
+        return None
@@ -0,0 +1,53 @@
+"""
+Background Event Loop for the QA Engines
+Runs one asyncio loop in a daemon thread so synchronous callers (Streamlit, scripts) and
+async callers share the same async provider clients, semaphores and in-flight calls.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Optional
+
+
+class BackgroundEventLoop:
+    """An asyncio event loop running in its own daemon thread, started on first use."""
+
+    def __init__(self, name: str = "qa-engine-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The running loop (started lazily)."""
+        with self._lock:
+            if self._loop is None:
+                ready = threading.Event()
+                self._loop = asyncio.new_event_loop()
+
+                def run_forever():
+                    asyncio.set_event_loop(self._loop)
+                    ready.set()
+                    self._loop.run_forever()
+
+                self._thread = threading.Thread(target=run_forever, name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+            return self._loop
+
+    def is_current(self) -> bool:
+        """True when called from code already running on this loop."""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def run(self, coro: Awaitable[Any]) -> Any:
+        """Block the calling thread until coro finishes on the background loop."""
+        if self.is_current():
+            raise RuntimeError("Cannot block on the engine loop from inside it; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def run_async(self, coro: Awaitable[Any]) -> Any:
+        """Await coro on the background loop from any event loop; cancellation propagates."""
+        if self.is_current():
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
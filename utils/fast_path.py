@@ -0,0 +1,237 @@
+"""
+Local Fast Path for Calculable Queries
+Answers fully-specified reward calculation and comparison questions (one amount, one
+spend category, a known set of cards) from the reward calculator, without an LLM call.
+"""
+
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.reward_calculator import calculate_rewards
+from utils.reward_rules import get_reward_table
+
+# Spend categories understood by calculate_rewards, with the words that signal them
+CATEGORY_KEYWORDS = {
+    'hotel': ['hotel', 'hotels'],
+    'travel': ['travel', 'trip', 'airline', 'flight', 'flights'],
+    'dining': ['dining', 'restaurant', 'food', 'eating out'],
+    'fuel': ['fuel', 'petrol', 'gas'],
+    'utility': ['utility', 'utilities'],
+    'rent': ['rent'],
+    'education': ['education', 'school', 'college'],
+    'insurance': ['insurance'],
+    'government': ['government', 'govt', 'tax'],
+    'gaming': ['gaming', 'games'],
+    'wallet': ['wallet', 'paytm', 'phonepe', 'gpay'],
+    'gold': ['gold', 'jewellery', 'jewelry'],
+    'grocery': ['grocery', 'groceries', 'supermarket']
+}
+
+# A comparison that names no card is calculated for every card only in a portfolio this small
+MAX_COMPARED_CARDS = 4
+
+REWARD_WORDS = ['point', 'mile', 'reward', 'earn', 'get back', 'gives more', 'better']
+COMPARISON_WORDS = ['which card', 'compare', 'better', ' vs', 'versus', 'both', 'more rewards', 'gives more']
+
+# Questions that need more than one exact calculation (milestones, fees, splits...) go to the LLM
+LLM_ONLY_WORDS = [
+    'milestone', 'yearly', 'annual', 'per year', 'a year', 'split', '%', 'fee', 'charge', 'lounge',
+    'tier', 'transfer', 'redeem', 'redemption', 'voucher', 'welcome', 'joining', 'renewal', 'cap',
+    'capped', 'excluded', 'exclusion', 'why', 'instead', 'worth', 'value', 'balance', 'have'
+]
+
+# A spend amount carries a currency marker or follows one of these verbs; counts of points/miles are not spend
+SPEND_VERBS = ['spend', 'spends', 'spent', 'spending', 'pay', 'paid', 'paying', 'purchase', 'buy', 'bought',
+               'book', 'booked', 'booking', 'shop', 'shopping']
+_SPEND_AMOUNT_PATTERN = re.compile(
+    r'(?:(?:₹|\brs\.?|\binr)\s*|\b(?:' + '|'.join(SPEND_VERBS) + r')\s+(?:of\s+|on\s+|about\s+|around\s+|over\s+)?)'
+    r'(\d[\d,]*)(?![\d,]*\s*(?:edge\s+|reward\s+)?(?:points?|miles?)\b)'
+)
+
+# Spend over a span ("over 3 months", "per quarter", "this year") meets monthly caps month by month
+_SPAN_PATTERN = re.compile(
+    r'\b(?:[2-9]|[1-9]\d+)\s*-?\s*months?\b|\bmonths\b|\bquarter(?:s|ly)?\b|\bweek(?:s|ly)?\b|\bdaily\b'
+    r'|\bper\s+day\b|\b(?:this|next|last|whole|full|entire)\s+year\b'
+)
+
+
+def contains_word(text: str, word: str) -> bool:
+    """Whole-word match for single words, substring match for phrases and symbols."""
+    if re.fullmatch(r'[a-z]+', word):
+        return re.search(rf'\b{word}s?\b', text) is not None
+    return word in text
+
+
+def _rupee_spend_amounts(text: str) -> List[int]:
+    """Amounts in lower-cased text that are spend: '₹5000', 'rs 5000', 'spend 5000' (not '5000 miles')."""
+    return [int(number.replace(',', '')) for number in _SPEND_AMOUNT_PATTERN.findall(text)]
+
+
+def _spend_amounts(text: str) -> List[int]:
+    """Rupee amounts (100 or more) in text, ignoring percentages."""
+    numbers = re.findall(r'(?<![\d.,])(\d[\d,]*)(?![\d,.]*\s*%)', text)
+    return [amount for amount in (int(number.replace(',', '')) for number in numbers) if amount >= 100]
+
+
+def parse_spend_split(query: str) -> Optional[Dict[Optional[str], int]]:
+    """
+    Spend per category for a multi-category question ("₹100000 monthly split as 20% rent,
+    10% utility, 30% travel" or "₹20000 on rent and ₹5000 on dining"), with any unallocated
+    remainder of the total under None (general spend). Expects normalised currency; returns
+    None unless at least two categories are allocated consistently.
+    """
+    text = query.lower()
+    amounts = _spend_amounts(text)
+
+    percents: Dict[str, float] = {}
+    allocation: Dict[Optional[str], int] = {}
+    for part in re.split(r',(?!\d)|[;+\n]|\band\b', text):
+        categories = [category for category, keywords in CATEGORY_KEYWORDS.items()
+                      if any(contains_word(part, keyword) for keyword in keywords)]
+        if len(categories) != 1:
+            continue
+        percent = re.search(r'(\d+(?:\.\d+)?)\s*%', part)
+        part_amounts = _spend_amounts(part)
+        if percent:
+            percents[categories[0]] = percents.get(categories[0], 0.0) + float(percent.group(1))
+        elif part_amounts:
+            allocation[categories[0]] = allocation.get(categories[0], 0) + part_amounts[0]
+
+    if percents:
+        total = max(amounts) if amounts else 0
+        if not total or sum(percents.values()) > 100:
+            return None
+        for category, percent in percents.items():
+            allocation[category] = allocation.get(category, 0) + round(total * percent / 100)
+        remainder = total - sum(allocation.values())
+        if remainder > 0:
+            allocation[None] = remainder
+    if len([category for category in allocation if category]) < 2:
+        return None
+    return allocation
+
+
+class FastPathRouter:
+    """
+    Routing stage in front of the LLM. route() returns a locally rendered answer when the
+    query is fully specified, otherwise None with the reason recorded for the LLM path.
+    """
+
+    def __init__(self, cards_data: Dict[str, Dict[str, Any]], resolve_cards: Callable[[str], List[str]]):
+        self.cards_data = cards_data
+        self.resolve_cards = resolve_cards  # card names a query mentions (CardRegistry.resolve)
+        self._lock = threading.Lock()
+        self.stats = {
+            "local": 0,
+            "llm": 0,
+            "fallthrough_reasons": {},
+            "local_categories": {}
+        }
+
+    def route(self, query: str) -> Optional[str]:
+        """Answer query locally if possible. Expects currency already normalised (₹100000, not 1L)."""
+        plan, reason = self.plan(query)
+        if plan is None:
+            self._record(False, reason)
+            return None
+
+        answer = self.render(*plan)
+        if answer is None:
+            # A query planned as calculable that the calculator could not answer is a misroute
+            self._record(False, "calculation unavailable")
+            print(f"⚠️ Fast path could not calculate {plan[2]} for {', '.join(plan[0])}; using the LLM")
+            return None
+
+        self._record(True, plan[2])
+        return answer
+
+    def plan(self, query: str) -> Tuple[Optional[Tuple[List[str], int, str]], str]:
+        """Return ((cards, amount, category), "") for a fully-specified query, else (None, reason)."""
+        text = query.lower()
+
+        for word in LLM_ONLY_WORDS:
+            if contains_word(text, word):
+                return None, f"needs reasoning: '{word.strip()}'"
+
+        # The calculator applies monthly caps to the whole amount, so it answers one month of spend only
+        if _SPAN_PATTERN.search(text):
+            return None, "spend spans several months"
+
+        if not any(contains_word(text, word) for word in REWARD_WORDS):
+            return None, "not a reward question"
+
+        amounts = set(_rupee_spend_amounts(text))
+        if len(amounts) != 1:
+            return None, "no single spend amount" if not amounts else "multiple amounts"
+        amount = amounts.pop()
+        if amount < 100:
+            return None, "no single spend amount"
+
+        categories = [category for category, keywords in CATEGORY_KEYWORDS.items()
+                      if any(contains_word(text, keyword) for keyword in keywords)]
+        if len(categories) != 1:
+            return None, "no spend category" if not categories else "multiple categories"
+
+        cards = [name for name in self.resolve_cards(text) if name in self.cards_data]
+        if not cards:
+            if not any(word in text for word in COMPARISON_WORDS) or len(self.cards_data) > MAX_COMPARED_CARDS:
+                return None, "no card specified"
+            cards = list(self.cards_data)
+
+        return (cards, amount, categories[0]), ""
+
+    def render(self, cards: List[str], amount: int, category: str) -> Optional[str]:
+        """Render the calculation (and a recommendation when comparing) from the reward calculator."""
+        results = [calculate_rewards(self.cards_data, card, amount, category) for card in cards]
+        if not results or any('error' in result for result in results):
+            return None
+
+        response_text = f"For spending ₹{amount:,} on {category}:\n\n"
+        for result in results:
+            earned, unit = self._earned(result)
+            response_text += f"**{result['card']}**: {earned:,} {unit}\n"
+            response_text += f"- Rate: {result['rate']}\n"
+            response_text += f"- Calculation: {result['calculation']}\n\n"
+
+        if len(results) > 1:
+            response_text += self._recommendation(results)
+        return response_text.rstrip() + "\n"
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Local vs LLM routing counts, local hit rate and why queries fell through."""
+        with self._lock:
+            stats = {key: (dict(value) if isinstance(value, dict) else value) for key, value in self.stats.items()}
+        total = stats["local"] + stats["llm"]
+        stats["local_hit_rate"] = round(stats["local"] / total, 3) if total else 0.0
+        return stats
+
+    def _earned(self, result: Dict[str, Any]) -> Tuple[int, str]:
+        """Units earned and the card's own unit label from its compiled rate ("EDGE Miles", "points")."""
+        earned = result['miles_earned'] if 'miles_earned' in result else result['points_earned']
+        table = get_reward_table(self.cards_data[result['card']])
+        return earned, table["base"][1] if table else ("miles" if 'miles_earned' in result else "points")
+
+    def _recommendation(self, results: List[Dict[str, Any]]) -> str:
+        """Compare by rupee value using each card's value_per_point (e.g. "₹1 per EDGE Mile")."""
+        values = []
+        for result in results:
+            earned, _ = self._earned(result)
+            value_text = self.cards_data[result['card']].get('rewards', {}).get('value_per_point', '')
+            match = re.search(r'₹\s*(\d+(?:\.\d+)?)', value_text)
+            if not match:
+                return ""
+            values.append((earned * float(match.group(1)), result['card'], value_text))
+
+        values.sort(reverse=True)
+        value_summary = ", ".join(f"{card}: ≈₹{value:,.0f} ({value_text})" for value, card, value_text in values)
+        if values[0][0] == values[1][0]:
+            return f"**Result**: Both cards earn the same value ({value_summary})."
+        return f"**Better choice**: {values[0][1]} ({value_summary})."
+
+    def _record(self, local: bool, detail: Optional[str]):
+        """Count a routing decision: the category answered locally, or why the query went to the LLM."""
+        counts = self.stats["local_categories"] if local else self.stats["fallthrough_reasons"]
+        with self._lock:
+            self.stats["local" if local else "llm"] += 1
+            counts[detail] = counts.get(detail, 0) + 1
@@ -0,0 +1,128 @@
+"""
+Hedged LLM Requests
+If the primary provider has not answered by an adaptive deadline (its rolling latency
+percentile), the same prompt is sent to the secondary provider and the first answer wins.
+"""
+
+import math
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class LatencyTracker:
+    """Rolling window of call latencies (seconds) for one provider."""
+
+    def __init__(self, window_size: int = 200):
+        self._samples = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    def record(self, latency_seconds: float):
+        with self._lock:
+            self._samples.append(latency_seconds)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Nearest-rank percentile of the window, or None if it is empty."""
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class HedgedCaller:
+    """
+    Runs a primary call and, if it is slower than the adaptive deadline (or fails), races a
+    secondary call against it. The loser is cancelled. Counts hedges and wins per provider.
+    """
+
+    def __init__(self, percentile: float = 90, default_deadline_seconds: float = 4.0,
+                 min_deadline_seconds: float = 0.5, min_samples: int = 10):
+        self.percentile = percentile
+        self.default_deadline_seconds = default_deadline_seconds
+        self.min_deadline_seconds = min_deadline_seconds
+        self.min_samples = min_samples
+        self.latency: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "hedged": 0,
+            "hedged_after_error": 0,
+            "wins": {}
+        }
+
+    def deadline_for(self, provider_name: str) -> float:
+        """Adaptive hedge deadline: the provider's rolling percentile once enough samples exist."""
+        tracker = self._tracker(provider_name)
+        if tracker.count() < self.min_samples:
+            return self.default_deadline_seconds
+        return max(self.min_deadline_seconds, tracker.percentile(self.percentile))
+
+    async def call(self, primary_name: str, primary: Callable[[], Awaitable[Any]],
+                   secondary_name: str, secondary: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the first successful result of primary (and secondary, if hedged)."""
+        self._count("requests")
+        deadline = self.deadline_for(primary_name)
+        tasks = {asyncio.ensure_future(primary()): (primary_name, time.monotonic())}
+
+        try:
+            done, _ = await asyncio.wait(tasks.keys(), timeout=deadline)
+            primary_task = next(iter(tasks))
+            if done and primary_task.exception() is None:
+                return self._finish(primary_task, tasks)
+
+            # Primary is slow (or already failed): fire the same prompt at the secondary
+            self._count("hedged_after_error" if done else "hedged")
+            tasks[asyncio.ensure_future(secondary())] = (secondary_name, time.monotonic())
+
+            pending = {task for task in tasks if not task.done()}
+            last_error = primary_task.exception() if done else None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return self._finish(task, tasks)
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task, (name, started) in tasks.items():
+                if not task.done():
+                    task.cancel()
+                    if name == primary_name:
+                        # Censored sample: the primary took at least this long
+                        self._tracker(name).record(time.monotonic() - started)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hedge rate, win counts per provider and current deadlines."""
+        with self._lock:
+            stats = {key: (dict(value) if isinstance(value, dict) else value) for key, value in self.stats.items()}
+            providers = list(self.latency.keys())
+        total_hedged = stats["hedged"] + stats["hedged_after_error"]
+        stats["hedge_rate"] = round(total_hedged / stats["requests"], 3) if stats["requests"] else 0.0
+        stats["deadlines_seconds"] = {name: round(self.deadline_for(name), 3) for name in providers}
+        return stats
+
+    def _finish(self, task: "asyncio.Future", tasks: Dict["asyncio.Future", Tuple[str, float]]) -> Any:
+        """Record the winner's latency and win count, then return its result."""
+        name, started = tasks[task]
+        self._tracker(name).record(time.monotonic() - started)
+        with self._lock:
+            self.stats["wins"][name] = self.stats["wins"].get(name, 0) + 1
+        return task.result()
+
+    def _tracker(self, provider_name: str) -> LatencyTracker:
+        with self._lock:
+            if provider_name not in self.latency:
+                self.latency[provider_name] = LatencyTracker()
+            return self.latency[provider_name]
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
@@ -0,0 +1,117 @@
+"""
+Precompiled Intent Matcher
+Evaluates an ordered list of (intent, regex patterns) rules and returns the first rule with a
+match, like calling re.search pattern by pattern, but with one scan for the literal keywords
+the patterns require so that only rules that can possibly match run their (precompiled) regex.
+"""
+
+import re
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+# Characters that end a literal run inside a pattern segment
+_REGEX_SPECIAL = set('()[]{}.*+?|\\^$')
+
+
+def _requirements(pattern: str) -> List[Tuple[str, ...]]:
+    """
+    Literal keywords a text must contain for pattern to match, as a list of alternatives per
+    '.*'-separated segment: ("tier",) for a literal run, ("gold", "silver") for a pure group.
+    Returns [] when nothing can be inferred (the pattern is then always evaluated).
+    """
+    if '|' in re.sub(r'\([^()]*\)', '', pattern):
+        return []  # top-level alternation: no keyword is required
+    requirements = []
+    for segment in pattern.split('.*'):
+        group = re.fullmatch(r'\(([a-z0-9 |\-]+)\)', segment)
+        if group:
+            options = tuple(group.group(1).split('|'))
+            if min(len(option) for option in options) >= 2:
+                requirements.append(options)
+            continue
+        run = ''
+        for char in segment:
+            if char in _REGEX_SPECIAL:
+                if char in '?*{':
+                    run = run[:-1]  # the quantified character is optional
+                break
+            run += char
+        if len(run) >= 2:
+            requirements.append((run,))
+    return requirements
+
+
+def _trie_regex(words: Sequence[str]) -> str:
+    """Regex matching any of words, factored as a trie so each position is checked in O(depth)."""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Longer continuations are tried first, so each position reports its longest keyword
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+class IntentMatcher:
+    """
+    First-match intent rules. A single pass of a keyword trie (an Aho-Corasick-style scan built
+    from the patterns' required literals) selects the candidate rules; candidates are then
+    checked in priority order with one precompiled regex per rule. The result is always the
+    same as searching every pattern in order.
+    """
+
+    def __init__(self, rules: Sequence[Tuple[str, Sequence[str]]]):
+        self.rules = [(intent, list(patterns)) for intent, patterns in rules]
+        self.intents = [intent for intent, _ in self.rules]
+        self.rule_regexes = [re.compile('|'.join(f'(?:{p})' for p in patterns)) for _, patterns in self.rules]
+
+        # Rules with a pattern whose keywords cannot be inferred are always candidates
+        self.always_candidates: Set[int] = set()
+        rules_by_keyword: Dict[str, Set[int]] = {}
+        for index, (_, patterns) in enumerate(self.rules):
+            for pattern in patterns:
+                requirements = _requirements(pattern)
+                if not requirements:
+                    self.always_candidates.add(index)
+                    continue
+                # One requirement is enough to rule the pattern out: take the most selective
+                keywords = max(requirements, key=lambda options: min(len(option) for option in options))
+                for keyword in keywords:
+                    rules_by_keyword.setdefault(keyword, set()).add(index)
+
+        keywords = sorted(rules_by_keyword, key=len, reverse=True)
+        # The scan reports the longest keyword at each position; shorter keywords that are its
+        # prefixes start at the same position and are present too
+        self.rules_for_match: Dict[str, FrozenSet[int]] = {
+            keyword: frozenset().union(*(rules_by_keyword[other] for other in keywords if keyword.startswith(other)))
+            for keyword in keywords
+        }
+        self.keyword_scanner = re.compile('(?=(' + _trie_regex(keywords) + '))') if keywords else None
+
+    def match(self, text: str) -> Optional[str]:
+        """Intent of the first rule with a pattern matching anywhere in text, or None."""
+        candidates = set(self.always_candidates)
+        if self.keyword_scanner:
+            for keyword in self.keyword_scanner.findall(text):
+                if keyword:
+                    candidates |= self.rules_for_match[keyword]
+        for index in sorted(candidates):
+            if self.rule_regexes[index].search(text):
+                return self.intents[index]
+        return None
+
+    def match_sequential(self, text: str) -> Optional[str]:
+        """Reference behaviour: re.search every pattern, rule by rule."""
+        for intent, patterns in self.rules:
+            for pattern in patterns:
+                if re.search(pattern, text):
+                    return intent
+        return None
@@ -0,0 +1,329 @@
+"""
+LLM Provider Clients
+Wrappers around the Gemini and OpenAI SDKs exposing blocking, streaming and async calls
+behind one interface, so the engines do not branch on the provider at every call site.
+"""
+
+import os
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from typing import Dict, Iterator, List, Optional
+
+from utils.client_registry import configure_gemini, get_async_openai_client, get_openai_client
+
+# Try to import Google's Gemini
+try:
+    import google.generativeai as genai
+    GEMINI_AVAILABLE = True
+except ImportError:
+    GEMINI_AVAILABLE = False
+
+
+class LLMProvider:
+    """
+    Interface shared by every provider: complete(), stream() and acomplete().
+    max_tokens / temperature of None leave the SDK default; timeout bounds one blocking call.
+    """
+
+    name = "base"
+
+    def __init__(self, model: str):
+        self.model = model
+        self._siblings: Dict[str, "LLMProvider"] = {}
+        self._siblings_lock = threading.Lock()
+
+    def with_model(self, model: Optional[str]) -> "LLMProvider":
+        """
+        This provider bound to another model (same credentials and pooled clients), created once
+        per model. None or the current model returns the provider itself.
+        """
+        if not model or model == self.model:
+            return self
+        with self._siblings_lock:
+            if model not in self._siblings:
+                self._siblings[model] = self._create_sibling(model)
+            return self._siblings[model]
+
+    def _create_sibling(self, model: str) -> "LLMProvider":
+        """Providers without a model choice (fakes, replays) answer for every model themselves."""
+        return self
+
+    def enable_prefix_cache(self, ttl_seconds: int):
+        """
+        Ask the provider to cache the system prompt explicitly (one cache per distinct prompt).
+        Providers without explicit caching rely on automatic prefix caching and ignore this.
+        """
+
+    def complete(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000,
+                 temperature: Optional[float] = 0.1, timeout: Optional[float] = None) -> str:
+        raise NotImplementedError
+
+    def stream(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000, temperature: Optional[float] = 0.1) -> Iterator[str]:
+        raise NotImplementedError
+
+    async def acomplete(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000, temperature: Optional[float] = 0.1) -> str:
+        raise NotImplementedError
+
+
+class GeminiProvider(LLMProvider):
+    """
+    Google Gemini. The system prompt is prepended to the user prompt, or held in an explicit
+    context cache (CachedContent) when enable_prefix_cache() has been called.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str = "gemini-1.5-flash"):
+        super().__init__(model)
+        self.api_key = api_key
+        configure_gemini(api_key)
+        self.gemini_model = genai.GenerativeModel(model)
+        self.prefix_cache_ttl_seconds: Optional[int] = None
+        # System prompt hash -> (CachedContent, model bound to it), or None if caching it failed
+        self._prefix_caches: Dict[str, Optional[tuple]] = {}
+        self._prefix_lock = threading.Lock()
+
+    def enable_prefix_cache(self, ttl_seconds: int):
+        self.prefix_cache_ttl_seconds = ttl_seconds
+        for sibling in list(self._siblings.values()):
+            sibling.enable_prefix_cache(ttl_seconds)
+
+    def _create_sibling(self, model: str) -> LLMProvider:
+        sibling = GeminiProvider(self.api_key, model)
+        sibling.prefix_cache_ttl_seconds = self.prefix_cache_ttl_seconds
+        return sibling
+
+    def _cached_model(self, system_prompt: str):
+        """
+        Model bound to a CachedContent holding system_prompt, created on first use per distinct
+        prompt (i.e. once per data version). The previous cache is deleted when the prompt changes.
+        Returns None when explicit caching is off or the API refuses (e.g. prompt below the minimum size).
+        """
+        if not self.prefix_cache_ttl_seconds:
+            return None
+        prompt_hash = hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()[:16]
+        with self._prefix_lock:
+            if prompt_hash not in self._prefix_caches:
+                try:
+                    cached_content = genai.caching.CachedContent.create(
+                        model=self.model,
+                        display_name=f"card-qa-{prompt_hash}",
+                        system_instruction=system_prompt,
+                        ttl=self.prefix_cache_ttl_seconds
+                    )
+                    entry = (cached_content, genai.GenerativeModel.from_cached_content(cached_content))
+                    print(f"🧊 Created Gemini context cache for prompt {prompt_hash}")
+                except Exception as e:
+                    print(f"⚠️ Gemini context cache unavailable ({e}); sending the prompt prefix inline")
+                    entry = None
+                for stale in [cache for cache in self._prefix_caches.values() if cache]:
+                    try:
+                        stale[0].delete()
+                    except Exception:
+                        pass  # expires on its own TTL
+                self._prefix_caches = {prompt_hash: entry}
+            entry = self._prefix_caches[prompt_hash]
+        return entry[1] if entry else None
+
+    def _model_and_contents(self, system_prompt: str, prompt: str):
+        """Send only the prompt to a context-cached model, else the full text to the plain model."""
+        cached_model = self._cached_model(system_prompt)
+        if cached_model is not None:
+            return cached_model, prompt
+        return self.gemini_model, system_prompt + "\n\n" + prompt
+
+    def _generation_config(self, max_tokens: Optional[int], temperature: Optional[float]):
+        if max_tokens is None and temperature is None:
+            return None
+        return genai.types.GenerationConfig(
+            temperature=temperature,
+            max_output_tokens=max_tokens,
+        )
+
+    def complete(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000,
+                 temperature: Optional[float] = 0.1, timeout: Optional[float] = None) -> str:
+        model, contents = self._model_and_contents(system_prompt, prompt)
+        response = model.generate_content(
+            contents,
+            generation_config=self._generation_config(max_tokens, temperature),
+            request_options={"timeout": timeout} if timeout else None
+        )
+        return response.text
+
+    def stream(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000, temperature: Optional[float] = 0.1) -> Iterator[str]:
+        model, contents = self._model_and_contents(system_prompt, prompt)
+        response = model.generate_content(
+            contents,
+            generation_config=self._generation_config(max_tokens, temperature),
+            stream=True
+        )
+        for chunk in response:
+            # Chunks without parts (e.g. safety or finish metadata) carry no text
+            if chunk.parts:
+                yield chunk.text
+
+    async def acomplete(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000, temperature: Optional[float] = 0.1) -> str:
+        if self.prefix_cache_ttl_seconds:
+            # Creating the context cache is a blocking API call; keep it off the event loop
+            model, contents = await asyncio.to_thread(self._model_and_contents, system_prompt, prompt)
+        else:
+            model, contents = self._model_and_contents(system_prompt, prompt)
+        response = await model.generate_content_async(
+            contents,
+            generation_config=self._generation_config(max_tokens, temperature)
+        )
+        return response.text
+
+
+class OpenAIProvider(LLMProvider):
+    """
+    OpenAI chat completions with the system prompt as a system message. Identical leading
+    messages are prefix-cached by OpenAI automatically, so there is no explicit cache handle.
+    """
+
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo"):
+        super().__init__(model)
+        self.api_key = api_key
+        # Shared per API key across bots and sessions; the async client is resolved per event loop
+        self.client = get_openai_client(api_key)
+
+    def _create_sibling(self, model: str) -> LLMProvider:
+        return OpenAIProvider(self.api_key, model)
+
+    def _request(self, system_prompt: str, prompt: str, max_tokens: Optional[int], temperature: Optional[float]):
+        """Keyword arguments for chat.completions.create, omitting settings left at the SDK default."""
+        request = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ]
+        }
+        if temperature is not None:
+            request["temperature"] = temperature
+        if max_tokens is not None:
+            request["max_tokens"] = max_tokens
+        return request
+
+    def complete(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000,
+                 temperature: Optional[float] = 0.1, timeout: Optional[float] = None) -> str:
+        client = self.client.with_options(timeout=timeout) if timeout else self.client
+        response = client.chat.completions.create(**self._request(system_prompt, prompt, max_tokens, temperature))
+        return response.choices[0].message.content
+
+    def stream(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000, temperature: Optional[float] = 0.1) -> Iterator[str]:
+        stream = self.client.chat.completions.create(
+            **self._request(system_prompt, prompt, max_tokens, temperature),
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def acomplete(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000, temperature: Optional[float] = 0.1) -> str:
+        response = await get_async_openai_client(self.api_key).chat.completions.create(
+            **self._request(system_prompt, prompt, max_tokens, temperature)
+        )
+        return response.choices[0].message.content
+
+
+class FakeProvider(LLMProvider):
+    """
+    Local stand-in for a real provider: returns a canned answer after an injected delay and
+    fails a configurable fraction of calls. Attributes can be changed at runtime to simulate
+    a provider degrading and recovering.
+    """
+
+    def __init__(self, name: str = "fake", response: str = "This is a canned answer.",
+                 latency_seconds: float = 0.0, jitter_seconds: float = 0.0, error_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        super().__init__(f"{name}-fake")
+        self.name = name
+        self.response = response
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.error_rate = error_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def _next_call(self):
+        """Count the call and draw its delay and whether it fails."""
+        self.calls += 1
+        delay = self.latency_seconds + self._random.uniform(0, self.jitter_seconds)
+        return delay, self._random.random() < self.error_rate
+
+    def _fail(self):
+        raise ConnectionError("injected provider failure")
+
+    def complete(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000,
+                 temperature: Optional[float] = 0.1, timeout: Optional[float] = None) -> str:
+        delay, fails = self._next_call()
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"request timed out after {timeout:.1f}s")
+        time.sleep(delay)
+        if fails:
+            self._fail()
+        return self.response
+
+    def stream(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000, temperature: Optional[float] = 0.1) -> Iterator[str]:
+        delay, fails = self._next_call()
+        time.sleep(delay)
+        if fails:
+            self._fail()
+        words = self.response.split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+
+    async def acomplete(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000, temperature: Optional[float] = 0.1) -> str:
+        delay, fails = self._next_call()
+        await asyncio.sleep(delay)
+        if fails:
+            self._fail()
+        return self.response
+
+
+def create_providers_from_env(gemini_model: str = "gemini-1.5-flash",
+                              openai_model: str = "gpt-3.5-turbo") -> List[LLMProvider]:
+    """
+    Providers in preference order: Gemini first when its key and SDK are available, then
+    OpenAI when its key is set. Raises ValueError when no provider can be configured.
+
+    LLM_PROVIDER_MODE selects live (default), record (live calls saved as cassettes under
+    LLM_CASSETTE_DIR) or replay (cassettes served offline; no API keys needed).
+    """
+    mode = os.getenv("LLM_PROVIDER_MODE", "live").lower()
+    cassette_dir = os.getenv("LLM_CASSETTE_DIR", "cassettes")
+    if mode not in ("live", "record", "replay"):
+        raise ValueError(f"Unknown LLM_PROVIDER_MODE '{mode}' (expected live, record or replay)")
+
+    if mode == "replay":
+        from utils.provider_cassettes import replay_providers_from_env
+        print(f"📼 Replaying recorded LLM responses from {cassette_dir}")
+        return replay_providers_from_env(cassette_dir)
+
+    providers = _live_providers(gemini_model, openai_model)
+    if mode == "record":
+        from utils.provider_cassettes import RecordingProvider
+        print(f"🔴 Recording LLM responses to {cassette_dir}")
+        providers = [RecordingProvider(provider, cassette_dir) for provider in providers]
+    return providers
+
+
+def _live_providers(gemini_model: str, openai_model: str) -> List[LLMProvider]:
+    gemini_key = os.getenv("GOOGLE_API_KEY")
+    openai_key = os.getenv("OPENAI_API_KEY")
+
+    providers: List[LLMProvider] = []
+    if gemini_key and GEMINI_AVAILABLE:
+        providers.append(GeminiProvider(gemini_key, gemini_model))
+    if openai_key:
+        providers.append(OpenAIProvider(openai_key, openai_model))
+    if not providers:
+        raise ValueError("No API key found! Please set GOOGLE_API_KEY or OPENAI_API_KEY in .env file")
+    return providers
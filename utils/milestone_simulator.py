@@ -0,0 +1,199 @@
+"""
+Year-Long Milestone and Tier Simulator
+Replays a 12-month spend schedule month by month for a card: statement-cycle and monthly
+travel caps, milestone bonuses as cumulative spend crosses each threshold, spend-based tier
+transitions and the annual fee reversal threshold. Vectorized with NumPy, so a whole grid of
+spend levels (or schedules) is simulated in one pass.
+"""
+
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from utils.fast_path import CATEGORY_KEYWORDS, contains_word, _spend_amounts
+from utils.reward_calculator import calculate_rewards_batch
+from utils.reward_rules import counts_toward_fee_reversal, counts_toward_milestones, get_reward_table
+
+MONTHS = 12
+
+# Questions about accrual over a year rather than a single spend
+YEAR_WORDS = ['milestone', 'yearly', 'annual', 'annually', 'per year', 'a year', 'tier', 'fee reversal', 'fee waiver']
+MONTHLY_WORDS = ['monthly', 'per month', 'a month', 'every month']
+
+
+def parse_year_question(query: str) -> Optional[Dict[str, Any]]:
+    """
+    {"annual_spend", "category"} for a year-long question with one spend amount (monthly amounts
+    are annualised; category is None unless exactly one is named), else None. Expects normalised currency.
+    """
+    text = query.lower()
+    if not any(contains_word(text, word) for word in YEAR_WORDS):
+        return None
+    amounts = set(_spend_amounts(text))
+    if len(amounts) != 1:
+        return None
+    amount = amounts.pop()
+    if any(contains_word(text, word) for word in MONTHLY_WORDS):
+        amount *= MONTHS
+    categories = [category for category, keywords in CATEGORY_KEYWORDS.items()
+                  if any(contains_word(text, keyword) for keyword in keywords)]
+    return {"annual_spend": amount, "category": categories[0] if len(categories) == 1 else None}
+
+
+def even_schedule(annual_spend: float, months: int = MONTHS, step: int = 1000) -> np.ndarray:
+    """
+    An annual spend spread over the months in whole multiples of step (₹1,000 divides every
+    per-₹100/₹200 earning rate, so monthly rounding loses nothing), remainder in the last month.
+    """
+    monthly = np.full(months, (annual_spend / months) // step * step)
+    monthly[-1] = annual_spend - monthly[:-1].sum()
+    return monthly
+
+
+def _first_month(cumulative: np.ndarray, thresholds: Sequence[float]) -> np.ndarray:
+    """[profile, threshold] index of the first month the cumulative spend reaches each threshold (-1 = never)."""
+    reached = cumulative[:, :, np.newaxis] >= np.asarray(thresholds, dtype=float)[np.newaxis, np.newaxis, :]
+    return np.where(reached.any(axis=1), reached.argmax(axis=1), -1)
+
+
+def simulate_year(cards_data: Dict[str, Dict[str, Any]], card_name: str, schedule: Any,
+                  categories: Sequence[Optional[str]]) -> Dict[str, Any]:
+    """
+    Simulate one anniversary year. schedule is [month, category] or [profile, month, category]
+    monthly spend (None = general spend). Returns per-profile arrays: "monthly_units" and
+    "milestone_units" [profile, month], "annual_units", "milestone_value" (₹ of non-unit benefits
+    such as vouchers), "annual_value" (₹), "milestones_reached_month" [profile, milestone],
+    "tier" [profile, month] (index into "tier_names"), "renewal_bonus" (units for the final tier),
+    "fee_reversal_month" (-1 = not reached), plus the card's "unit", "milestones" and "annual_fee".
+    """
+    if card_name not in cards_data:
+        return {"error": f"Card {card_name} not found"}
+    table = get_reward_table(cards_data[card_name])
+    if table is None:
+        return {"error": f"Reward calculation not implemented for {card_name}"}
+
+    spend = np.asarray(schedule, dtype=float)
+    if spend.ndim == 2:
+        spend = spend[np.newaxis, :, :]
+    if spend.ndim != 3 or spend.shape[2] != len(categories):
+        return {"error": f"schedule must be [profile, month, category] with {len(categories)} categories, got shape {spend.shape}"}
+    profiles, months, _ = spend.shape
+
+    # Regular earning per statement month (caps apply per month / cycle)
+    batch = calculate_rewards_batch(cards_data, spend.reshape(profiles * months, -1), [card_name], categories)
+    monthly_units = batch["earned"].reshape(profiles, months, -1).sum(axis=2)
+
+    # Milestones as the anniversary-year spend that counts toward them accumulates
+    milestone_mask = np.array([counts_toward_milestones(table, category) for category in categories])
+    milestone_spend = np.cumsum(spend @ milestone_mask, axis=1)
+    milestones = table["milestones"]
+    reached_month = _first_month(milestone_spend, [m["spend"] for m in milestones]) if milestones else np.full((profiles, 0), -1)
+    milestone_units = np.zeros((profiles, months))
+    milestone_value = np.zeros(profiles)
+    for index, milestone in enumerate(milestones):
+        reached = reached_month[:, index] >= 0
+        if milestone["units"] is not None:
+            milestone_units[reached, reached_month[reached, index]] += milestone["units"]
+        else:
+            milestone_value += np.where(reached, milestone["value"], 0.0)
+
+    # Tier reached so far in the year (same eligible spend as milestones)
+    tiers = table["tiers"]
+    tier_names = [tier["name"] for tier in tiers]
+    if tiers:
+        initial = tier_names.index(table["initial_tier"]) if table["initial_tier"] in tier_names else 0
+        tier = np.maximum(np.searchsorted([t["spend"] for t in tiers], milestone_spend, side="right") - 1, initial)
+        renewal_bonus = np.array([t["renewal_bonus"] for t in tiers])[tier[:, -1]]
+    else:
+        tier = np.full((profiles, months), -1)
+        renewal_bonus = np.zeros(profiles)
+
+    # Annual fee reversal
+    if table["fee_reversal_spend"]:
+        fee_mask = np.array([counts_toward_fee_reversal(table, category) for category in categories])
+        fee_reversal_month = _first_month(np.cumsum(spend @ fee_mask, axis=1), [table["fee_reversal_spend"]])[:, 0]
+    else:
+        fee_reversal_month = np.full(profiles, -1)
+
+    annual_units = monthly_units.sum(axis=1) + milestone_units.sum(axis=1)
+    return {
+        "card": card_name,
+        "unit": table["unit"],
+        "label": table["base"][1],
+        "value_per_unit": table["value_per_unit"],
+        "annual_spend": spend.sum(axis=(1, 2)),
+        "monthly_units": monthly_units,
+        "milestone_units": milestone_units,
+        "annual_units": annual_units,
+        "milestone_value": milestone_value,
+        "annual_value": annual_units * table["value_per_unit"] + milestone_value,
+        "milestones": milestones,
+        "milestones_reached_month": reached_month,
+        "tier_names": tier_names,
+        "tier": tier,
+        "renewal_bonus": renewal_bonus,
+        "annual_fee": table["annual_fee"],
+        "fee_reversal_spend": table["fee_reversal_spend"],
+        "fee_reversal_month": fee_reversal_month
+    }
+
+
+def simulate_spend_levels(cards_data: Dict[str, Dict[str, Any]], cards: Sequence[str], annual_spends: Sequence[float],
+                          category_mix: Optional[Dict[Optional[str], float]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Simulate a grid of annual spend levels on each card (e.g. for comparison charts), each level
+    spread evenly over the year and split by category_mix (shares; default all general spend).
+    """
+    category_mix = category_mix or {None: 1.0}
+    categories = list(category_mix)
+    shares = np.array([category_mix[category] for category in categories], dtype=float)
+    shares = shares / shares.sum()
+    schedule = np.stack([np.outer(even_schedule(level), shares) for level in annual_spends])
+    return {card: simulate_year(cards_data, card, schedule, categories) for card in cards}
+
+
+def format_simulation(result: Dict[str, Any], profile: int = 0) -> str:
+    """Plain-text summary of one simulated year: regular earning, milestones, tier and fee reversal."""
+    unit = result["label"]
+    regular = result["monthly_units"][profile].sum()
+    lines = [f"**{result['card']}** (₹{result['annual_spend'][profile]:,.0f} over the year):",
+             f"- Regular earning: {regular:,.0f} {unit}"]
+    for index, milestone in enumerate(result["milestones"]):
+        month = result["milestones_reached_month"][profile, index]
+        status = f"✅ reached in month {month + 1}" if month >= 0 else "❌ not reached"
+        lines.append(f"- Milestone ₹{milestone['spend']:,}: {milestone['label']} ({status})")
+    bonus_units = result["milestone_units"][profile].sum()
+    total = f"- Total: {result['annual_units'][profile]:,.0f} {unit}"
+    if bonus_units:
+        total += f" ({regular:,.0f} regular + {bonus_units:,.0f} milestone)"
+    if result["milestone_value"][profile]:
+        total += f" + ₹{result['milestone_value'][profile]:,.0f} in milestone benefits"
+    lines.append(total)
+    if result["tier_names"]:
+        tier = result["tier_names"][result["tier"][profile, -1]]
+        line = f"- Tier at year end: {tier}"
+        if result["renewal_bonus"][profile]:
+            line += f" (renewal bonus {result['renewal_bonus'][profile]:,.0f} {unit})"
+        lines.append(line)
+    if result["fee_reversal_spend"]:
+        month = result["fee_reversal_month"][profile]
+        status = f"reached in month {month + 1}" if month >= 0 else "not reached"
+        fee = f" ₹{result['annual_fee']:,}" if result["annual_fee"] else ""
+        lines.append(f"- Annual fee{fee} reversal at ₹{result['fee_reversal_spend']:,} eligible spend: {status}")
+    return "\n".join(lines)
+
+
+def year_simulation_text(cards_data: Dict[str, Dict[str, Any]], query: str, cards: Sequence[str]) -> str:
+    """
+    Prompt section with the month-by-month year simulation (milestones, tier, fee reversal) of
+    each card for a yearly spend question, or "". Expects normalised currency; used by both engines.
+    """
+    question = parse_year_question(query)
+    if not question:
+        return ""
+    results = simulate_spend_levels(cards_data, cards, [question["annual_spend"]], {question["category"]: 1.0})
+    summaries = [format_simulation(result) for result in results.values() if 'error' not in result]
+    if not summaries:
+        return ""
+    return ("\nEXACT YEAR SIMULATION (month by month from the card rules; use these numbers, "
+            "do not recalculate them):\n" + "\n\n".join(summaries) + "\n")
@@ -0,0 +1,163 @@
+"""
+Token-Budgeted Prompt Serialization
+Serializes card data for LLM prompts as compact JSON without empty leaves, pruning the
+fields least related to the query until the data fits a token budget.
+"""
+
+import os
+import re
+import json
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Keys that identify a record and are never pruned
+PROTECTED_KEYS = {"name", "card"}
+
+# Query words that carry no topic; ignored when matching a query against card keys and values
+STOPWORDS = {
+    "the", "and", "for", "what", "which", "how", "many", "much", "are", "is", "on", "of", "if",
+    "can", "does", "get", "with", "this", "that", "card", "cards", "credit", "bank", "about",
+    "you", "your", "will", "would", "there", "any", "have", "from", "when", "into", "per"
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token for English text and JSON)."""
+    return math.ceil(len(text) / 4)
+
+
+def compact_json(data: Any) -> str:
+    """JSON with no insignificant whitespace and unescaped non-ASCII (₹ is 1 char, not 6)."""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def prune_empty(value: Any) -> Any:
+    """Recursively drop None, empty strings and empty containers (False and 0 are kept)."""
+    if isinstance(value, dict):
+        pruned = {key: prune_empty(item) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if not _is_empty(item)}
+    if isinstance(value, list):
+        pruned = [prune_empty(item) for item in value]
+        return [item for item in pruned if not _is_empty(item)]
+    return value
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased word stems (trailing plural 's' dropped), with repeats, used to match query words
+    against card keys and values here and in utils.section_index.
+    """
+    words = re.findall(r"[a-z0-9]+", text.lower().replace("_", " "))
+    return [word[:-1] if len(word) > 3 and word.endswith("s") else word for word in words]
+
+
+class PromptSerializer:
+    """
+    Compact, budget-aware serializer for the card data embedded in prompts.
+    Fields below the card level (depth >= 2) are scored by how many query terms appear in
+    their key path and content; the lowest-scoring, largest fields are pruned first.
+    """
+
+    def __init__(self, token_budget: Optional[int] = 2000, history_size: int = 100):
+        self.token_budget = token_budget
+        self.recent_reports = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "pruned_requests": 0,
+            "tokens_before": 0,
+            "tokens_after": 0
+        }
+
+    def serialize(self, data: Dict[str, Any], query: str = "") -> Tuple[str, Dict[str, Any]]:
+        """
+        Return (text, report) where report holds the estimated tokens of the old indented
+        JSON ('tokens_before'), of the text returned ('tokens_after') and the pruned paths.
+        """
+        tokens_before = estimate_tokens(json.dumps(data, indent=2))
+        compacted = prune_empty(data)
+        text = compact_json(compacted)
+
+        pruned_paths = []
+        if self.token_budget and estimate_tokens(text) > self.token_budget:
+            text, pruned_paths = self._prune_to_budget(compacted, set(tokenize(query)) - STOPWORDS)
+
+        report = {
+            "tokens_before": tokens_before,
+            "tokens_after": estimate_tokens(text),
+            "token_budget": self.token_budget,
+            "pruned_fields": [".".join(path) for path in pruned_paths]
+        }
+        self._record(report)
+        return text, report
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cumulative token estimates and the average saving across requests."""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["token_budget"] = self.token_budget
+        stats["savings_rate"] = round(1 - stats["tokens_after"] / stats["tokens_before"], 3) if stats["tokens_before"] else 0.0
+        return stats
+
+    def _prune_to_budget(self, data: Dict[str, Any], terms: Set[str]) -> Tuple[str, List[Tuple[str, ...]]]:
+        """Delete the least relevant fields (in place) until the compact text fits the budget."""
+        candidates = sorted(self._candidates(data, terms), key=lambda c: (c[0], -c[1]))
+        budget_chars = self.token_budget * 4
+        total = len(compact_json(data))
+        pruned: List[Tuple[str, ...]] = []
+
+        for _, size, path in candidates:
+            if total <= budget_chars:
+                # Sizes are estimates; confirm with a real serialization before stopping
+                total = len(compact_json(data))
+                if total <= budget_chars:
+                    break
+            if any(path[:len(done)] == done for done in pruned):
+                continue  # an ancestor is already gone
+            parent = data
+            for key in path[:-1]:
+                parent = parent[key]
+            del parent[path[-1]]
+            pruned.append(path)
+            total -= size
+
+        return compact_json(data), pruned
+
+    def _candidates(self, data: Dict[str, Any], terms: Set[str]) -> List[Tuple[int, int, Tuple[str, ...]]]:
+        """(relevance score, serialized size, key path) for every prunable field."""
+        candidates = []
+
+        def walk(node: Dict[str, Any], path: Tuple[str, ...], inherited: int, depth: int):
+            for key, value in node.items():
+                child_path = path + (key,)
+                # A key named like the query (e.g. "fees") makes its whole subtree relevant
+                key_score = 2 * len(terms.intersection(tokenize(str(key))))
+                if depth >= 2 and key not in PROTECTED_KEYS:
+                    text = compact_json(value)
+                    score = inherited + key_score + len(terms.intersection(tokenize(text)))
+                    candidates.append((score, len(text) + len(str(key)) + 4, child_path))
+                if isinstance(value, dict):
+                    walk(value, child_path, inherited + key_score, depth + 1)
+
+        walk(data, (), 0, 1)
+        return candidates
+
+    def _record(self, report: Dict[str, Any]):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["pruned_requests"] += 1 if report["pruned_fields"] else 0
+            self.stats["tokens_before"] += report["tokens_before"]
+            self.stats["tokens_after"] += report["tokens_after"]
+            self.recent_reports.append(report)
+
+
+def create_prompt_serializer() -> PromptSerializer:
+    """Build a serializer from PROMPT_DATA_TOKEN_BUDGET (0 disables pruning; data is still compacted)."""
+    budget = int(os.getenv("PROMPT_DATA_TOKEN_BUDGET", "2000"))
+    return PromptSerializer(token_budget=budget or None)
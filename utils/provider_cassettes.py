@@ -0,0 +1,234 @@
+"""
+Record/Replay LLM Providers
+Recording providers write prompt→response cassettes to disk while calling a live provider;
+replay providers serve those cassettes offline with a configurable synthetic latency, so
+pipeline benchmarks and tests run without API keys and deterministically.
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.llm_providers import LLMProvider
+from utils.response_cache import hash_payload
+
+PLACEHOLDER_RESPONSE = "[replay] No recorded response for this prompt."
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode when no recording exists for a prompt."""
+
+
+def cassette_key(system_prompt: str, prompt: str, max_tokens: Optional[int], temperature: Optional[float]) -> str:
+    """Identify a request by everything that shapes the response (the model is recorded, not keyed)."""
+    return hash_payload([system_prompt, prompt, max_tokens, temperature])
+
+
+class LatencyModel:
+    """
+    Synthetic latency distribution parsed from a spec string:
+    "fixed:0.8", "uniform:0.5,1.5", "normal:1.0,0.2", "lognormal:0.0,0.5" (mu, sigma of ln seconds)
+    or "recorded[:scale]" to replay each cassette's measured latency.
+    Draws are seeded per request so a replay is identical regardless of call order.
+    """
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal", "recorded")
+
+    def __init__(self, spec: str = "fixed:0", seed: int = 0):
+        kind, _, params = spec.partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution '{kind}' (expected one of {', '.join(self.KINDS)})")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(value) for value in params.split(",") if value.strip()]
+        self.seed = seed
+
+    def sample(self, key: str, occurrence: int = 0, recorded_seconds: Optional[float] = None) -> float:
+        """Latency in seconds for the occurrence-th replay of the request identified by key."""
+        rng = random.Random(f"{self.seed}:{key}:{occurrence}")
+        if self.kind == "fixed":
+            return self.params[0] if self.params else 0.0
+        if self.kind == "uniform":
+            return rng.uniform(self.params[0], self.params[1])
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(self.params[0], self.params[1]))
+        if self.kind == "lognormal":
+            return rng.lognormvariate(self.params[0], self.params[1])
+        scale = self.params[0] if self.params else 1.0
+        return (recorded_seconds or 0.0) * scale
+
+
+class CassetteStore:
+    """One JSON file per recorded request under cassette_dir/<provider name>/."""
+
+    def __init__(self, cassette_dir: str, provider_name: str):
+        self.directory = os.path.join(cassette_dir, provider_name)
+        self._lock = threading.Lock()
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.directory, f"{key}.json"), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save(self, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{key}.json")
+            # Write then rename so a concurrent replay never reads a half-written cassette
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+
+class RecordingProvider(LLMProvider):
+    """Wraps a live provider and records every successful response as a cassette."""
+
+    def __init__(self, inner: LLMProvider, cassette_dir: str):
+        super().__init__(inner.model)
+        self.inner = inner
+        self.name = inner.name
+        self.cassette_dir = cassette_dir
+        self.store = CassetteStore(cassette_dir, inner.name)
+
+    def enable_prefix_cache(self, ttl_seconds: int):
+        self.inner.enable_prefix_cache(ttl_seconds)
+
+    def _create_sibling(self, model: str) -> LLMProvider:
+        return RecordingProvider(self.inner.with_model(model), self.cassette_dir)
+
+    def complete(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000,
+                 temperature: Optional[float] = 0.1, timeout: Optional[float] = None) -> str:
+        started = time.monotonic()
+        response = self.inner.complete(system_prompt, prompt, max_tokens, temperature, timeout=timeout)
+        self._record(system_prompt, prompt, max_tokens, temperature, response, time.monotonic() - started)
+        return response
+
+    def stream(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000, temperature: Optional[float] = 0.1) -> Iterator[str]:
+        started = time.monotonic()
+        chunks = []
+        for chunk in self.inner.stream(system_prompt, prompt, max_tokens, temperature):
+            chunks.append(chunk)
+            yield chunk
+        self._record(system_prompt, prompt, max_tokens, temperature, "".join(chunks), time.monotonic() - started, chunks)
+
+    async def acomplete(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000, temperature: Optional[float] = 0.1) -> str:
+        started = time.monotonic()
+        response = await self.inner.acomplete(system_prompt, prompt, max_tokens, temperature)
+        self._record(system_prompt, prompt, max_tokens, temperature, response, time.monotonic() - started)
+        return response
+
+    def _record(self, system_prompt: str, prompt: str, max_tokens: Optional[int], temperature: Optional[float],
+                response: str, latency_seconds: float, chunks: Optional[List[str]] = None):
+        entry = {
+            "provider": self.name,
+            "model": self.model,
+            "system_prompt_hash": hash_payload(system_prompt),
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "response": response,
+            "latency_seconds": round(latency_seconds, 4),
+            "recorded_at": datetime.now().isoformat()
+        }
+        if chunks is not None:
+            entry["chunks"] = chunks
+        self.store.save(cassette_key(system_prompt, prompt, max_tokens, temperature), entry)
+
+
+class ReplayProvider(LLMProvider):
+    """
+    Serves recorded responses after a synthetic latency. On a miss it raises CassetteMissError,
+    or returns a fixed placeholder when on_miss="placeholder" (for benchmarking the pipeline).
+    """
+
+    def __init__(self, name: str, cassette_dir: str, latency: Optional[LatencyModel] = None,
+                 on_miss: str = "error", ttft_fraction: float = 0.3):
+        super().__init__(f"{name}-replay")
+        self.name = name
+        self.store = CassetteStore(cassette_dir, name)
+        self.latency = latency or LatencyModel()
+        self.on_miss = on_miss
+        self.ttft_fraction = ttft_fraction
+        self._occurrences: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def complete(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000,
+                 temperature: Optional[float] = 0.1, timeout: Optional[float] = None) -> str:
+        entry, delay = self._lookup(system_prompt, prompt, max_tokens, temperature)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"request timed out after {timeout:.1f}s")
+        time.sleep(delay)
+        return entry["response"]
+
+    def stream(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000, temperature: Optional[float] = 0.1) -> Iterator[str]:
+        entry, delay = self._lookup(system_prompt, prompt, max_tokens, temperature)
+        chunks = entry.get("chunks") or self._split(entry["response"])
+        # Time to first token, then the remaining latency spread evenly over the chunks
+        time.sleep(delay * self.ttft_fraction)
+        gap = delay * (1 - self.ttft_fraction) / max(1, len(chunks))
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(gap)
+            yield chunk
+
+    async def acomplete(self, system_prompt: str, prompt: str, max_tokens: Optional[int] = 2000, temperature: Optional[float] = 0.1) -> str:
+        entry, delay = self._lookup(system_prompt, prompt, max_tokens, temperature)
+        await asyncio.sleep(delay)
+        return entry["response"]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["latency"] = self.latency.spec
+        return stats
+
+    def _lookup(self, system_prompt: str, prompt: str, max_tokens: Optional[int], temperature: Optional[float]):
+        """Return (cassette entry, synthetic delay) for a request."""
+        key = cassette_key(system_prompt, prompt, max_tokens, temperature)
+        entry = self.store.load(key)
+        with self._lock:
+            occurrence = self._occurrences.get(key, 0)
+            self._occurrences[key] = occurrence + 1
+            self.stats["hits" if entry else "misses"] += 1
+
+        if entry is None:
+            if self.on_miss != "placeholder":
+                raise CassetteMissError(f"No {self.name} cassette for request {key} in {self.store.directory}")
+            entry = {"response": PLACEHOLDER_RESPONSE}
+        return entry, self.latency.sample(key, occurrence, entry.get("latency_seconds"))
+
+    def _split(self, text: str) -> List[str]:
+        words = text.split(" ")
+        return [word if i == len(words) - 1 else word + " " for i, word in enumerate(words)]
+
+
+def replay_providers_from_env(cassette_dir: str) -> List[LLMProvider]:
+    """
+    Replay providers for every provider recorded under cassette_dir (Gemini first, as in live
+    mode), or for LLM_REPLAY_PROVIDERS when set. Latency comes from LLM_REPLAY_LATENCY.
+    """
+    latency = LatencyModel(os.getenv("LLM_REPLAY_LATENCY", "recorded"), seed=int(os.getenv("LLM_REPLAY_SEED", "0")))
+    on_miss = os.getenv("LLM_REPLAY_ON_MISS", "error")
+
+    names = [name.strip() for name in os.getenv("LLM_REPLAY_PROVIDERS", "").split(",") if name.strip()]
+    if not names:
+        recorded = sorted(os.listdir(cassette_dir)) if os.path.isdir(cassette_dir) else []
+        names = [name for name in ("gemini", "openai") if name in recorded]
+        names += [name for name in recorded if name not in names and os.path.isdir(os.path.join(cassette_dir, name))]
+    if not names:
+        if on_miss != "placeholder":
+            raise ValueError(f"No cassettes found in {cassette_dir}. Record some with LLM_PROVIDER_MODE=record, "
+                             f"or set LLM_REPLAY_ON_MISS=placeholder")
+        names = ["gemini"]
+
+    return [ReplayProvider(name, cassette_dir, latency, on_miss) for name in names]
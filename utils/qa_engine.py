@@ -2,89 +2,62 @@ import os
 import re
 import json
 import random
-import openai
 from dotenv import load_dotenv
 from typing import Dict, List, Optional, Any
 
-# Try to import Google's Gemini
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+from utils.card_registry import CardRegistry
+from utils.circuit_breaker import AllProvidersFailedError, create_circuit_router
+from utils.intent_matcher import IntentMatcher
+from utils.llm_providers import LLMProvider, create_providers_from_env
+from utils.milestone_simulator import year_simulation_text
+from utils.prompt_serializer import create_prompt_serializer
+from utils.reward_calculator import calculate_rewards, spend_breakdown_text
 
 class RichDataCreditCardBot:
     """
     A chatbot engineered to understand a rich, nested JSON structure with common and card-specific terms.
     """
-    def __init__(self, data_files: list[str]):
+    def __init__(self, data_files: Optional[list[str]] = None, providers: Optional[List[LLMProvider]] = None):
         load_dotenv()
         
-        # Check for API keys in order of preference: Gemini -> OpenAI
-        gemini_key = os.getenv("GOOGLE_API_KEY")
-        openai_key = os.getenv("OPENAI_API_KEY")
-        
-        if gemini_key and GEMINI_AVAILABLE:
+        # Providers in order of preference: Gemini -> OpenAI (or the given ones, e.g. fakes in tests)
+        self.providers = providers or create_providers_from_env()
+        if self.providers[0].name == "gemini":
             print("✨ Using Google Gemini API (Fast & India-friendly!)")
-            genai.configure(api_key=gemini_key)
-            self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-            self.api_type = "gemini"
-            self.model = "gemini-1.5-flash"
-        elif openai_key:
+        elif self.providers[0].name == "openai":
             print("🤖 Using OpenAI API")
-            self.client = openai.OpenAI(api_key=openai_key)
-            self.api_type = "openai"
-            self.model = "gpt-3.5-turbo"
-        else:
-            raise ValueError("No API key found! Please set GOOGLE_API_KEY or OPENAI_API_KEY in .env file")
+        self.api_type = self.providers[0].name
+        self.model = self.providers[0].model
+        
+        # Per-provider circuit breakers: a failing provider is skipped until a probe succeeds
+        self.circuit_router = create_circuit_router(self.providers)
+        
+        # Card data goes into prompts as compact JSON, pruned to PROMPT_DATA_TOKEN_BUDGET
+        self.prompt_serializer = create_prompt_serializer()
+        self.last_prompt_report: Optional[Dict[str, Any]] = None
         
         self._load_credit_card_data(data_files)
         self._setup_intent_patterns()
 
-    def _load_credit_card_data(self, data_files: list[str]):
-        """Loads all credit card data from the provided list of files into a structured format."""
-        self.cards_data: Dict[str, Dict[str, Any]] = {}
-        self.bank_common_terms: Dict[str, Dict[str, Any]] = {}  # Store common terms per bank
-        self.card_name_map: Dict[str, str] = {}
-        
-        for filepath in data_files:
-            try:
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-                    
-                    # Determine bank name from file path
-                    bank_name = filepath.split('/')[-1].split('-')[0]  # e.g., 'axis' from 'axis-atlas.json'
-                    
-                    if "common_terms" in data:
-                        self.bank_common_terms[bank_name] = data["common_terms"]
-                        
-                    if "cards" in data and isinstance(data["cards"], list):
-                        for card in data["cards"]:
-                            card_name = card.get("name")
-                            if card_name:
-                                # Store the bank name with the card for later reference
-                                card["_bank"] = bank_name
-                                self.cards_data[card_name] = card
-                                self.card_name_map[card_name] = self._generate_keywords(card_name)
-            except FileNotFoundError:
-                print(f"Warning: Data file not found at {filepath}")
-            except json.JSONDecodeError:
-                print(f"Warning: Could not decode JSON from {filepath}")
-
-    def _generate_keywords(self, name: str) -> List[str]:
-        """Generates searchable keywords from a card name."""
-        return [word.lower() for word in name.split() if len(word) > 3 and word.lower() not in ['bank', 'card', 'credit']]
+    def _load_credit_card_data(self, data_files: Optional[list[str]]):
+        """Indexes the credit card data files (all of data/*.json by default); card bodies load on demand."""
+        self.registry = CardRegistry(data_files)
+        self.cards_data: Dict[str, Dict[str, Any]] = self.registry.cards
+        self.bank_common_terms: Dict[str, Dict[str, Any]] = self.registry.bank_common_terms  # Store common terms per bank
+        self.intent_keys: List[str] = self.registry.intent_keys
+        self.registry.add_listener(self._on_card_data_reload)
+
+    def _on_card_data_reload(self, registry: CardRegistry):
+        """Card data was hot-reloaded: pick up the new common terms and rebuild the intent patterns."""
+        self.bank_common_terms = registry.bank_common_terms
+        self.intent_keys = registry.intent_keys
+        self._setup_intent_patterns()
 
     def _setup_intent_patterns(self):
         """Define regex patterns for each potential intent."""
         # Consolidate all possible keys from cards and bank common terms
-        all_keys = set()
-        for bank_terms in self.bank_common_terms.values():
-            all_keys.update(bank_terms.keys())
-        for card in self.cards_data.values():
-            # Filter out internal metadata keys that start with _
-            valid_keys = {key for key in card.keys() if not key.startswith('_')}
-            all_keys.update(valid_keys)
+        # (precomputed in the catalogue; internal metadata keys starting with _ are excluded)
+        all_keys = set(self.intent_keys)
 
         patterns = {key.replace('_', ' '): [key.replace('_', ' ')] for key in all_keys}
         
@@ -123,116 +96,116 @@ class RichDataCreditCardBot:
         self.intent_patterns = patterns
         self.spend_category_intents = ['travel', 'education', 'fuel', 'rent', 'wallet', 'utilities', 'insurance_spending', 'gaming', 'government', 'gold', 'jewellery']
 
-    def detect_intent(self, query: str) -> Optional[str]:
-        """Detect intent using regex pattern matching."""
-        query_lower = query.lower()
-        
-        # Check for annual fee waiver queries first (most specific)
-        if re.search(r'annual fee waiver', query_lower) or \
-           re.search(r'fee waiver', query_lower) or \
-           re.search(r'waiver.*spend', query_lower) or \
-           re.search(r'spend.*waiver', query_lower) or \
-           re.search(r'criteria.*waiver', query_lower) or \
-           re.search(r'waiver.*condition', query_lower) or \
-           re.search(r'annual fee.*waived', query_lower) or \
-           re.search(r'fee.*reversal', query_lower) or \
-           re.search(r'waiver.*annual', query_lower):
-            return 'annual_fee_reversal_spend_threshold'
-            
-        # Check for lounge access queries (before reward comparison)
-        if re.search(r'lounge.*access', query_lower) or \
-           re.search(r'lounge.*better', query_lower) or \
-           re.search(r'which.*card.*better.*lounge', query_lower) or \
-           re.search(r'international.*lounge', query_lower) or \
-           re.search(r'domestic.*lounge', query_lower) or \
-           re.search(r'lounge.*visit', query_lower) or \
-           re.search(r'airport.*lounge', query_lower):
-            return 'lounge_access'
-            
-        # Check for miles transfer / redemption queries
-        if re.search(r'transfer.*points', query_lower) or \
-           re.search(r'transfer.*miles', query_lower) or \
-           re.search(r'transfer.*airline', query_lower) or \
-           re.search(r'points.*airline', query_lower) or \
-           re.search(r'miles.*partner', query_lower) or \
-           re.search(r'transfer.*partner', query_lower) or \
-           re.search(r'redeem.*airline', query_lower) or \
-           re.search(r'convert.*airline', query_lower) or \
-           re.search(r'use.*points.*flight', query_lower) or \
-           re.search(r'use.*points.*airline', query_lower) or \
-           re.search(r'redeem.*points.*flight', query_lower) or \
-           re.search(r'points.*flight.*booking', query_lower) or \
-           re.search(r'what.*do.*with.*\d+.*(points|miles)', query_lower) or \
-           re.search(r'what.*can.*\d+.*(points|miles)', query_lower) or \
-           re.search(r'use.*\d+.*(points|miles)', query_lower) or \
-           re.search(r'redeem.*\d+.*(points|miles)', query_lower) or \
-           re.search(r'\d+.*(points|miles).*redeem', query_lower) or \
-           re.search(r'\d+.*(points|miles).*use', query_lower) or \
-           re.search(r'\d+.*(points|miles).*worth', query_lower) or \
-           re.search(r'value.*\d+.*(points|miles)', query_lower):
-            return 'miles_transfer'
-        
-        # Check for insurance benefit comparisons BEFORE reward comparisons
-        if re.search(r'which.*card.*(better|more).*(insurance|liability|cover|protection)', query_lower) or \
-           re.search(r'which.*(better|more).*(insurance|liability|cover|protection)', query_lower) or \
-           re.search(r'compare.*(insurance|liability|cover|protection)', query_lower) or \
-           re.search(r'(insurance|liability|cover|protection).*(compare|comparison)', query_lower) or \
-           re.search(r'lost.*card.*liability', query_lower) or \
-           re.search(r'card.*liability.*cover', query_lower) or \
-           re.search(r'travel.*insurance', query_lower) or \
-           re.search(r'accident.*insurance', query_lower):
-            return 'insurance'
-        
-        # Check for reward/spending category comparison queries (broader patterns to catch more cases)
-        if re.search(r'which.*card.*(more|better).*reward', query_lower) or \
-           re.search(r'(compare|comparison).*reward', query_lower) or \
-           re.search(r'spend.*\d+.*which.*card', query_lower) or \
-           re.search(r'spend.*\d+.*(vs|versus)', query_lower) or \
-           re.search(r'(icici|axis|atlas|emeralde).*(vs|versus).*(icici|axis|atlas|emeralde)', query_lower) or \
-           re.search(r'which.*better.*spend.*\d+', query_lower) or \
-           re.search(r'better.*reward.*\d+', query_lower) or \
-           re.search(r'which.*card.*better.*(reward|point|mile)', query_lower) or \
-           re.search(r'\d+.*spend.*which.*card', query_lower) or \
-           re.search(r'\d+.*(hotel|travel|airline|flight).*spend.*which.*card', query_lower) or \
-           re.search(r'which.*card.*better.*(hotel|travel|airline|flight)', query_lower) or \
-           re.search(r'which.*better.*\d+.*(hotel|travel|airline|flight)', query_lower) or \
-           re.search(r'which.*better.*for.*\d+.*(hotel|travel|airline|flight)', query_lower) or \
-           re.search(r'better.*for.*\d+.*(hotel|travel|airline|flight)', query_lower) or \
-           re.search(r'which.*better.*for.*\d+', query_lower) or \
-           re.search(r'which.*card.*better.*(fuel|rent|utility|utilities|education|government|govt|tax|gaming|wallet|gold|jewellery)', query_lower) or \
-           re.search(r'which.*better.*(fuel|rent|utility|utilities|education|government|govt|tax|gaming|wallet|gold|jewellery)', query_lower) or \
-           re.search(r'better.*for.*(fuel|rent|utility|utilities|education|government|govt|tax|gaming|wallet|gold|jewellery)', query_lower) or \
-           re.search(r'reward.*points.*earned.*\d+.*spend', query_lower) or \
-           re.search(r'points.*earned.*\d+.*spend', query_lower) or \
-           re.search(r'miles.*earned.*\d+.*spend', query_lower) or \
-           re.search(r'\d+.*spend.*(axis|atlas|icici|emeralde)', query_lower) or \
-           re.search(r'(axis|atlas|icici|emeralde).*\d+.*spend', query_lower) or \
-           re.search(r'\d+.*(hotel|travel|airline|flight).*using.*(axis|atlas|icici|emeralde)', query_lower):
-            return 'reward_comparison'
+        # Specific intents, checked in this order before spending categories and generic intents
+        priority_rules = [
+            # Annual fee waiver queries first (most specific)
+            ('annual_fee_reversal_spend_threshold', [
+                r'annual fee waiver',
+                r'fee waiver',
+                r'waiver.*spend',
+                r'spend.*waiver',
+                r'criteria.*waiver',
+                r'waiver.*condition',
+                r'annual fee.*waived',
+                r'fee.*reversal',
+                r'waiver.*annual'
+            ]),
+            # Lounge access queries (before reward comparison)
+            ('lounge_access', [
+                r'lounge.*access',
+                r'lounge.*better',
+                r'which.*card.*better.*lounge',
+                r'international.*lounge',
+                r'domestic.*lounge',
+                r'lounge.*visit',
+                r'airport.*lounge'
+            ]),
+            # Miles transfer / redemption queries
+            ('miles_transfer', [
+                r'transfer.*points',
+                r'transfer.*miles',
+                r'transfer.*airline',
+                r'points.*airline',
+                r'miles.*partner',
+                r'transfer.*partner',
+                r'redeem.*airline',
+                r'convert.*airline',
+                r'use.*points.*flight',
+                r'use.*points.*airline',
+                r'redeem.*points.*flight',
+                r'points.*flight.*booking',
+                r'what.*do.*with.*\d+.*(points|miles)',
+                r'what.*can.*\d+.*(points|miles)',
+                r'use.*\d+.*(points|miles)',
+                r'redeem.*\d+.*(points|miles)',
+                r'\d+.*(points|miles).*redeem',
+                r'\d+.*(points|miles).*use',
+                r'\d+.*(points|miles).*worth',
+                r'value.*\d+.*(points|miles)'
+            ]),
+            # Insurance benefit comparisons BEFORE reward comparisons
+            ('insurance', [
+                r'which.*card.*(better|more).*(insurance|liability|cover|protection)',
+                r'which.*(better|more).*(insurance|liability|cover|protection)',
+                r'compare.*(insurance|liability|cover|protection)',
+                r'(insurance|liability|cover|protection).*(compare|comparison)',
+                r'lost.*card.*liability',
+                r'card.*liability.*cover',
+                r'travel.*insurance',
+                r'accident.*insurance'
+            ]),
+            # Reward/spending category comparison queries (broad patterns to catch more cases)
+            ('reward_comparison', [
+                r'which.*card.*(more|better).*reward',
+                r'(compare|comparison).*reward',
+                r'spend.*\d+.*which.*card',
+                r'spend.*\d+.*(vs|versus)',
+                r'(icici|axis|atlas|emeralde).*(vs|versus).*(icici|axis|atlas|emeralde)',
+                r'which.*better.*spend.*\d+',
+                r'better.*reward.*\d+',
+                r'which.*card.*better.*(reward|point|mile)',
+                r'\d+.*spend.*which.*card',
+                r'\d+.*(hotel|travel|airline|flight).*spend.*which.*card',
+                r'which.*card.*better.*(hotel|travel|airline|flight)',
+                r'which.*better.*\d+.*(hotel|travel|airline|flight)',
+                r'which.*better.*for.*\d+.*(hotel|travel|airline|flight)',
+                r'better.*for.*\d+.*(hotel|travel|airline|flight)',
+                r'which.*better.*for.*\d+',
+                r'which.*card.*better.*(fuel|rent|utility|utilities|education|government|govt|tax|gaming|wallet|gold|jewellery)',
+                r'which.*better.*(fuel|rent|utility|utilities|education|government|govt|tax|gaming|wallet|gold|jewellery)',
+                r'better.*for.*(fuel|rent|utility|utilities|education|government|govt|tax|gaming|wallet|gold|jewellery)',
+                r'reward.*points.*earned.*\d+.*spend',
+                r'points.*earned.*\d+.*spend',
+                r'miles.*earned.*\d+.*spend',
+                r'\d+.*spend.*(axis|atlas|icici|emeralde)',
+                r'(axis|atlas|icici|emeralde).*\d+.*spend',
+                r'\d+.*(hotel|travel|airline|flight).*using.*(axis|atlas|icici|emeralde)'
+            ]),
+            # Reward calculation queries (must be before spending categories)
+            ('reward_calculation', [
+                r'how many.*points.*earn',
+                r'how many.*miles.*earn',
+                r'points.*earn.*spend',
+                r'miles.*earn.*spend',
+                r'spend.*\d+.*points',
+                r'spend.*\d+.*miles',
+                r'\d+.*spend.*points',
+                r'\d+.*spend.*miles',
+                r'spend.*\d+.*what.*earn',
+                r'spend.*\d+.*earn',
+                r'\d+.*spend.*earn',
+                r'if.*spend.*\d+.*earn'
+            ]),
+            # Tier-specific queries
+            ('tier_structure', [
+                r'(gold|silver|platinum).*tier',
+                r'tier.*(gold|silver|platinum)',
+                r'(gold|silver|platinum).*benefit',
+                r'benefit.*(gold|silver|platinum)'
+            ])
+        ]
         
-        # Check for reward calculation queries first (must be before spending categories)
-        if (re.search(r'how many.*points.*earn', query_lower) or 
-            re.search(r'how many.*miles.*earn', query_lower) or
-            re.search(r'points.*earn.*spend', query_lower) or
-            re.search(r'miles.*earn.*spend', query_lower) or
-            re.search(r'spend.*\d+.*points', query_lower) or
-            re.search(r'spend.*\d+.*miles', query_lower) or
-            re.search(r'\d+.*spend.*points', query_lower) or
-            re.search(r'\d+.*spend.*miles', query_lower) or
-            re.search(r'spend.*\d+.*what.*earn', query_lower) or
-            re.search(r'spend.*\d+.*earn', query_lower) or
-            re.search(r'\d+.*spend.*earn', query_lower) or
-            re.search(r'if.*spend.*\d+.*earn', query_lower)):
-            return 'reward_calculation'
-        
-        # Check for tier-specific queries first (most specific)
-        if re.search(r'(gold|silver|platinum).*tier', query_lower) or \
-           re.search(r'tier.*(gold|silver|platinum)', query_lower) or \
-           re.search(r'(gold|silver|platinum).*benefit', query_lower) or \
-           re.search(r'benefit.*(gold|silver|platinum)', query_lower):
-            return 'tier_structure'
-        
-        # Check for specific spending categories (more specific than general fees)
+        # Spending categories (more specific than general fees)
         spending_category_checks = {
             'travel': [r'hotel', r'airline', r'flight', r'travel', r'booking', r'trip'],
             'utilities': [r'utilit(y|ies)', r'utility.*spend', r'utility.*charge', r'utility.*fee'],
@@ -247,41 +220,20 @@ class RichDataCreditCardBot:
             'gold': [r'gold.*jewellery', r'jewellery', r'jewelry', r'gold.*purchase', r'purchase.*gold', r'buy.*gold', r'buying.*gold']  # Gold/jewellery spending
         }
         
-        for category, patterns in spending_category_checks.items():
-            for pattern in patterns:
-                if re.search(pattern, query_lower):
-                    return category
-        
-        # Then check for other intents
-        for intent, patterns in self.intent_patterns.items():
-            # Skip spending categories as we already checked them above
-            if intent in spending_category_checks:
-                continue
-                
-            for pattern in patterns:
-                if re.search(pattern, query_lower):
-                    # This maps a human-friendly key back to the actual JSON key
-                    return intent.replace(' ', '_') 
-        
-        return None
+        # Priority order: specific intents, spending categories, then the remaining generic intents
+        self.intent_rules = priority_rules + list(spending_category_checks.items()) + [
+            (intent.replace(' ', '_'), regex_list) for intent, regex_list in patterns.items()
+            if intent not in spending_category_checks
+        ]
+        self.intent_matcher = IntentMatcher(self.intent_rules)
+
+    def detect_intent(self, query: str) -> Optional[str]:
+        """Detect intent using regex pattern matching (first matching rule in priority order)."""
+        return self.intent_matcher.match(query.lower())
 
     def extract_card_names(self, query: str) -> List[str]:
         """Extract all card names mentioned in the query."""
-        query_lower = query.lower()
-        found_cards = set()
-        
-        # Check for specific abbreviations first
-        if 'epm' in query_lower:
-            found_cards.add('ICICI Bank Emeralde Private Metal Credit Card')
-        if 'atlas' in query_lower:
-            found_cards.add('Axis Bank Atlas Credit Card')
-            
-        # Then check for standard keywords
-        for card_name, keywords in self.card_name_map.items():
-            for keyword in keywords:
-                if keyword in query_lower:
-                    found_cards.add(card_name)
-        return list(found_cards)
+        return self.registry.resolve(query)
         
     def get_greeting(self) -> str:
         """A standard, welcoming greeting."""
@@ -324,185 +276,17 @@ class RichDataCreditCardBot:
         
         return result
 
+    def spend_breakdown(self, query: str, card_names: List[str]) -> str:
+        """Exact per-category reward table for a multi-category spend query, or "" if it has no split."""
+        return spend_breakdown_text(self.cards_data, self.preprocess_currency_abbreviations(query), card_names)
+
+    def year_simulation(self, query: str, card_names: List[str]) -> str:
+        """Month-by-month year simulation (milestones, tier, fee reversal) for a yearly spend query, or ""."""
+        return year_simulation_text(self.cards_data, self.preprocess_currency_abbreviations(query), card_names)
+
     def calculate_rewards(self, card_name: str, spend_amount: int, category: str = None) -> Dict:
         """Calculate rewards for a specific card and spend amount, considering spending category."""
-        if card_name not in self.cards_data:
-            return {"error": f"Card {card_name} not found"}
-        
-        card_info = self.cards_data[card_name]
-        
-        # Handle ICICI Emeralde Private Metal
-        if "ICICI" in card_name and "Emeralde" in card_name:
-            # Check if the spending category is excluded from earning rewards
-            rewards_info = card_info.get('rewards', {})
-            excluded_categories = rewards_info.get('accrual_exclusions', [])
-            
-            # Create a mapping for categories to check against exclusions
-            category_exclusion_map = {
-                'government': ['government services', 'tax'],
-                'tax': ['government services', 'tax'],
-                'rent': ['rent'],
-                'fuel': ['fuel payments'],
-                'emi': ['EMI conversions']
-                # Note: utilities are NOT excluded - they have capping instead
-            }
-            
-            # Check if this category is excluded
-            if category and category.lower() in category_exclusion_map:
-                exclusion_keywords = category_exclusion_map[category.lower()]
-                for exclusion in excluded_categories:
-                    for keyword in exclusion_keywords:
-                        if keyword.lower() in exclusion.lower():
-                            return {
-                                "card": card_name,
-                                "spend_amount": spend_amount,
-                                "points_earned": 0,
-                                "rate": "No reward points earned (excluded category)",
-                                "calculation": f"₹{spend_amount:,} - 0 points ({category} excluded from rewards)",
-                                "category": category,
-                                "excluded": True,
-                                "exclusion_reason": exclusion
-                            }
-            
-            # Check for capped categories (utility, grocery, education, insurance)
-            capping_info = rewards_info.get('capping_per_statement_cycle', {})
-            if category and category.lower() in ['utility', 'utilities', 'grocery', 'education', 'insurance']:
-                # Map category names to capping keys
-                cap_key_map = {
-                    'utility': 'utility',
-                    'utilities': 'utility',
-                    'grocery': 'grocery', 
-                    'education': 'education',
-                    'insurance': 'insurance'
-                }
-                cap_key = cap_key_map.get(category.lower())
-                
-                if cap_key and cap_key in capping_info:
-                    # Extract cap amount (e.g., "1,000 Reward Points" -> 1000)
-                    cap_text = capping_info[cap_key]
-                    import re
-                    cap_match = re.search(r'(\d{1,3}(?:,\d{3})*)', cap_text)
-                    if cap_match:
-                        cap_points = int(cap_match.group(1).replace(',', ''))
-                        
-                        # Calculate points: 6 points per ₹200 spent
-                        uncapped_points = (spend_amount // 200) * 6
-                        capped_points = min(uncapped_points, cap_points)
-                        
-                        if uncapped_points > cap_points:
-                            return {
-                                "card": card_name,
-                                "spend_amount": spend_amount,
-                                "points_earned": capped_points,
-                                "rate": f"6 points per ₹200 (capped at {cap_points:,} points per cycle)",
-                                "calculation": f"₹{spend_amount:,} ÷ 200 × 6 = {uncapped_points} points, capped at {cap_points:,} points",
-                                "category": category,
-                                "cap_applied": True,
-                                "cap_amount": cap_points
-                            }
-                        else:
-                            return {
-                                "card": card_name,
-                                "spend_amount": spend_amount,
-                                "points_earned": capped_points,
-                                "rate": f"6 points per ₹200 (up to {cap_points:,} points per cycle)",
-                                "calculation": f"₹{spend_amount:,} ÷ 200 × 6 = {capped_points} points",
-                                "category": category,
-                                "cap_applied": False,
-                                "cap_amount": cap_points
-                            }
-            
-            # If not excluded and not a capped category, calculate normal points: 6 points per ₹200 spent
-            points = (spend_amount // 200) * 6
-            return {
-                "card": card_name,
-                "spend_amount": spend_amount,
-                "points_earned": points,
-                "rate": "6 points per ₹200 (general rate)",
-                "calculation": f"₹{spend_amount} ÷ 200 × 6 = {points} points",
-                "category": category or "general"
-            }
-        
-        # Handle Axis Atlas
-        elif "Axis" in card_name and "Atlas" in card_name:
-            rewards_info = card_info.get('rewards', {})
-            
-            # Check if the spending category is excluded from earning rewards
-            excluded_categories = []
-            spend_exclusion_policy = card_info.get('tier_structure', {}).get('spend_exclusion_policy', {})
-            if 'categories' in spend_exclusion_policy:
-                excluded_categories = [cat.lower() for cat in spend_exclusion_policy['categories']]
-            
-            # Map category to exclusion names
-            category_exclusion_map = {
-                'utility': 'utilities',
-                'utilities': 'utilities',
-                'fuel': 'fuel',
-                'rent': 'rent',
-                'wallet': 'wallet',
-                'insurance': 'insurance',
-                'government': 'government institution',
-                'tax': 'government institution',  # Tax falls under government
-                'telecom': 'telecom',
-                'gold': 'gold/ jewellery',
-                'jewellery': 'gold/ jewellery'
-            }
-            
-            # Check if this category is excluded
-            if category and category.lower() in category_exclusion_map:
-                exclusion_name = category_exclusion_map[category.lower()]
-                if exclusion_name in excluded_categories:
-                    return {
-                        "card": card_name,
-                        "spend_amount": spend_amount,
-                        "miles_earned": 0,
-                        "rate": "No EDGE Miles earned (excluded category)",
-                        "calculation": f"₹{spend_amount:,} - 0 miles ({category} excluded from rewards)",
-                        "category": category,
-                        "excluded": True
-                    }
-            
-            # Check if this is a travel-related spend (hotels, airlines)
-            if category and category.lower() in ['hotel', 'travel', 'airline', 'flight']:
-                # Atlas: 5 EDGE Miles per ₹100 for travel (up to ₹2L monthly cap)
-                # Check monthly cap
-                monthly_cap = 200000  # ₹2L cap for travel category
-                capped_spend = min(spend_amount, monthly_cap)
-                excess_spend = max(0, spend_amount - monthly_cap)
-                
-                # Calculate miles for capped amount at 5x rate
-                miles_5x = (capped_spend // 100) * 5
-                # Calculate miles for excess at 2x rate
-                miles_2x = (excess_spend // 100) * 2
-                total_miles = miles_5x + miles_2x
-                
-                calculation_details = f"₹{capped_spend:,} ÷ 100 × 5 = {miles_5x} miles"
-                if excess_spend > 0:
-                    calculation_details += f" + ₹{excess_spend:,} ÷ 100 × 2 = {miles_2x} miles"
-                calculation_details += f" = {total_miles} total miles"
-                
-                return {
-                    "card": card_name,
-                    "spend_amount": spend_amount,
-                    "miles_earned": total_miles,
-                    "rate": "5 EDGE Miles per ₹100 (travel category, up to ₹2L/month), then 2x",
-                    "calculation": calculation_details,
-                    "category": "travel",
-                    "monthly_cap_applied": spend_amount > monthly_cap
-                }
-            else:
-                # Atlas: 2 EDGE Miles per ₹100 for general spend (only if not excluded)
-                miles = (spend_amount // 100) * 2
-                return {
-                    "card": card_name,
-                    "spend_amount": spend_amount,
-                    "miles_earned": miles,
-                    "rate": "2 EDGE Miles per ₹100 (general rate)",
-                    "calculation": f"₹{spend_amount:,} ÷ 100 × 2 = {miles} miles",
-                    "category": category or "general"
-                }
-        
-        return {"error": f"Reward calculation not implemented for {card_name}"}
+        return calculate_rewards(self.cards_data, card_name, spend_amount, category)
 
     def get_relevant_data(self, intent: Optional[str], card_names: List[str]) -> Dict:
         """Get relevant data based on the new nested structure, handling spend categories intelligently."""
@@ -515,9 +299,9 @@ class RichDataCreditCardBot:
             
             for name in card_names:
                 if name in self.cards_data:
-                    card_info = self.cards_data[name]
+                    paths = self.registry.path_index(name)
                     context[name] = {
-                        'rewards': card_info.get('rewards', {}),
+                        'rewards': paths.get('rewards', {}),
                         'name': name
                     }
             return context
@@ -531,11 +315,11 @@ class RichDataCreditCardBot:
             
             for name in card_names:
                 if name in self.cards_data:
-                    card_info = self.cards_data[name]
+                    paths = self.registry.path_index(name)
                     context[name] = {
-                        'rewards': card_info.get('rewards', {}),
-                        'milestones': card_info.get('milestones', []),
-                        'tier_structure': card_info.get('tier_structure', {}),
+                        'rewards': paths.get('rewards', {}),
+                        'milestones': paths.get('milestones', []),
+                        'tier_structure': paths.get('tier_structure', {}),
                         'name': name
                     }
             return context
@@ -549,10 +333,10 @@ class RichDataCreditCardBot:
             
             for name in card_names:
                 if name in self.cards_data:
-                    card_info = self.cards_data[name]
+                    paths = self.registry.path_index(name)
                     context[name] = {
-                        'welcome_benefits': card_info.get('welcome_benefits', {}),
-                        'tier_structure': card_info.get('tier_structure', {}),
+                        'welcome_benefits': paths.get('welcome_benefits', {}),
+                        'tier_structure': paths.get('tier_structure', {}),
                         'name': name
                     }
             return context
@@ -564,11 +348,12 @@ class RichDataCreditCardBot:
             
             # Check if the intent exists in any card's data
             found_data = False
-            for name, card_info in self.cards_data.items():
-                if intent in card_info:
+            for name in self.cards_data:
+                paths = self.registry.path_index(name)
+                if intent in paths:
                     if name not in context:
                         context[name] = {}
-                    context[name][intent] = card_info[intent]
+                    context[name][intent] = paths[intent]
                     context[name]['name'] = name
                     found_data = True
             
@@ -591,20 +376,20 @@ class RichDataCreditCardBot:
                 
             for name in card_names:
                 if name in self.cards_data:
-                    card_info = self.cards_data[name]
+                    paths = self.registry.path_index(name)
                     card_context = {'name': name}
                     
                     # Get miles transfer data if available
-                    if 'miles_transfer' in card_info:
-                        card_context['miles_transfer'] = card_info['miles_transfer']
+                    if 'miles_transfer' in paths:
+                        card_context['miles_transfer'] = paths['miles_transfer']
                         
                     # Get redemption data if available
-                    if 'redemption' in card_info:
-                        card_context['redemption'] = card_info['redemption']
+                    if 'redemption' in paths:
+                        card_context['redemption'] = paths['redemption']
                         
                     # Get rewards data for context
-                    if 'rewards' in card_info:
-                        card_context['rewards'] = card_info['rewards']
+                    if 'rewards' in paths:
+                        card_context['rewards'] = paths['rewards']
                         
                     context[name] = card_context
             return context
@@ -619,7 +404,7 @@ class RichDataCreditCardBot:
                 
             for name in card_names:
                 if name in self.cards_data:
-                    card_info = self.cards_data[name]
+                    paths = self.registry.path_index(name)
                     card_context = {'name': name}
                     
                     # Get surcharge fees from common terms - match card to correct bank
@@ -636,32 +421,28 @@ class RichDataCreditCardBot:
                             card_context['surcharge_fees'] = {intent: bank_terms['surcharge_fees'][intent]}
                             
                     # Also get reward information if available for utilities etc.
-                    if 'rewards' in card_info:
-                        rewards = card_info['rewards']
-                        
+                    if 'rewards' in paths:
                         # Get exclusions from multiple possible sources
                         exclusions = []
-                        if 'accrual_exclusions' in rewards:
-                            exclusions = rewards['accrual_exclusions']
-                        elif 'spend_exclusion_policy' in rewards and 'categories' in rewards['spend_exclusion_policy']:
-                            exclusions = rewards['spend_exclusion_policy']['categories']
+                        if 'rewards.accrual_exclusions' in paths:
+                            exclusions = paths['rewards.accrual_exclusions']
+                        elif 'rewards.spend_exclusion_policy.categories' in paths:
+                            exclusions = paths['rewards.spend_exclusion_policy.categories']
                         
                         card_context['rewards'] = {
-                            'general_rate': rewards.get('rate_general'),
-                            'others_rate': rewards.get('others'),
-                            'value_per_point': rewards.get('value_per_point'),
+                            'general_rate': paths.get('rewards.rate_general'),
+                            'others_rate': paths.get('rewards.others'),
+                            'value_per_point': paths.get('rewards.value_per_point'),
                             'accrual_exclusions': exclusions,
-                            'spend_exclusion_policy': rewards.get('spend_exclusion_policy', {}),
-                            'capping_per_statement_cycle': rewards.get('capping_per_statement_cycle', {})
+                            'spend_exclusion_policy': paths.get('rewards.spend_exclusion_policy', {}),
+                            'capping_per_statement_cycle': paths.get('rewards.capping_per_statement_cycle', {})
                         }
                         
                         # Add unified earning rate for easier AI processing
-                        if rewards.get('rate_general'):
-                            card_context['rewards']['earning_rate'] = rewards.get('rate_general')
-                        elif rewards.get('others') and isinstance(rewards.get('others'), dict):
-                            others_rate = rewards.get('others', {}).get('rate')
-                            if others_rate:
-                                card_context['rewards']['earning_rate'] = others_rate
+                        if paths.get('rewards.rate_general'):
+                            card_context['rewards']['earning_rate'] = paths['rewards.rate_general']
+                        elif paths.get('rewards.others.rate'):
+                            card_context['rewards']['earning_rate'] = paths['rewards.others.rate']
                         
                     context[name] = card_context
             return context
@@ -671,14 +452,14 @@ class RichDataCreditCardBot:
             context = {}
             for name in card_names:
                 if name in self.cards_data:
-                    card_info = self.cards_data[name]
-                    if intent and intent in card_info:
+                    paths = self.registry.path_index(name)
+                    if intent and intent in paths:
                         if name not in context:
                             context[name] = {}
-                        context[name][intent] = card_info[intent]
+                        context[name][intent] = paths[intent]
                         context[name]['name'] = name
                     elif not intent:
-                        context[name] = card_info
+                        context[name] = self.cards_data[name]
             return context
         
 
@@ -688,11 +469,11 @@ class RichDataCreditCardBot:
             context = {}
             for name in card_names:
                 if name in self.cards_data:
-                    card_info = self.cards_data[name]
+                    paths = self.registry.path_index(name)
                     card_context = {}
                     
                     # Get the bank for this card and use its common terms
-                    bank = card_info.get('_bank')
+                    bank = self.registry.bank_of(name)
                     if bank and bank in self.bank_common_terms:
                         bank_terms = self.bank_common_terms[bank]
                         # Check for surcharges in bank-specific common terms
@@ -702,39 +483,37 @@ class RichDataCreditCardBot:
                             if surcharge_key in bank_terms['surcharge_fees']:
                                 card_context['surcharge_info'] = {surcharge_key: bank_terms['surcharge_fees'][surcharge_key]}
                     # Check for rewards and their exclusions
-                    if 'rewards' in card_info:
-                        rewards = card_info['rewards']
+                    if 'rewards' in paths:
                         exclusions = None
                         
                         # Check for exclusions in different formats
-                        if 'spend_exclusion_policy' in rewards:
-                            exclusions = rewards['spend_exclusion_policy']
-                        elif 'accrual_exclusions' in rewards:
-                            exclusions = rewards['accrual_exclusions']
+                        if 'rewards.spend_exclusion_policy' in paths:
+                            exclusions = paths['rewards.spend_exclusion_policy']
+                        elif 'rewards.accrual_exclusions' in paths:
+                            exclusions = paths['rewards.accrual_exclusions']
                         
                         # Include comprehensive reward information for spending categories
                         reward_info = {
-                            'general_rate': rewards.get('rate_general'),
-                            'others_rate': rewards.get('others'),
-                            'value_per_point': rewards.get('value_per_point'),
+                            'general_rate': paths.get('rewards.rate_general'),
+                            'others_rate': paths.get('rewards.others'),
+                            'value_per_point': paths.get('rewards.value_per_point'),
                             'accrual_exclusions': exclusions,
-                            'spend_exclusion_policy': rewards.get('spend_exclusion_policy', {}),
-                            'capping_per_statement_cycle': rewards.get('capping_per_statement_cycle', {})
+                            'spend_exclusion_policy': paths.get('rewards.spend_exclusion_policy', {}),
+                            'capping_per_statement_cycle': paths.get('rewards.capping_per_statement_cycle', {})
                         }
                         
                         # Include category-specific caps if they exist
-                        if 'capping_per_statement_cycle' in rewards:
-                            caps = rewards['capping_per_statement_cycle']
+                        if 'rewards.capping_per_statement_cycle' in paths:
                             # Map insurance_spending intent to insurance cap key
                             cap_key = 'insurance' if intent == 'insurance_spending' else intent
-                            if cap_key in caps:
-                                reward_info['category_cap'] = caps[cap_key]
-                            reward_info['all_caps'] = caps
+                            if f'rewards.capping_per_statement_cycle.{cap_key}' in paths:
+                                reward_info['category_cap'] = paths[f'rewards.capping_per_statement_cycle.{cap_key}']
+                            reward_info['all_caps'] = paths['rewards.capping_per_statement_cycle']
                             
                         card_context['rewards_info'] = reward_info
                     # Check for milestone eligibility exclusions
-                    if 'milestone_eligibility' in card_info:
-                        card_context['milestone_eligibility_exclusions'] = card_info['milestone_eligibility'].get('spend_exclusion_policies')
+                    if 'milestone_eligibility' in paths:
+                        card_context['milestone_eligibility_exclusions'] = paths.get('milestone_eligibility.spend_exclusion_policies')
                         
                     context[name] = card_context
             return context
@@ -749,11 +528,11 @@ class RichDataCreditCardBot:
             context = {}
             for name in card_names:
                 if name in self.cards_data:
-                    card_info = self.cards_data[name]
-                    if intent and intent in card_info:
-                        context[name] = {intent: card_info[intent]}
+                    paths = self.registry.path_index(name)
+                    if intent and intent in paths:
+                        context[name] = {intent: paths[intent]}
                     elif not intent:
-                        context[name] = card_info
+                        context[name] = self.cards_data[name]
             return context
             
         return {}
@@ -762,14 +541,17 @@ class RichDataCreditCardBot:
         """
         Generates an answer using the configured API (Gemini or OpenAI) based on the relevant data.
         """
+        breakdown_text = ""
+        
         # Handle reward calculation queries with specific card rates
         if intent == 'reward_calculation':
             query_lower = query.lower()
             
             # Check if this is a milestone-related query - if so, skip manual calculation and use AI system prompt
             if 'milestone' in query_lower or 'yearly' in query_lower or 'annual' in query_lower or '7.5l' in query_lower or '15l' in query_lower or '3l' in query_lower:
-                # Let the AI system prompt handle milestone calculations
-                pass
+                # Let the AI system prompt explain milestones, from an exact month-by-month simulation
+                card_names = [name for name in relevant_data if name in self.cards_data] or list(self.cards_data)
+                breakdown_text = self.year_simulation(query, card_names)
             else:
                 spend_amount = self.extract_spend_amount(query)
                 
@@ -831,8 +613,9 @@ class RichDataCreditCardBot:
                 ('rent' in query_lower and 'utility' in query_lower and 'grocery' in query_lower) or
                 ('20%' in query_lower and '10%' in query_lower) or
                 'individual category' in query_lower):
-                # Let the AI system prompt handle multi-category analysis
-                pass
+                # Let the AI system prompt handle multi-category analysis, with exact per-category numbers
+                card_names = [name for name in relevant_data if name in self.cards_data] or list(self.cards_data)
+                breakdown_text = self.spend_breakdown(query, card_names)
             else:
                 spend_amount = self.extract_spend_amount(query)
                 
@@ -934,7 +717,7 @@ class RichDataCreditCardBot:
                 else:
                     return "Please specify a spend amount to compare rewards (e.g., 'If I spend ₹100,000 which card gives more rewards?')"
         
-        context = json.dumps(relevant_data, indent=2)
+        context, self.last_prompt_report = self.prompt_serializer.serialize(relevant_data, query)
 
         # Define two separate prompts based on the intent
         if intent in self.spend_category_intents:
@@ -1315,47 +1098,21 @@ EXAMPLE MULTI-CARD FORMAT:
 
 CONTEXT:
 {context}
-"""
+{breakdown_text}"""
+        
+        def ask(provider: LLMProvider, timeout: float) -> str:
+            if provider.name == "gemini":
+                # Gemini gets prompt and query as one text with its default generation settings
+                return provider.complete(prompt, f"User Query: {query}", max_tokens=None, temperature=None, timeout=timeout)
+            return provider.complete(prompt, query, max_tokens=350, temperature=0.1, timeout=timeout)
         
-        # Call the appropriate API
+        # Call the first healthy provider, falling back to the next one on error
         try:
-            if self.api_type == "gemini":
-                response = self.gemini_model.generate_content(f"{prompt}\n\nUser Query: {query}")
-                return response.text
-            else:
-                # OpenAI
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": prompt},
-                        {"role": "user", "content": query}
-                    ],
-                    temperature=0.1,
-                    max_tokens=350
-                )
-                return response.choices[0].message.content
-                
-        except Exception as e:
-            # Fallback logic
-            if self.api_type == "gemini" and os.getenv("OPENAI_API_KEY"):
-                print(f"⚠️ Gemini failed ({e}), falling back to OpenAI...")
-                try:
-                    fallback_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-                    response = fallback_client.chat.completions.create(
-                        model="gpt-3.5-turbo",
-                        messages=[
-                            {"role": "system", "content": prompt},
-                            {"role": "user", "content": query}
-                        ],
-                        temperature=0.1,
-                        max_tokens=350
-                    )
-                    return response.choices[0].message.content
-                except Exception as fallback_error:
-                    return f"I'm sorry, both Gemini and OpenAI encountered errors: {e} | {fallback_error}"
-
-            else:
-                return f"I'm sorry, I encountered an error: {e}"
+            return self.circuit_router.call(ask)
+        except AllProvidersFailedError as e:
+            if len(e.errors) == 1:
+                return f"I'm sorry, I encountered an error: {e.errors[0][1]}"
+            return f"I'm sorry, every provider encountered an error: {e}"
 
     def detect_portfolio_query(self, query: str) -> bool:
         """Check if user is asking about available cards/portfolio."""
@@ -1429,6 +1186,7 @@ CONTEXT:
             
             # Response generation
             response_start = time.time()
+            self.last_prompt_report = None
             answer = self.generate_answer(user_query, relevant_data, intent)
             response_time = time.time() - response_start
             
@@ -1441,6 +1199,9 @@ CONTEXT:
                     'response_generation_time': round(response_time * 1000, 2),
                     'total_processing_time': round((time.time() - start_time) * 1000, 2)
                 })
+                if self.last_prompt_report:
+                    analytics['prompt_tokens_before'] = self.last_prompt_report['tokens_before']
+                    analytics['prompt_tokens_after'] = self.last_prompt_report['tokens_after']
                 self._store_query_analytics(user_query, analytics)
             
             return answer
@@ -0,0 +1,103 @@
+"""
+Query Classification for Output Budgets and Model Routing
+A local, rule-based step ahead of the LLM call that sorts queries into classes (short factual
+lookup, single calculation, multi-category analysis), each with its own max output tokens and
+model tier, and records realized output tokens per class so the budgets can be tuned.
+"""
+
+import os
+import re
+import json
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+from utils.fast_path import CATEGORY_KEYWORDS, contains_word
+from utils.prompt_serializer import estimate_tokens
+
+# Output budget and model tier per query class
+QUERY_CLASSES = {
+    "factual_lookup": {"max_output_tokens": 500, "model_tier": "fast"},
+    "single_calculation": {"max_output_tokens": 900, "model_tier": "fast"},
+    "multi_category_analysis": {"max_output_tokens": 2000, "model_tier": "strong"}
+}
+
+# Concrete model per provider and tier; providers not listed keep their configured model
+MODEL_TIERS = {
+    "gemini": {"fast": "gemini-1.5-flash", "strong": "gemini-1.5-pro"},
+    "openai": {"fast": "gpt-3.5-turbo", "strong": "gpt-4o-mini"}
+}
+
+CALCULATION_WORDS = ['calculate', 'how many', 'how much', 'earn', 'points', 'miles', 'rewards', 'total']
+ANALYSIS_WORDS = ['split', '%', 'monthly spends', 'breakdown', 'individual category', 'optimal', 'allocation', 'strategy']
+
+
+class QueryClassifier:
+    """Classifies queries against a config table and tracks realized output tokens per class."""
+
+    def __init__(self, query_classes: Optional[Dict[str, Dict[str, Any]]] = None,
+                 model_tiers: Optional[Dict[str, Dict[str, str]]] = None, window_size: int = 500):
+        self.query_classes = query_classes or QUERY_CLASSES
+        self.model_tiers = model_tiers or MODEL_TIERS
+        self.window_size = window_size
+        self._output_tokens = {name: deque(maxlen=window_size) for name in self.query_classes}
+        self._lock = threading.Lock()
+
+    def classify(self, query: str) -> Dict[str, Any]:
+        """Return {"query_class", "max_output_tokens", "model_tier"} for a (currency-normalised) query."""
+        text = query.lower()
+        categories = [category for category, keywords in CATEGORY_KEYWORDS.items()
+                      if any(contains_word(text, keyword) for keyword in keywords)]
+        amounts = re.findall(r'\d[\d,]*', text)
+
+        if len(categories) > 1 or any(word in text for word in ANALYSIS_WORDS) or (
+                'milestone' in text and amounts):
+            query_class = "multi_category_analysis"
+        elif amounts or any(word in text for word in CALCULATION_WORDS):
+            query_class = "single_calculation"
+        else:
+            query_class = "factual_lookup"
+
+        route = dict(self.query_classes[query_class])
+        route["query_class"] = query_class
+        return route
+
+    def model_for(self, provider_name: str, model_tier: str) -> Optional[str]:
+        """Concrete model for a provider and tier, or None to keep the provider's own model."""
+        return self.model_tiers.get(provider_name, {}).get(model_tier)
+
+    def record_output(self, query_class: str, response: str):
+        """Record the realized output size (estimated tokens) of an answer in this class."""
+        with self._lock:
+            self._output_tokens.setdefault(query_class, deque(maxlen=self.window_size)).append(estimate_tokens(response))
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per class: budget, tier, answers seen, mean/p95/max output tokens and share near the budget."""
+        stats = {}
+        with self._lock:
+            samples = {name: sorted(tokens) for name, tokens in self._output_tokens.items()}
+        for name, config in self.query_classes.items():
+            tokens = samples.get(name, [])
+            budget = config["max_output_tokens"]
+            stats[name] = {
+                "max_output_tokens": budget,
+                "model_tier": config["model_tier"],
+                "answers": len(tokens),
+                "mean_output_tokens": round(sum(tokens) / len(tokens), 1) if tokens else None,
+                "p95_output_tokens": tokens[min(len(tokens) - 1, int(len(tokens) * 0.95))] if tokens else None,
+                "max_seen_output_tokens": tokens[-1] if tokens else None,
+                # Answers this close to the budget were probably truncated
+                "near_budget_rate": round(sum(1 for t in tokens if t >= 0.95 * budget) / len(tokens), 3) if tokens else 0.0
+            }
+        return stats
+
+
+def create_query_classifier() -> QueryClassifier:
+    """Classifier from the built-in table, or from the JSON file at QUERY_ROUTING_CONFIG
+    ({"query_classes": {...}, "model_tiers": {...}}; either key may be omitted)."""
+    config_path = os.getenv("QUERY_ROUTING_CONFIG")
+    if not config_path:
+        return QueryClassifier()
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    return QueryClassifier(config.get("query_classes"), config.get("model_tiers"))
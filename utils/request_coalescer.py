@@ -0,0 +1,180 @@
+"""
+Single-Flight Request Coalescing
+Concurrent identical LLM requests share one in-flight provider call instead of each making their own.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+
+class CoalescedCallError(RuntimeError):
+    """Raised to followers when the leading call was abandoned before it finished."""
+
+
+class _InFlightCall:
+    """State shared between the leader streaming a call and the followers reading its chunks."""
+
+    def __init__(self, timeout_seconds: float):
+        self.timeout_seconds = timeout_seconds
+        self.condition = threading.Condition()
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.chunks: List[str] = []
+        self.followers = 0
+
+
+class _AsyncInFlightCall:
+    """A shared provider call running as its own task, plus the number of callers awaiting it."""
+
+    def __init__(self, task: "asyncio.Future", timeout_seconds: float):
+        self.task = task
+        self.timeout_seconds = timeout_seconds
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key.
+    The first caller (leader) runs the function; callers arriving while it is in flight
+    (followers) wait for its result, bounded by a per-key timeout so a stuck or failing
+    leader never hangs them indefinitely.
+    """
+
+    def __init__(self, timeout_seconds: float = 30.0):
+        self.timeout_seconds = timeout_seconds
+        self._calls: Dict[str, _InFlightCall] = {}
+        self._async_calls: Dict[str, _AsyncInFlightCall] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "leaders": 0,
+            "coalesced": 0,
+            "timeouts": 0,
+            "errors": 0
+        }
+
+    def stream(self, key: str, stream_func: Callable[[], Iterator[str]],
+               timeout_seconds: Optional[float] = None) -> Iterator[str]:
+        """
+        Share one streamed call per in-flight key: the leader consumes stream_func() and every
+        follower receives the same chunks as they arrive (or the leader's exception). The timeout
+        bounds the gap between chunks.
+        """
+        call, is_leader = self._join(key, timeout_seconds)
+
+        if not is_leader:
+            position = 0
+            while True:
+                with call.condition:
+                    has_progress = call.condition.wait_for(
+                        lambda: call.done or len(call.chunks) > position,
+                        timeout=call.timeout_seconds
+                    )
+                    if not has_progress:
+                        self._count("timeouts")
+                        raise TimeoutError(f"Timed out after {call.timeout_seconds:.0f}s waiting for an identical in-flight request")
+                    new_chunks = call.chunks[position:]
+                    finished = call.done
+                for chunk in new_chunks:
+                    yield chunk
+                position += len(new_chunks)
+                if finished:
+                    break
+            if call.error is not None:
+                raise call.error
+            return
+
+        try:
+            for chunk in stream_func():
+                with call.condition:
+                    call.chunks.append(chunk)
+                    call.condition.notify_all()
+                yield chunk
+        except GeneratorExit:
+            # The leader's consumer went away; release followers instead of leaving them waiting
+            call.error = CoalescedCallError("The shared request was cancelled before it completed")
+            raise
+        except BaseException as e:
+            call.error = e
+            self._count("errors")
+            raise
+        finally:
+            self._finish(key, call)
+
+    async def ado(self, key: str, coro_func: Callable[[], Awaitable[Any]],
+                  timeout_seconds: Optional[float] = None) -> Any:
+        """
+        Run coro_func once per in-flight key and share its result (or exception) with concurrent
+        callers on the same event loop. The shared call runs as its own task so a cancelled caller does not cancel it for
+        the others; it is only cancelled once every caller awaiting it has gone away.
+        """
+        with self._lock:
+            call = self._async_calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _AsyncInFlightCall(asyncio.ensure_future(coro_func()), timeout_seconds or self.timeout_seconds)
+                self._async_calls[key] = call
+                self.stats["leaders"] += 1
+                call.task.add_done_callback(lambda task: self._retire_async(key, call))
+            else:
+                self.stats["coalesced"] += 1
+            call.waiters += 1
+
+        try:
+            if is_leader:
+                return await asyncio.shield(call.task)
+            try:
+                return await asyncio.wait_for(asyncio.shield(call.task), timeout=call.timeout_seconds)
+            except asyncio.TimeoutError:
+                if call.task.done():
+                    # The shared call itself timed out; propagate its error unchanged
+                    raise
+                self._count("timeouts")
+                raise TimeoutError(f"Timed out after {call.timeout_seconds:.0f}s waiting for an identical in-flight request")
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return leader/follower counters and the number of calls currently in flight."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._calls) + len(self._async_calls)
+        total = stats["leaders"] + stats["coalesced"]
+        stats["coalesce_rate"] = round(stats["coalesced"] / total, 3) if total else 0.0
+        return stats
+
+    def _join(self, key: str, timeout_seconds: Optional[float]):
+        """Register as leader for key, or attach as a follower to the call already in flight."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.stats["coalesced"] += 1
+                return call, False
+            call = _InFlightCall(timeout_seconds or self.timeout_seconds)
+            self._calls[key] = call
+            self.stats["leaders"] += 1
+            return call, True
+
+    def _finish(self, key: str, call: _InFlightCall):
+        """Retire the in-flight call and wake every follower."""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        with call.condition:
+            call.done = True
+            call.condition.notify_all()
+
+    def _retire_async(self, key: str, call: _AsyncInFlightCall):
+        """Done-callback for shared async calls: drop the entry and count failures."""
+        with self._lock:
+            if self._async_calls.get(key) is call:
+                del self._async_calls[key]
+            if not call.task.cancelled() and call.task.exception() is not None:
+                self.stats["errors"] += 1
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
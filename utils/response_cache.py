@@ -0,0 +1,242 @@
+"""
+Response Cache for the AI-Powered Credit Card QA Engine
+LRU + TTL cache for LLM answers with an optional on-disk tier and automatic
+invalidation whenever a card data file changes.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a currency-preprocessed query so trivially different phrasings share a cache key."""
+    text = query.lower()
+    # Drop thousands separators and decimal points that are not part of a number
+    text = re.sub(r'(?<=\d),(?=\d)', '', text)
+    text = re.sub(r'(?<!\d)\.|\.(?!\d)', ' ', text)
+    # Strip remaining punctuation but keep the rupee sign and percentages
+    text = re.sub(r'[^\w\s₹%.]', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def hash_payload(payload: Any) -> str:
+    """Stable short hash of any JSON-serialisable payload."""
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+
+
+def data_files_fingerprint(watch_dirs: List[str]) -> str:
+    """Fingerprint every JSON file under the watched data directories (name, size, mtime)."""
+    entries = []
+    for directory in sorted(set(watch_dirs)):
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError:
+            continue
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(directory, name))
+            except OSError:
+                continue
+            entries.append((directory, name, stat.st_size, stat.st_mtime_ns))
+    return hash_payload(entries)
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache for final LLM responses.
+    Entries expire after a TTL, can be mirrored to disk so they survive restarts,
+    and are dropped automatically when any watched data file changes.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600,
+                 disk_dir: Optional[str] = None, max_disk_entries: int = 2000,
+                 watch_dirs: Optional[List[str]] = None, check_interval_seconds: float = 2.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self.watch_dirs = watch_dirs or []
+        self.check_interval_seconds = check_interval_seconds
+
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_version_check = 0.0
+        self.data_version = data_files_fingerprint(self.watch_dirs)
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0
+        }
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def make_key(self, processed_query: str, relevant_data: Dict, model: str,
+                 conversation_history: Optional[Any] = None) -> str:
+        """
+        Build a cache key from the normalized query and a hash of the selected card data sections
+        (plus the conversation context, when the answer depends on earlier turns).
+        """
+        key_material = {
+            "query": normalize_query(processed_query),
+            "sections": hash_payload(relevant_data),
+            "model": model
+        }
+        if conversation_history:
+            key_material["history"] = hash_payload(conversation_history)
+        return hash_payload(key_material)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response, or None on a miss."""
+        self.check_data_version()
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, response = entry
+                if now - created <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return response
+                del self._entries[key]
+                self.stats["expirations"] += 1
+
+        disk_entry = self._load_from_disk(key, now)
+        with self._lock:
+            if disk_entry is not None:
+                self._store_in_memory(key, disk_entry["created"], disk_entry["response"])
+                self.stats["hits"] += 1
+                self.stats["disk_hits"] += 1
+                return disk_entry["response"]
+            self.stats["misses"] += 1
+        return None
+
+    def set(self, key: str, response: str):
+        """Store a response in memory and, if configured, on disk."""
+        self.check_data_version()
+        created = time.time()
+        with self._lock:
+            self._store_in_memory(key, created, response)
+        self._save_to_disk(key, created, response)
+
+    def clear(self):
+        """Drop every cached entry from both tiers."""
+        with self._lock:
+            self._entries.clear()
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.json'):
+                    try:
+                        os.remove(os.path.join(self.disk_dir, name))
+                    except OSError:
+                        pass
+
+    def check_data_version(self) -> bool:
+        """Invalidate the cache if a watched data file changed. Returns True if it did."""
+        now = time.time()
+        if now - self._last_version_check < self.check_interval_seconds:
+            return False
+        self._last_version_check = now
+
+        current_version = data_files_fingerprint(self.watch_dirs)
+        if current_version == self.data_version:
+            return False
+
+        self.data_version = current_version
+        self.clear()
+        self.stats["invalidations"] += 1
+        print("♻️ Card data changed - response cache invalidated")
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters plus current size and hit rate."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["data_version"] = self.data_version
+        stats["disk_tier"] = bool(self.disk_dir)
+        return stats
+
+    # In-memory tier (caller must hold the lock)
+    def _store_in_memory(self, key: str, created: float, response: str):
+        self._entries[key] = (created, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    # On-disk tier
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _load_from_disk(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        """Load an entry from disk if it is fresh and was produced from the current data version."""
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        if entry.get("data_version") != self.data_version or now - entry.get("created", 0) > self.ttl_seconds:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def _save_to_disk(self, key: str, created: float, response: str):
+        """Atomically write an entry to disk and prune the oldest files beyond the disk limit."""
+        if not self.disk_dir:
+            return
+        entry = {"created": created, "data_version": self.data_version, "response": response}
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError:
+            return
+
+        try:
+            files = [os.path.join(self.disk_dir, name) for name in os.listdir(self.disk_dir) if name.endswith('.json')]
+            if len(files) > self.max_disk_entries:
+                files.sort(key=os.path.getmtime)
+                for path in files[:len(files) - self.max_disk_entries]:
+                    os.remove(path)
+        except OSError:
+            pass
+
+
+def create_response_cache(data_files: List[str]) -> Optional[ResponseCache]:
+    """Create a response cache configured from environment variables (None if disabled)."""
+    if os.getenv("RESPONSE_CACHE_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+
+    watch_dirs = [os.path.dirname(os.path.abspath(path)) for path in data_files]
+    return ResponseCache(
+        max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256")),
+        ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+        disk_dir=os.getenv("RESPONSE_CACHE_DIR") or None,
+        watch_dirs=watch_dirs
+    )
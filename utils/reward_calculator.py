@@ -0,0 +1,130 @@
+"""
+Reward Calculator
+Exact reward point/mile calculations for a spend amount and category, shared by both engines.
+Each card's rates, caps and exclusions come from its JSON data (see utils.reward_rules).
+calculate_rewards_batch evaluates many spend profiles x cards x categories in one NumPy pass.
+"""
+
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from utils.reward_rules import category_rule, evaluate_rewards, get_reward_table
+
+
+def calculate_rewards(cards_data: Dict[str, Dict[str, Any]], card_name: str, spend_amount: int, category: str = None) -> Dict:
+    """Calculate rewards for a specific card and spend amount, considering spending category."""
+    if card_name not in cards_data:
+        return {"error": f"Card {card_name} not found"}
+
+    table = get_reward_table(cards_data[card_name])
+    if table is None:
+        return {"error": f"Reward calculation not implemented for {card_name}"}
+    return evaluate_rewards(table, card_name, spend_amount, category)
+
+
+def calculate_rewards_batch(cards_data: Dict[str, Dict[str, Any]], spend_matrix: Any, cards: Sequence[str],
+                            categories: Sequence[Optional[str]]) -> Dict[str, Any]:
+    """
+    Rewards for every spend profile, card and category at once. spend_matrix has one row per
+    profile (one month / statement cycle) and one column per category (None = general spend).
+    Returns the [profile, category] "spend" and arrays indexed [profile, card, category]: "earned" and "cap_hit" (monthly spend cap
+    or statement-cycle cap reached); "excluded" and "exclusion_reasons" indexed [card, category];
+    "totals" indexed [profile, card]; and each card's "unit" ("points" / "miles") and "label".
+    """
+    spend = np.asarray(spend_matrix, dtype=float)
+    if spend.ndim == 1:
+        spend = spend[np.newaxis, :]
+    if spend.ndim != 2 or spend.shape[1] != len(categories):
+        return {"error": f"spend_matrix must have one column per category ({len(categories)}), got shape {spend.shape}"}
+
+    tables = []
+    for card_name in cards:
+        if card_name not in cards_data:
+            return {"error": f"Card {card_name} not found"}
+        table = get_reward_table(cards_data[card_name])
+        if table is None:
+            return {"error": f"Reward calculation not implemented for {card_name}"}
+        tables.append(table)
+
+    # Rule parameters as [card, category] arrays (caps that do not apply are infinite)
+    rules = [[category_rule(table, category) for category in categories] for table in tables]
+    shape = (len(cards), len(categories))
+    units, per_amount, spend_cap = np.zeros(shape), np.ones(shape), np.full(shape, np.inf)
+    above_units, above_per, earn_cap = np.zeros(shape), np.ones(shape), np.full(shape, np.inf)
+    excluded = np.zeros(shape, dtype=bool)
+    for i, card_rules in enumerate(rules):
+        for j, rule in enumerate(card_rules):
+            units[i, j], per_amount[i, j] = rule["rate"]
+            above_units[i, j], above_per[i, j] = rule["above_cap_rate"]
+            if rule["spend_cap"] is not None:
+                spend_cap[i, j] = rule["spend_cap"]
+            if rule["earn_cap"] is not None:
+                earn_cap[i, j] = rule["earn_cap"]
+            excluded[i, j] = rule["excluded"]
+
+    # Broadcast [profile, 1, category] spends against [card, category] rules
+    profile_spend = spend[:, np.newaxis, :]
+    capped_spend = np.minimum(profile_spend, spend_cap)
+    uncapped = (np.floor(capped_spend / per_amount) * units
+                + np.floor((profile_spend - capped_spend) / above_per) * above_units)
+    earned = np.where(excluded, 0.0, np.minimum(uncapped, earn_cap))
+    cap_hit = ~excluded & ((profile_spend > spend_cap) | (uncapped > earn_cap))
+
+    return {
+        "cards": list(cards),
+        "categories": list(categories),
+        "spend": spend,
+        "unit": [table["unit"] for table in tables],
+        "label": [table["base"][1] for table in tables],
+        "earned": earned,
+        "cap_hit": cap_hit,
+        "excluded": excluded,
+        "exclusion_reasons": [[rule["exclusion_reason"] for rule in card_rules] for card_rules in rules],
+        "totals": earned.sum(axis=2)
+    }
+
+
+def format_reward_breakdown(batch: Dict[str, Any], profile: int = 0) -> str:
+    """Markdown table of one profile from calculate_rewards_batch: a row per category, a column per card."""
+    spend_row = batch["spend"][profile]
+    headers = ["Category", "Spend"] + [f"{card} ({label})" for card, label in zip(batch["cards"], batch["label"])]
+    lines = ["| " + " | ".join(headers) + " |", "|" + "---|" * len(headers)]
+    for j, category in enumerate(batch["categories"]):
+        cells = [category or "other (general)", f"₹{spend_row[j]:,.0f}"]
+        for i in range(len(batch["cards"])):
+            earned = f"{batch['earned'][profile, i, j]:,.0f}"
+            if batch["excluded"][i, j]:
+                earned += " (excluded)"
+            elif batch["cap_hit"][profile, i, j]:
+                earned += " (cap reached)"
+            cells.append(earned)
+        lines.append("| " + " | ".join(cells) + " |")
+    totals = [f"**{total:,.0f}**" for total in batch["totals"][profile]]
+    lines.append("| " + " | ".join(["**Total**", f"**₹{sum(spend_row):,.0f}**"] + totals) + " |")
+    return "\n".join(lines)
+
+
+def spend_breakdown_text(cards_data: Dict[str, Dict[str, Any]], query: str, cards: Sequence[str]) -> str:
+    """
+    Prompt section with the exact per-category reward table for a multi-category spend question
+    (plus the best card per category when it asks how to allocate), or "" if the question has no
+    spend split. Expects normalised currency; used by both engines.
+    """
+    # Deferred: fast_path and spend_optimizer are built on this module
+    from utils.fast_path import parse_spend_split
+    from utils.spend_optimizer import SpendOptimizer, format_allocation, is_allocation_question
+
+    allocation = parse_spend_split(query)
+    if not allocation:
+        return ""
+    batch = calculate_rewards_batch(cards_data, [list(allocation.values())], cards, list(allocation))
+    if 'error' in batch:
+        return ""
+    text = ("\nEXACT REWARD BREAKDOWN (one month, computed from the card rules; use these numbers, "
+            f"do not recalculate them):\n{format_reward_breakdown(batch)}\n")
+    if is_allocation_question(query):
+        plan = SpendOptimizer(cards_data).optimize(allocation)
+        if 'error' not in plan:
+            text += f"\nBEST CARD PER CATEGORY (optimised for annual value incl. caps and milestones):\n{format_allocation(plan)}\n"
+    return text
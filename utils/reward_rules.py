@@ -0,0 +1,389 @@
+"""
+Declarative Reward Rules
+Compiles a card's reward terms from the card JSON (rewards rates, category sections with caps,
+accrual_exclusions, capping_per_statement_cycle and the spend_exclusion_policy) into
+compact rate/cap/exclusion tables, and evaluates any card's tables with one code path.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Spend categories callers use that a card's data names differently
+CATEGORY_ALIASES = {
+    'travel': ['hotel', 'airline', 'flight'],
+}
+# Keywords that identify an exclusion entry for a spend category (default: the category itself)
+EXCLUSION_KEYWORDS = {
+    'government': ['government', 'tax'],
+    'tax': ['tax', 'government'],
+    'utility': ['utilit'],
+    'gold': ['gold', 'jewellery'],
+    'jewellery': ['jewellery', 'gold'],
+}
+
+_RATE_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(.*?)\s*(?:/|\bper\b|\bon every\b)\s*₹\s*([\d,]+)', re.IGNORECASE)
+_AMOUNT_PATTERN = re.compile(r'₹?\s*(\d+(?:\.\d+)?)\s*(cr|crore|l|lakh|k)?\b', re.IGNORECASE)
+_WORD_PATTERN = re.compile(r'\w+')
+_AMOUNT_MULTIPLIERS = {'cr': 10000000, 'crore': 10000000, 'l': 100000, 'lakh': 100000, 'k': 1000}
+
+# Compiled tables by id() of the card dict. Each entry holds the dict itself, so its id cannot be
+# reused by another object while the entry exists; lookups also check identity. Shared by request
+# threads, so every access holds _table_lock.
+_TABLE_CACHE_SIZE = 1024
+_table_cache: "OrderedDict[int, Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]" = OrderedDict()
+_table_lock = threading.Lock()
+
+
+def canonical_category(category: str) -> str:
+    """Lower-case singular form ("Utilities" -> "utility", "Hotels" -> "hotel")."""
+    category = category.strip().lower()
+    if category.endswith('ies'):
+        return category[:-3] + 'y'
+    if category.endswith('s') and not category.endswith('ss'):
+        return category[:-1]
+    return category
+
+
+def parse_rate(text: str) -> Optional[Tuple[float, str, int]]:
+    """"2 EDGE Miles/₹100" -> (2, "EDGE Miles", 100); None if the text states no rate."""
+    match = _RATE_PATTERN.search(text or '')
+    if not match:
+        return None
+    units = float(match.group(1))
+    return (int(units) if units.is_integer() else units), match.group(2), int(match.group(3).replace(',', ''))
+
+
+def parse_amount(text: str) -> Optional[int]:
+    """"₹2L" -> 200000, "5,000 Reward Points" -> 5000."""
+    match = _AMOUNT_PATTERN.search((text or '').replace(',', ''))
+    if not match:
+        return None
+    return int(float(match.group(1)) * _AMOUNT_MULTIPLIERS.get((match.group(2) or '').lower(), 1))
+
+
+def compile_reward_table(card_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Rate/cap/exclusion tables for one card, or None when its data states no earning rate:
+    {"base": (units, label, per_amount), "unit": "points"|"miles", "value_per_unit": ₹ per unit,
+     "sections": {name: {"rate", "aliases", "monthly_cap", "cap_text", "above_cap_rate"}},
+     "statement_caps": {category: max units per statement cycle}, "exclusions": [entry, ...],
+     "milestones": [{"spend", "units", "value", "label"}, ...], "milestone_exclusions": [entry, ...],
+     "tiers": [{"name", "spend", "renewal_bonus", "benefits"}, ...], "initial_tier": name,
+     "annual_fee": ₹, "fee_reversal_spend": ₹ per anniversary year, "fee_reversal_exclusions": [entry, ...],
+     "section_aliases": {alias: section name}, "exclusion_prefixes": {list key: {word prefix: entry index}}}
+    """
+    rewards = card_info.get('rewards', {})
+    base = parse_rate(rewards.get('earning_rate')) or parse_rate(rewards.get('rate_general'))
+    if base is None:
+        return None
+
+    # Category sections with their own rate (e.g. travel) that differ from the base rate or are capped
+    sections = {}
+    for name, section in rewards.items():
+        if not isinstance(section, dict) or 'rate' not in section or 'categories' not in section:
+            continue
+        rate = parse_rate(section['rate'])
+        monthly_cap = parse_amount(section.get('monthly_cap')) if section.get('monthly_cap') else None
+        if rate is None or (rate[0] / rate[2] == base[0] / base[2] and monthly_cap is None):
+            continue
+        aliases = {canonical_category(name)} | set(CATEGORY_ALIASES.get(name, []))
+        for label in section['categories']:
+            aliases.update(canonical_category(word) for word in label.split())
+        sections[name] = {
+            "rate": rate,
+            "aliases": aliases,
+            "monthly_cap": monthly_cap,
+            "cap_text": section.get('monthly_cap'),
+            "above_cap_rate": parse_rate(section.get('above_cap_rate')) or base
+        }
+
+    statement_caps = {}
+    for category, cap_text in rewards.get('capping_per_statement_cycle', {}).items():
+        cap = parse_amount(cap_text)
+        if cap is not None:
+            statement_caps[canonical_category(category)] = cap
+
+    exclusions: List[str] = []
+    policies = [rewards.get('spend_exclusion_policy', {}),
+                card_info.get('tier_structure', {}).get('spend_exclusion_policy', {})]
+    for entry in rewards.get('accrual_exclusions', []) + [c for policy in policies for c in policy.get('categories', [])]:
+        if entry not in exclusions:
+            exclusions.append(entry)
+
+    unit = "miles" if "mile" in base[1].lower() else "points"
+    value_match = re.search(r'₹\s*(\d+(?:\.\d+)?)', rewards.get('value_per_point', ''))
+    value_per_unit = float(value_match.group(1)) if value_match else 1.0
+
+    # Spend that counts toward milestones; without milestone rules, spend that earns nothing does not count
+    milestone_policies = card_info.get('milestone_eligibility', {}).get('spend_exclusion_policies')
+    milestone_exclusions: List[str] = [] if milestone_policies else list(exclusions)
+    for policy in milestone_policies or []:
+        for entry in policy.get('categories', []):
+            if entry not in milestone_exclusions:
+                milestone_exclusions.append(entry)
+
+    # Spend-based tiers (lowest first); the tier's annual_bonus is credited at renewal
+    tier_structure = card_info.get('tier_structure') or {}
+    tiers = sorted(
+        ({"name": name, "spend": parse_amount(tier.get('spend_threshold') or '') or 0,
+          "renewal_bonus": tier.get('annual_bonus') or 0,
+          "benefits": {key: value for key, value in tier.items() if key not in ('spend_threshold', 'annual_bonus')}}
+         for name, tier in tier_structure.get('tiers', {}).items()),
+        key=lambda tier: tier["spend"]
+    )
+
+    # Annual fee and the anniversary-year spend that reverses it, e.g. "₹10,00,000 in an
+    # anniversary year (spends through EMI, rent, ... are excluded ...)"
+    fee_match = re.search(r'₹\s*[\d,.]+\s*(?:cr|crore|l|lakh|k)?\b', card_info.get('fees', {}).get('annual_fee', ''), re.IGNORECASE)
+    reversal_text = card_info.get('annual_fee_reversal_spend_threshold') or ''
+    reversal_exclusions = re.search(r'\(([^)]*)\)', reversal_text)
+    fee_reversal_exclusions = [reversal_exclusions.group(1)] if reversal_exclusions else []
+
+    # Lookup tables so per-query category matching is a dict probe
+    section_aliases: Dict[str, str] = {}
+    for name, section in sections.items():
+        for alias in section["aliases"]:
+            section_aliases.setdefault(alias, name)
+
+    return {
+        "base": base,
+        "unit": unit,
+        "value_per_unit": value_per_unit,
+        "sections": sections,
+        "statement_caps": statement_caps,
+        "exclusions": exclusions,
+        "milestones": _compile_milestones(card_info.get('milestones'), base[1], value_per_unit),
+        "milestone_exclusions": milestone_exclusions,
+        "tiers": tiers,
+        "initial_tier": tier_structure.get('initial_tier') or (tiers[0]["name"] if tiers else None),
+        "annual_fee": parse_amount(fee_match.group(0)) if fee_match else None,
+        "fee_reversal_spend": parse_amount(reversal_text) if reversal_text else None,
+        "fee_reversal_exclusions": fee_reversal_exclusions,
+        "section_aliases": section_aliases,
+        "exclusion_prefixes": {"exclusions": _word_prefixes(exclusions),
+                               "milestone_exclusions": _word_prefixes(milestone_exclusions),
+                               "fee_reversal_exclusions": _word_prefixes(fee_reversal_exclusions)}
+    }
+
+
+def _word_prefixes(entries: List[str]) -> Dict[str, int]:
+    """
+    {prefix of a lower-cased word: index of the first entry containing it}. A keyword made of
+    word characters matches r'\b' + keyword in an entry exactly when it prefixes one of its words.
+    """
+    prefixes: Dict[str, int] = {}
+    for index, entry in enumerate(entries):
+        for word in _WORD_PATTERN.findall(entry.lower()):
+            for end in range(1, len(word) + 1):
+                prefixes.setdefault(word[:end], index)
+    return prefixes
+
+
+def _compile_milestones(milestones: Any, label: str, value_per_unit: float) -> List[Dict[str, Any]]:
+    """
+    Annual-spend milestones, lowest first, as {"spend", "units", "value", "label"}: either a list
+    of {"spend": "₹3L", "miles": 2500} (bonus units) or a dict of benefits with
+    spend_threshold_* keys and a rupee "value" (e.g. vouchers, "worth ₹3,000 each").
+    """
+    compiled = []
+    if isinstance(milestones, list):
+        for milestone in milestones:
+            spend = parse_amount(str(milestone.get('spend', '')))
+            units = next((value for key, value in milestone.items()
+                          if key != 'spend' and isinstance(value, (int, float))), None)
+            if spend and units:
+                compiled.append({"spend": spend, "units": units, "value": units * value_per_unit,
+                                 "label": f"{units:,} bonus {label}"})
+    elif isinstance(milestones, dict):
+        for name, benefit in milestones.items():
+            if not isinstance(benefit, dict):
+                continue
+            thresholds = sorted(amount for amount in (parse_amount(text) for key, text in benefit.items()
+                                                      if key.startswith('spend_threshold')) if amount)
+            if not thresholds:
+                continue
+            each = re.search(r'₹\s*([\d,]+)\s*each', benefit.get('value', ''))
+            value = parse_amount(each.group(1)) if each else (parse_amount(benefit.get('value', '')) or 0) / len(thresholds)
+            for spend in thresholds:
+                compiled.append({"spend": spend, "units": None, "value": value,
+                                 "label": f"{name.replace('_', ' ')} (₹{value:,.0f})"})
+    return sorted(compiled, key=lambda milestone: milestone["spend"])
+
+
+def get_reward_table(card_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Compiled tables for a card dict, compiled once per dict object (reloaded data recompiles)."""
+    key = id(card_info)
+    with _table_lock:
+        cached = _table_cache.get(key)
+        if cached is not None and cached[0] is card_info:
+            _table_cache.move_to_end(key)
+            return cached[1]
+    # Compiled outside the lock; two threads racing on a new card both compile the same table
+    table = compile_reward_table(card_info)
+    prime_reward_table(card_info, table)
+    return table
+
+
+def prime_reward_table(card_info: Dict[str, Any], table: Optional[Dict[str, Any]]):
+    """Register tables compiled ahead of time (e.g. loaded from a catalogue snapshot) for a card dict."""
+    key = id(card_info)
+    with _table_lock:
+        _table_cache[key] = (card_info, table)
+        _table_cache.move_to_end(key)
+        if len(_table_cache) > _TABLE_CACHE_SIZE:
+            _table_cache.popitem(last=False)
+
+
+def forget_reward_table(card_info: Dict[str, Any]):
+    """Drop the tables compiled for a card dict (e.g. when the card registry evicts it)."""
+    key = id(card_info)
+    with _table_lock:
+        cached = _table_cache.get(key)
+        if cached is not None and cached[0] is card_info:
+            del _table_cache[key]
+
+
+def _find_exclusion(table: Dict[str, Any], canonical: Optional[str], key: str = "exclusions") -> Optional[str]:
+    """The first entry of an exclusion list that covers a (canonical) spend category, or None."""
+    if not canonical:
+        return None
+    keywords = EXCLUSION_KEYWORDS.get(canonical, [canonical])
+    prefixes = table["exclusion_prefixes"][key]
+    if all(_WORD_PATTERN.fullmatch(keyword) for keyword in keywords):
+        matches = [prefixes[keyword] for keyword in keywords if keyword in prefixes]
+        return table[key][min(matches)] if matches else None
+    for exclusion in table[key]:
+        if any(re.search(r'\b' + re.escape(keyword), exclusion.lower()) for keyword in keywords):
+            return exclusion
+    return None
+
+
+def _find_section(table: Dict[str, Any], canonical: Optional[str]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """The bonus-rate section a (canonical) spend category belongs to, as (name, section)."""
+    name = table["section_aliases"].get(canonical)
+    return (name, table["sections"][name]) if name else (None, None)
+
+
+def counts_toward_milestones(table: Dict[str, Any], category: str = None) -> bool:
+    """Whether spend in a category counts toward the card's milestone thresholds."""
+    canonical = canonical_category(category) if category else None
+    return _find_exclusion(table, canonical, "milestone_exclusions") is None
+
+
+def counts_toward_fee_reversal(table: Dict[str, Any], category: str = None) -> bool:
+    """Whether spend in a category counts toward the annual fee reversal threshold."""
+    canonical = canonical_category(category) if category else None
+    return _find_exclusion(table, canonical, "fee_reversal_exclusions") is None
+
+
+def category_rule(table: Dict[str, Any], category: str = None) -> Dict[str, Any]:
+    """
+    Numeric rule for one spend category, for vectorized evaluation: earned =
+    min(floor(min(spend, spend_cap) / per) * units + floor(excess / above_per) * above_units, earn_cap),
+    or 0 when excluded. Caps are None when they do not apply.
+    """
+    units, _, per_amount = table["base"]
+    canonical = canonical_category(category) if category else None
+    rule = {
+        "excluded": False,
+        "exclusion_reason": None,
+        "rate": (units, per_amount),
+        "spend_cap": None,
+        "above_cap_rate": (units, per_amount),
+        "earn_cap": None
+    }
+    exclusion = _find_exclusion(table, canonical)
+    if exclusion:
+        rule.update(excluded=True, exclusion_reason=exclusion)
+        return rule
+    _, section = _find_section(table, canonical)
+    if section:
+        above_units, _, above_per = section["above_cap_rate"]
+        rule.update(rate=(section["rate"][0], section["rate"][2]), spend_cap=section["monthly_cap"],
+                    above_cap_rate=(above_units, above_per))
+        return rule
+    rule["earn_cap"] = table["statement_caps"].get(canonical) if canonical else None
+    return rule
+
+
+def evaluate_rewards(table: Dict[str, Any], card_name: str, spend_amount: int, category: str = None) -> Dict:
+    """Rewards for a spend amount and category from a card's compiled tables."""
+    units, label, per_amount = table["base"]
+    unit = table["unit"]
+    earned_key = f"{unit}_earned"
+    canonical = canonical_category(category) if category else None
+
+    # Excluded categories earn nothing
+    exclusion = _find_exclusion(table, canonical)
+    if exclusion:
+        return {
+            "card": card_name,
+            "spend_amount": spend_amount,
+            earned_key: 0,
+            "rate": f"No {label} earned (excluded category)",
+            "calculation": f"₹{spend_amount:,} - 0 {unit} ({category} excluded from rewards)",
+            "category": category,
+            "excluded": True,
+            "exclusion_reason": exclusion
+        }
+
+    # Category sections with a bonus rate, up to a monthly spend cap
+    name, section = _find_section(table, canonical)
+    if section:
+        bonus_units, _, bonus_per = section["rate"]
+        above_units, _, above_per = section["above_cap_rate"]
+        monthly_cap = section["monthly_cap"]
+        capped_spend = min(spend_amount, monthly_cap) if monthly_cap else spend_amount
+        excess_spend = spend_amount - capped_spend
+
+        bonus_earned = (capped_spend // bonus_per) * bonus_units
+        excess_earned = (excess_spend // above_per) * above_units
+        total = bonus_earned + excess_earned
+
+        calculation = f"₹{capped_spend:,} ÷ {bonus_per} × {bonus_units} = {bonus_earned} {unit}"
+        if excess_spend > 0:
+            calculation += f" + ₹{excess_spend:,} ÷ {above_per} × {above_units} = {excess_earned} {unit}"
+        calculation += f" = {total} total {unit}"
+
+        rate = f"{bonus_units} {label} per ₹{bonus_per} ({name} category"
+        rate += f", up to {section['cap_text']}/month), then {above_units}x" if monthly_cap else ")"
+        return {
+            "card": card_name,
+            "spend_amount": spend_amount,
+            earned_key: total,
+            "rate": rate,
+            "calculation": calculation,
+            "category": name,
+            "monthly_cap_applied": bool(monthly_cap) and spend_amount > monthly_cap
+        }
+
+    earned = (spend_amount // per_amount) * units
+
+    # Categories capped per statement cycle
+    cap = table["statement_caps"].get(canonical) if canonical else None
+    if cap is not None:
+        capped = min(earned, cap)
+        calculation = f"₹{spend_amount:,} ÷ {per_amount} × {units} = {earned if earned > cap else capped} {unit}"
+        if earned > cap:
+            calculation += f", capped at {cap:,} {unit}"
+        return {
+            "card": card_name,
+            "spend_amount": spend_amount,
+            earned_key: capped,
+            "rate": f"{units} {label} per ₹{per_amount} ({'capped at' if earned > cap else 'up to'} {cap:,} {unit} per cycle)",
+            "calculation": calculation,
+            "category": category,
+            "cap_applied": earned > cap,
+            "cap_amount": cap
+        }
+
+    return {
+        "card": card_name,
+        "spend_amount": spend_amount,
+        earned_key: earned,
+        "rate": f"{units} {label} per ₹{per_amount} (general rate)",
+        "calculation": f"₹{spend_amount:,} ÷ {per_amount} × {units} = {earned} {unit}",
+        "category": category or "general"
+    }
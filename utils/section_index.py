@@ -0,0 +1,186 @@
+"""
+Card Section Retrieval
+Flattens a card's JSON into addressable leaf paths ("rewards.travel.monthly_cap",
+"milestones[0].spend") and ranks them against a query with BM25 over an inverted index of
+key and value terms. Indexes are built when the catalogue is compiled and are stored with
+the pickled card body, so new sections become retrievable without code changes.
+"""
+
+import math
+import heapq
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils.prompt_serializer import STOPWORDS, tokenize
+
+Path = Tuple[Any, ...]
+
+# BM25 parameters; key terms count KEY_WEIGHT times (a "fees" key beats a passing mention)
+K1 = 1.2
+B = 0.75
+KEY_WEIGHT = 2
+
+# A matched leaf brings its whole parent record when the record is this small
+SIBLING_LIMIT = 6
+
+# Hits scoring below this share of the best hit are left out of an excerpt
+MIN_RELATIVE_SCORE = 0.35
+
+# Leaves every excerpt keeps: the base earning rate answers most reward questions
+CORE_PATHS = [("rewards", "earning_rate"), ("rewards", "rate_general"), ("rewards", "value_per_point")]
+
+
+def path_label(path: Path) -> str:
+    """'rewards.travel.rate' / 'milestones[0].spend' for a key path."""
+    label = ""
+    for key in path:
+        label += f"[{key}]" if isinstance(key, int) else (f".{key}" if label else str(key))
+    return label
+
+
+def flatten_card(card: Dict[str, Any]) -> List[Tuple[Path, Any]]:
+    """(path, value) for every leaf; lists of plain values count as one leaf."""
+    leaves = []
+
+    def walk(value: Any, path: Path):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if not str(key).startswith('_'):
+                    walk(item, path + (key,))
+        elif isinstance(value, list) and any(isinstance(item, (dict, list)) for item in value):
+            for index, item in enumerate(value):
+                walk(item, path + (index,))
+        elif value not in (None, "", [], {}):
+            leaves.append((path, value))
+
+    walk(card, ())
+    return leaves
+
+
+def path_index(card: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    {dotted path: value} for every node of a card, sections as well as leaves
+    ("tier_structure.spend_exclusion_policy", "milestones[0].spend"). Values are the card's own
+    objects, so a lookup is one dict probe instead of a chain of .get() calls.
+    """
+    paths: Dict[str, Any] = {}
+
+    def walk(value: Any, label: str):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if not str(key).startswith('_'):
+                    child = f"{label}.{key}" if label else str(key)
+                    paths[child] = item
+                    walk(item, child)
+        elif isinstance(value, list):
+            for index, item in enumerate(value):
+                if isinstance(item, (dict, list)):
+                    paths[f"{label}[{index}]"] = item
+                    walk(item, f"{label}[{index}]")
+
+    walk(card, "")
+    return paths
+
+
+class SectionIndex:
+    """Inverted index over one card's leaf paths, ranked with BM25."""
+
+    def __init__(self, card: Dict[str, Any]):
+        self.paths: List[Path] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = []
+        for doc, (path, value) in enumerate(flatten_card(card)):
+            counts: Dict[str, int] = {}
+            for key in path:
+                if not isinstance(key, int):
+                    for term in tokenize(str(key)):
+                        counts[term] = counts.get(term, 0) + KEY_WEIGHT
+            values = value if isinstance(value, list) else [value]
+            for term in tokenize(" ".join(str(item) for item in values)):
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                self.postings.setdefault(term, []).append((doc, count))
+            self.paths.append(path)
+            lengths.append(sum(counts.values()))
+        average = sum(lengths) / len(lengths) if lengths else 1.0
+        self.norms = [K1 * (1 - B + B * length / average) for length in lengths]
+        docs = len(self.paths)
+        self.idf = {term: math.log(1 + (docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                    for term, posting in self.postings.items()}
+
+    def search(self, query: str, k: int = 12, ignore: Iterable[str] = ()) -> List[Tuple[Path, float]]:
+        """Top-k (path, score) for a query; terms in ignore (tokenized card names) do not count."""
+        terms = set(tokenize(query)) - STOPWORDS
+        terms.difference_update(ignore)
+        scores: Dict[int, float] = {}
+        for term in terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc, count in self.postings[term]:
+                scores[doc] = scores.get(doc, 0.0) + idf * count * (K1 + 1) / (count + self.norms[doc])
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.paths[doc], round(score, 3)) for doc, score in best]
+
+
+def _lookup(card: Any, path: Path) -> Any:
+    for key in path:
+        card = card[key]
+    return card
+
+
+def _leaf_count(value: Any) -> int:
+    if isinstance(value, dict):
+        return sum(_leaf_count(item) for item in value.values())
+    if isinstance(value, list) and any(isinstance(item, (dict, list)) for item in value):
+        return sum(_leaf_count(item) for item in value)
+    return 1
+
+
+def section_excerpt(card: Dict[str, Any], paths: Iterable[Path]) -> Dict[str, Any]:
+    """
+    The parts of a card at the given leaf paths, in the card's own nesting (list elements keep
+    their order). A leaf from a small record (≤ SIBLING_LIMIT leaves) brings the whole record.
+    """
+    chosen = set()
+    for path in paths:
+        try:
+            _lookup(card, path)
+        except (KeyError, IndexError, TypeError):
+            continue
+        parent = path[:-1]
+        if parent and _leaf_count(_lookup(card, parent)) <= SIBLING_LIMIT:
+            path = parent
+        chosen.add(path)
+
+    excerpt: Dict[Any, Any] = {}
+    for path in sorted(chosen, key=len):
+        if any(path[:n] in chosen for n in range(1, len(path))):
+            continue  # covered by a chosen ancestor
+        node = excerpt
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = _lookup(card, path)
+    return _restore_lists(excerpt)
+
+
+def _restore_lists(node: Any) -> Any:
+    """Turn {index: item} nodes built by section_excerpt back into lists."""
+    if not isinstance(node, dict):
+        return node
+    if node and all(isinstance(key, int) for key in node):
+        return [_restore_lists(node[key]) for key in sorted(node)]
+    return {key: _restore_lists(value) for key, value in node.items()}
+
+
+def relevant_sections(card: Dict[str, Any], index: Optional[SectionIndex], query: str, k: int = 12,
+                      ignore: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Excerpt of the card for a query: the top-k retrieved leaves (within MIN_RELATIVE_SCORE of
+    the best) plus CORE_PATHS. With no matching leaf (or no index) the whole rewards section is
+    sent, as before.
+    """
+    results = index.search(query, k, ignore) if index else []
+    hits = [path for path, score in results if score >= results[0][1] * MIN_RELATIVE_SCORE]
+    if not hits:
+        return {"rewards": card.get("rewards", {})}
+    return section_excerpt(card, hits + CORE_PATHS)
@@ -0,0 +1,233 @@
+"""
+Spend Allocation Optimizer
+Splits a monthly spend profile across the card portfolio to maximise annual reward value (₹),
+using each card's compiled reward rules: category rates, monthly and statement-cycle caps,
+exclusions and annual-spend milestone bonuses.
+"""
+
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from utils.fast_path import contains_word
+from utils.reward_calculator import calculate_rewards
+from utils.reward_rules import category_rule, counts_toward_milestones, get_reward_table
+
+# Phrases that ask which card to use for which spend
+ALLOCATION_WORDS = ['which card should', 'which cards should', 'which card for each', 'each category',
+                    'put each', 'allocate', 'allocation', 'optimise', 'optimize', 'maximise', 'maximize']
+
+
+def is_allocation_question(query: str) -> bool:
+    """Whether a question asks how to spread spend across cards."""
+    text = query.lower()
+    return any(contains_word(text, word) for word in ALLOCATION_WORDS)
+
+
+def _curve_value(segments: List[Tuple[float, float]], amount: float) -> float:
+    """₹ value of spending amount along a piecewise-linear reward curve."""
+    value = 0.0
+    for width, rate in segments:
+        step = min(width, amount)
+        value += step * rate
+        amount -= step
+        if amount <= 0:
+            break
+    return value
+
+
+def _rate_at(segments: List[Tuple[float, float]], amount: float, next_rupee: bool) -> float:
+    """Rate of the next rupee spent (next_rupee) or of the last rupee already spent at amount."""
+    for width, rate in segments:
+        if amount < width or (not next_rupee and amount <= width):
+            return rate
+        amount -= width
+    return segments[-1][1]
+
+
+class SpendOptimizer:
+    """
+    Greedy allocation over piecewise-linear reward curves. Each card x category is a list of
+    (monthly spend width, ₹ earned per ₹ spent) segments; per category, segments from all cards
+    are filled best rate first, which is optimal while no milestone is involved since every
+    curve is concave. Milestones are then pursued one at a time by moving the cheapest eligible
+    spend onto the card, and a move is kept only if the annual value improves.
+    """
+
+    def __init__(self, cards_data: Dict[str, Dict[str, Any]], cards: Optional[Sequence[str]] = None):
+        self.cards_data = cards_data
+        self.tables = {}
+        for name in (cards or list(cards_data)):
+            table = get_reward_table(cards_data[name]) if name in cards_data else None
+            if table is not None:
+                self.tables[name] = table
+        self.cards = list(self.tables)
+
+    def optimize(self, monthly_spend: Dict[Optional[str], float]) -> Dict[str, Any]:
+        """
+        Best allocation of monthly spend per category (None = general spend) across the cards.
+        Returns {"allocation": {category: {card: amount}}, "details": [per category/card rows],
+        "cards": {card: totals and milestones}, "annual_value", "single_card_annual_value"}.
+        """
+        if not self.cards:
+            return {"error": "No card with reward rules to allocate spend to"}
+        spend = {category: amount for category, amount in monthly_spend.items() if amount > 0}
+        self._curves = {(card, category): self._segments(card, category) for card in self.cards for category in spend}
+        self._eligible = {(card, category): counts_toward_milestones(self.tables[card], category)
+                          for card in self.cards for category in spend}
+
+        allocation = {category: self._greedy(category, amount) for category, amount in spend.items()}
+        value = self._annual_value(allocation)
+
+        # Pursue milestones while doing so increases the annual value
+        while True:
+            best = None
+            for card in self.cards:
+                eligible_spend = self._eligible_spend(allocation, card)
+                for milestone in self.tables[card]["milestones"]:
+                    if eligible_spend * 12 >= milestone["spend"]:
+                        continue
+                    candidate = self._pursue(allocation, card, math.ceil(milestone["spend"] / 12) - eligible_spend)
+                    if candidate is None:
+                        continue
+                    candidate_value = self._annual_value(candidate)
+                    if candidate_value > (best[0] if best else value) + 1e-6:
+                        best = (candidate_value, candidate)
+            if best is None:
+                break
+            value, allocation = best
+
+        single_card = {card: self._annual_value({category: {card: amount} for category, amount in spend.items()})
+                       for card in self.cards}
+        return self._report(allocation, single_card)
+
+    def _segments(self, card: str, category: Optional[str]) -> List[Tuple[float, float]]:
+        table = self.tables[card]
+        rule = category_rule(table, category)
+        if rule["excluded"]:
+            return [(math.inf, 0.0)]
+        units, per_amount = rule["rate"]
+        rate = units / per_amount * table["value_per_unit"]
+        if rule["spend_cap"] is not None:
+            above_units, above_per = rule["above_cap_rate"]
+            return [(rule["spend_cap"], rate), (math.inf, above_units / above_per * table["value_per_unit"])]
+        if rule["earn_cap"] is not None:
+            # Whole per_amount steps until the earned units reach the cap
+            return [(math.ceil(rule["earn_cap"] / units) * per_amount, rate), (math.inf, 0.0)]
+        return [(math.inf, rate)]
+
+    def _greedy(self, category: Optional[str], amount: float) -> Dict[str, float]:
+        """Fill the category's spend into the best-rate segments across cards."""
+        segments = sorted(
+            ((-rate, index, order, width) for index, card in enumerate(self.cards)
+             for order, (width, rate) in enumerate(self._curves[(card, category)])),
+        )
+        placed: Dict[str, float] = {}
+        for _, index, _, width in segments:
+            if amount <= 0:
+                break
+            step = min(width, amount)
+            placed[self.cards[index]] = placed.get(self.cards[index], 0) + step
+            amount -= step
+        return placed
+
+    def _eligible_spend(self, allocation: Dict[Optional[str], Dict[str, float]], card: str) -> float:
+        return sum(placed.get(card, 0) for category, placed in allocation.items() if self._eligible[(card, category)])
+
+    def _pursue(self, allocation: Dict[Optional[str], Dict[str, float]], card: str,
+                needed: float) -> Optional[Dict[Optional[str], Dict[str, float]]]:
+        """Move `needed` eligible monthly spend onto card, cheapest loss per rupee first; None if impossible."""
+        moves = []
+        for category, placed in allocation.items():
+            if not self._eligible[(card, category)]:
+                continue
+            gain_rate = _rate_at(self._curves[(card, category)], placed.get(card, 0), next_rupee=True)
+            for other, amount in placed.items():
+                if other != card and amount > 0:
+                    loss_rate = _rate_at(self._curves[(other, category)], amount, next_rupee=False)
+                    moves.append((loss_rate - gain_rate, category, other, amount))
+        if sum(move[3] for move in moves) < needed:
+            return None
+
+        candidate = {category: dict(placed) for category, placed in allocation.items()}
+        for _, category, other, amount in sorted(moves, key=lambda move: move[0]):
+            step = min(amount, needed)
+            candidate[category][other] -= step
+            if candidate[category][other] <= 0:
+                del candidate[category][other]
+            candidate[category][card] = candidate[category].get(card, 0) + step
+            needed -= step
+            if needed <= 0:
+                break
+        return candidate
+
+    def _annual_value(self, allocation: Dict[Optional[str], Dict[str, float]]) -> float:
+        value = 0.0
+        eligible_spend: Dict[str, float] = {}
+        for category, placed in allocation.items():
+            for card, amount in placed.items():
+                value += 12 * _curve_value(self._curves[(card, category)], amount)
+                if self._eligible[(card, category)]:
+                    eligible_spend[card] = eligible_spend.get(card, 0) + amount
+        for card, monthly in eligible_spend.items():
+            value += sum(milestone["value"] for milestone in self.tables[card]["milestones"]
+                         if monthly * 12 >= milestone["spend"])
+        return value
+
+    def _report(self, allocation: Dict[Optional[str], Dict[str, float]], single_card: Dict[str, float]) -> Dict[str, Any]:
+        """Exact figures for the chosen allocation (calculate_rewards per category and card)."""
+        details = []
+        cards = {card: {"monthly_spend": 0, "monthly_rewards": 0, "unit": self.tables[card]["unit"],
+                        "milestones": [], "milestone_value": 0.0} for card in self.cards}
+        for category, placed in allocation.items():
+            for card, amount in placed.items():
+                amount = int(round(amount))
+                result = calculate_rewards(self.cards_data, card, amount, category)
+                earned = result.get('points_earned', result.get('miles_earned', 0))
+                no_rewards = all(rate == 0 for other in self.cards for _, rate in self._curves[(other, category)])
+                details.append({"category": category, "card": card, "spend": amount, "earned": earned,
+                                "unit": self.tables[card]["unit"], "no_rewards_on_any_card": no_rewards})
+                cards[card]["monthly_spend"] += amount
+                cards[card]["monthly_rewards"] += earned
+
+        annual_value = 0.0
+        for card, summary in cards.items():
+            table = self.tables[card]
+            annual_spend = self._eligible_spend(allocation, card) * 12
+            reached = [milestone for milestone in table["milestones"] if annual_spend >= milestone["spend"]]
+            summary["milestones"] = [f"₹{milestone['spend']:,} annual spend: {milestone['label']}" for milestone in reached]
+            summary["milestone_value"] = sum(milestone["value"] for milestone in reached)
+            summary["annual_value"] = round(summary["monthly_rewards"] * 12 * table["value_per_unit"] + summary["milestone_value"], 2)
+            annual_value += summary["annual_value"]
+
+        return {
+            "allocation": {category: {card: int(round(amount)) for card, amount in placed.items()}
+                           for category, placed in allocation.items()},
+            "details": details,
+            "cards": cards,
+            "annual_value": round(annual_value, 2),
+            "single_card_annual_value": {card: round(value, 2) for card, value in single_card.items()}
+        }
+
+
+def format_allocation(result: Dict[str, Any]) -> str:
+    """Markdown summary of SpendOptimizer.optimize(): which card per category, then per-card totals."""
+    lines = ["| Category | Monthly spend | Card | Earned/month |", "|---|---|---|---|"]
+    for row in result["details"]:
+        if row["no_rewards_on_any_card"]:
+            card, earned = "Any (no card earns rewards)", "0"
+        else:
+            card, earned = row["card"], f"{row['earned']:,} {row['unit']}"
+        lines.append(f"| {row['category'] or 'other (general)'} | ₹{row['spend']:,} | {card} | {earned} |")
+    lines.append("")
+    for card, summary in result["cards"].items():
+        if not summary["monthly_spend"]:
+            continue
+        line = (f"- **{card}**: ₹{summary['monthly_spend']:,}/month, {summary['monthly_rewards']:,} "
+                f"{summary['unit']}/month, ≈₹{summary['annual_value']:,.0f}/year")
+        if summary["milestones"]:
+            line += f" incl. milestones ({'; '.join(summary['milestones'])})"
+        lines.append(line)
+    best_single = max(result["single_card_annual_value"].items(), key=lambda item: item[1])
+    lines.append(f"- **Total**: ≈₹{result['annual_value']:,.0f}/year "
+                 f"(best single card: {best_single[0]}, ≈₹{best_single[1]:,.0f}/year)")
+    return "\n".join(lines)